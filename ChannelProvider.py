@@ -0,0 +1,45 @@
+import threading
+from common.log import logger
+
+
+class ChannelProvider:
+    """
+    按协议类型缓存的消息通道。
+
+    每种协议的通道只创建一次，由所有分发线程共享；发送失败时可以丢弃缓存的通道，
+    下次获取时重新创建。插件卸载时调用 close() 释放引用。
+    """
+
+    def __init__(self, factory):
+        # 创建通道的函数，参数为协议类型
+        self.factory = factory
+        self.channels = {}
+        self.lock = threading.Lock()
+        self.created = 0
+
+    def get(self, channel_type):
+        """ 获取协议类型对应的通道，不存在时创建 """
+        channel = self.channels.get(channel_type)
+        if channel is not None:
+            return channel
+        with self.lock:
+            # 其他线程可能已经创建
+            channel = self.channels.get(channel_type)
+            if channel is None:
+                channel = self.factory(channel_type)
+                self.channels[channel_type] = channel
+                self.created += 1
+                logger.debug(f"[SimpleTimeTask] 创建消息通道: {channel_type}")
+        return channel
+
+    def invalidate(self, channel_type, channel=None):
+        """ 丢弃缓存的通道，指定 channel 时只在仍是同一实例时丢弃 """
+        with self.lock:
+            cached = self.channels.get(channel_type)
+            if cached is not None and (channel is None or cached is channel):
+                del self.channels[channel_type]
+
+    def close(self):
+        """ 释放所有通道的引用 """
+        with self.lock:
+            self.channels.clear()
@@ -0,0 +1,67 @@
+import re
+import copy
+import threading
+from bridge.context import ContextType, Context
+from channel.chat_message import ChatMessage
+
+# 触发任务时构造消息使用的模板
+MESSAGE_TEMPLATE = "id=0, create_time=0, ctype=TEXT, content=/time 每天 17:55 text, from_user_id=@, from_user_nickname=用户昵称, to_user_id==, to_user_nickname=, other_user_id=@123, other_user_nickname=用户昵称, is_group=False, is_at=False, actual_user_id=None, actual_user_nickname=None, at_list=None"
+MESSAGE_TEMPLATE_PATTERN = r'(\w+)\s*=\s*([^,]+)'
+# 每次触发时按任务填写的字段
+TASK_FIELDS = ("content", "receiver", "session_id", "isgroup", "ActualUserName", "from_user_nickname", "from_user_id", "User")
+
+
+class ContextFactory:
+    """
+    触发任务的消息上下文工厂。
+
+    初始化时解析一次消息模板并构造原型消息，每次触发只复制模板字典和原型消息，再填写任务相关的字段；
+    插件路由使用的通道只创建一次，由所有分发线程共享。
+    """
+
+    def __init__(self, routing_channel_factory):
+        # 创建插件路由通道的函数
+        self.routing_channel_factory = routing_channel_factory
+        self.routing_channel = None
+        self.lock = threading.Lock()
+        matches = re.findall(MESSAGE_TEMPLATE_PATTERN, MESSAGE_TEMPLATE)
+        self.template = {match[0]: match[1] for match in matches}
+        # 原型消息，模板中与消息属性同名的字段写入消息
+        self.prototype = ChatMessage(None)
+        for key, value in self.template.items():
+            if hasattr(self.prototype, key):
+                setattr(self.prototype, key, value)
+        # 任务字段中与消息属性同名的字段
+        self.msg_fields = tuple(key for key in TASK_FIELDS if hasattr(self.prototype, key))
+
+    def build(self, task, receiver, is_group):
+        """ 构建任务的消息上下文 """
+        content_dict = self.template.copy()
+        content_dict["content"] = task.content
+        content_dict["receiver"] = receiver
+        content_dict["session_id"] = receiver
+        content_dict["isgroup"] = is_group
+        content_dict["ActualUserName"] = task.user_name
+        content_dict["from_user_nickname"] = task.user_name
+        content_dict["from_user_id"] = task.user_id
+        content_dict["User"] = {
+            'MemberList': [{'UserName': task.user_id, 'NickName': task.user_name}]
+        }
+
+        msg = copy.copy(self.prototype)
+        msg._rawmsg = content_dict
+        for key in self.msg_fields:
+            setattr(msg, key, content_dict[key])
+        msg.is_group = is_group
+        content_dict["msg"] = msg
+        return Context(ContextType.TEXT, task.content, content_dict)
+
+    def get_routing_channel(self):
+        """ 获取插件路由使用的共享通道 """
+        if self.routing_channel is None:
+            with self.lock:
+                if self.routing_channel is None:
+                    channel = self.routing_channel_factory()
+                    channel.channel_type = "wx"
+                    self.routing_channel = channel
+        return self.routing_channel
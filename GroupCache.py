@@ -0,0 +1,95 @@
+import time
+import threading
+from common.log import logger
+
+
+class GroupCache:
+    """
+    群标题到群ID的缓存。
+
+    后台线程每隔 ttl 秒刷新一次映射；查询未命中时立即重新获取一次，
+    但两次未命中刷新之间至少间隔 miss_refresh_interval 秒，避免频繁请求通讯录接口。
+    """
+
+    def __init__(self, fetcher, ttl=600, miss_refresh_interval=60, name="SimpleTimeTask_groups"):
+        # 获取 {群标题: 群ID} 的函数，失败时返回 None
+        self.fetcher = fetcher
+        self.ttl = ttl
+        self.miss_refresh_interval = miss_refresh_interval
+        self.name = name
+        self.groups = {}
+        self.refresh_lock = threading.Lock()
+        # 上一次刷新和上一次因未命中而刷新的时间(monotonic)
+        self.last_refresh = 0
+        self.last_miss_refresh = float("-inf")
+        self.stop_event = threading.Event()
+        # 统计信息
+        self.hits = 0
+        self.misses = 0
+        self.refreshes = 0
+        self.refresh_failures = 0
+
+    def start(self):
+        """ 启动后台刷新线程，首次获取也在后台进行，不阻塞启动；获取完成前查询群ID会等待获取结果 """
+        thread = threading.Thread(target=self._run, name=self.name)
+        thread.daemon = True
+        thread.start()
+
+    def get(self, group_title):
+        """ 根据群标题获取群ID，找不到时返回 None """
+        group_id = self.groups.get(group_title)
+        if group_id is not None:
+            self.hits += 1
+            return group_id
+
+        self.misses += 1
+        # 群可能是启动后新建或改名的，按频率限制重新获取一次
+        now = time.monotonic()
+        if now - self.last_miss_refresh >= self.miss_refresh_interval:
+            self.last_miss_refresh = now
+            self.refresh()
+            group_id = self.groups.get(group_title)
+        if group_id is None:
+            logger.warning(f"[SimpleTimeTask] 未找到群聊[{group_title}]的ID")
+        return group_id
+
+    def refresh(self):
+        """ 重新获取映射，多个线程同时刷新时只请求一次 """
+        requested = time.monotonic()
+        with self.refresh_lock:
+            if self.last_refresh > requested:
+                # 等待期间其他线程已完成刷新
+                return
+            try:
+                groups = self.fetcher()
+            except Exception as e:
+                logger.error(f"[SimpleTimeTask] 获取群聊映射失败: {e}")
+                groups = None
+            self.last_refresh = time.monotonic()
+            if groups is None:
+                self.refresh_failures += 1
+                return
+            self.groups = groups
+            self.refreshes += 1
+            logger.debug(f"[SimpleTimeTask] 群聊映射已刷新: {len(groups)} 个群, 命中 {self.hits}, 未命中 {self.misses}")
+
+    def get_stats(self):
+        """ 获取缓存统计信息 """
+        return {
+            "groups": len(self.groups),
+            "hits": self.hits,
+            "misses": self.misses,
+            "refreshes": self.refreshes,
+            "refresh_failures": self.refresh_failures,
+        }
+
+    def stop(self):
+        """ 停止后台刷新 """
+        self.stop_event.set()
+
+    def _run(self):
+        start = time.monotonic()
+        self.refresh()
+        logger.info(f"[SimpleTimeTask] 群聊映射首次获取完成: {len(self.groups)} 个群, 耗时 {time.monotonic() - start:.2f}s")
+        while not self.stop_event.wait(self.ttl):
+            self.refresh()
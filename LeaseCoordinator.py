@@ -0,0 +1,159 @@
+import os
+import math
+import time
+import zlib
+import socket
+import threading
+from common.log import logger
+
+# 租约名前缀
+NODE_LEASE_PREFIX = "node:"
+SHARD_LEASE_PREFIX = "shard:"
+
+
+def shard_of(task_id, shard_count):
+    """ 任务所属的分片，使用与进程无关的稳定哈希 """
+    if shard_count <= 1:
+        return 0
+    return zlib.crc32(task_id.encode("utf-8")) % shard_count
+
+
+class LeaseCoordinator:
+    """
+    多个进程共用一个数据库时的触发协调。
+
+    任务按ID哈希分为 shard_count 个分片，每个分片对应数据库中的一个租约，只有持有租约的进程触发该分片的任务。
+    shard_count 为 1 时只有一个租约，即由一个进程负责所有触发。
+    后台线程每隔 heartbeat 秒续期已持有的租约，并获取已过期(持有者退出或失去响应)的租约，
+    持有者退出后其他进程最迟在 ttl + heartbeat 秒内接管。
+    每个进程还登记一个节点租约，分片数多于 1 时按存活节点数平分分片：持有超出份额的分片时释放多余的分片，由其他进程获取。
+
+    每次续期记录本地的有效期(续期开始时间 + ttl - margin，使用 monotonic 时钟)，超过有效期后 owns() 返回 False。
+    进程停顿超过 ttl(GC、SIGSTOP、心跳线程阻塞)后恢复时，在心跳线程发现租约被接管之前也不会触发已被接管的任务。
+    """
+
+    def __init__(self, store, shard_count=1, ttl=15, heartbeat=5, node_id=None,
+                 on_acquire=None, before_release=None, name="SimpleTimeTask_lease", margin=None):
+        self.store = store
+        self.shard_count = max(1, shard_count)
+        self.ttl = ttl
+        self.heartbeat = heartbeat
+        # 本地有效期比数据库中的过期时间提前 margin 秒，抵消进程间的时钟偏差和续期耗时
+        self.margin = ttl / 5 if margin is None else margin
+        if heartbeat >= ttl - self.margin:
+            logger.warning(f"[SimpleTimeTask] lease_heartbeat({heartbeat}s) 应小于 lease_ttl 的本地有效期({ttl - self.margin:g}s)，否则两次续期之间会暂停触发")
+        self.node_id = node_id or f"{socket.gethostname()}:{os.getpid()}:{id(self):x}"
+        # 获取到新分片时调用，参数为新获取的分片集合
+        self.on_acquire = on_acquire
+        # 释放分片前调用，用于写入待提交的任务状态，保证接管的进程读取到最新状态
+        self.before_release = before_release
+        self.name = name
+        # 当前持有的分片，及其本地有效期(monotonic 时间)
+        self.held = frozenset()
+        self.valid_until = 0.0
+        self.lock = threading.Lock()
+        self.stop_event = threading.Event()
+        # 统计信息
+        self.acquired = 0
+        self.lost = 0
+
+    def lease_name(self, shard):
+        return f"{SHARD_LEASE_PREFIX}{shard}/{self.shard_count}"
+
+    def owns(self, task_id):
+        """ 当前进程是否负责触发该任务，租约超过本地有效期时返回 False """
+        return shard_of(task_id, self.shard_count) in self.held and time.monotonic() < self.valid_until
+
+    def ensure_valid(self):
+        """ 持有的租约已超过本地有效期(例如进程停顿后恢复)时立即续期，返回续期后是否仍持有分片 """
+        if self.held and time.monotonic() >= self.valid_until:
+            try:
+                self.renew()
+            except Exception as e:
+                logger.error(f"[SimpleTimeTask] 续期租约失败: {e}")
+        return bool(self.held) and time.monotonic() < self.valid_until
+
+    def start(self):
+        """ 先同步竞争一次租约，再启动心跳线程 """
+        self.renew()
+        thread = threading.Thread(target=self._run, name=self.name)
+        thread.daemon = True
+        thread.start()
+
+    def renew(self):
+        """ 续期已持有的租约，按份额释放或获取分片 """
+        with self.lock:
+            if self.stop_event.is_set():
+                return
+            # 有效期从续期开始时计算，数据库中的过期时间不早于此时间 + ttl
+            renew_start = time.monotonic()
+            store = self.store
+            store.acquire_lease(NODE_LEASE_PREFIX + self.node_id, self.node_id, self.ttl)
+            if self.shard_count > 1:
+                nodes = max(1, store.count_leases(NODE_LEASE_PREFIX))
+                target = math.ceil(self.shard_count / nodes)
+            else:
+                target = 1
+
+            # 续期已持有的分片，续期失败说明租约已过期并被其他进程接管
+            held = {shard for shard in self.held if store.acquire_lease(self.lease_name(shard), self.node_id, self.ttl)}
+            lost = self.held - held
+            if lost:
+                self.lost += len(lost)
+                logger.warning(f"[SimpleTimeTask] 分片租约已被其他进程接管: {sorted(lost)}")
+
+            # 释放超出份额的分片
+            extra = sorted(held)[target:]
+            if extra:
+                if self.before_release is not None:
+                    self.before_release()
+                for shard in extra:
+                    store.release_lease(self.lease_name(shard), self.node_id)
+                    held.discard(shard)
+                logger.info(f"[SimpleTimeTask] 已释放超出份额的分片: {extra}")
+
+            # 获取空闲或已过期的分片
+            acquired = set()
+            for shard in range(self.shard_count):
+                if len(held) >= target:
+                    break
+                if shard not in held and store.acquire_lease(self.lease_name(shard), self.node_id, self.ttl):
+                    held.add(shard)
+                    acquired.add(shard)
+            self.valid_until = renew_start + self.ttl - self.margin
+            self.held = frozenset(held)
+
+        if acquired:
+            self.acquired += len(acquired)
+            logger.info(f"[SimpleTimeTask] 节点 {self.node_id} 已获取分片 {sorted(acquired)}, 当前持有 {sorted(self.held)}/{self.shard_count}")
+            if self.on_acquire is not None:
+                self.on_acquire(acquired)
+
+    def get_stats(self):
+        """ 获取协调统计信息 """
+        return {
+            "node_id": self.node_id,
+            "shards": sorted(self.held),
+            "shard_count": self.shard_count,
+            "acquired": self.acquired,
+            "lost": self.lost,
+        }
+
+    def stop(self):
+        """ 停止心跳并释放所有租约，使其他进程立即接管 """
+        with self.lock:
+            self.stop_event.set()
+            if self.held and self.before_release is not None:
+                self.before_release()
+            for shard in self.held:
+                self.store.release_lease(self.lease_name(shard), self.node_id)
+            self.store.release_lease(NODE_LEASE_PREFIX + self.node_id, self.node_id)
+            self.held = frozenset()
+            self.valid_until = 0.0
+
+    def _run(self):
+        while not self.stop_event.wait(self.heartbeat):
+            try:
+                self.renew()
+            except Exception as e:
+                logger.error(f"[SimpleTimeTask] 续期租约失败: {e}")
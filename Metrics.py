@@ -0,0 +1,163 @@
+import os
+import time
+import bisect
+import threading
+from common.log import logger
+
+# 默认的直方图分桶(秒)
+DEFAULT_BUCKETS = (0.005, 0.01, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120, 300)
+
+
+class Histogram:
+    """ 固定分桶的直方图，记录观测值的分布、总和与最大值 """
+
+    def __init__(self, buckets=DEFAULT_BUCKETS):
+        self.buckets = tuple(buckets)
+        # 每个分桶的计数(不累计)，最后一个为 +Inf
+        self.counts = [0] * (len(self.buckets) + 1)
+        self.count = 0
+        self.sum = 0.0
+        self.max = 0.0
+
+    def observe(self, value):
+        self.counts[bisect.bisect_left(self.buckets, value)] += 1
+        self.count += 1
+        self.sum += value
+        if value > self.max:
+            self.max = value
+
+    def quantile(self, q):
+        """ 按分桶估算分位数，返回所在分桶的上界(不超过最大观测值) """
+        if not self.count:
+            return 0.0
+        rank = q * self.count
+        total = 0
+        for index, count in enumerate(self.counts):
+            total += count
+            if total >= rank:
+                return min(self.buckets[index], self.max) if index < len(self.buckets) else self.max
+        return self.max
+
+
+class Metrics:
+    """
+    插件的运行指标：计数器、直方图，以及导出时读取的组件状态(队列深度等)。
+    可导出为 Prometheus 文本格式，供 node_exporter 的 textfile collector 采集。
+    """
+
+    def __init__(self, prefix="simple_time_task"):
+        self.prefix = prefix
+        self.lock = threading.Lock()
+        # 名称 -> 数值
+        self.counters = {}
+        # 名称 -> Histogram
+        self.histograms = {}
+        # 名称 -> (类型, 读取函数)，导出时调用
+        self.collectors = {}
+        # 名称 -> 说明
+        self.help = {}
+
+    def inc(self, name, value=1, help=None):
+        """ 增加计数器 """
+        with self.lock:
+            self.counters[name] = self.counters.get(name, 0) + value
+            if help:
+                self.help.setdefault(name, help)
+
+    def observe(self, name, value, help=None, buckets=DEFAULT_BUCKETS):
+        """ 记录直方图的一个观测值 """
+        with self.lock:
+            histogram = self.histograms.get(name)
+            if histogram is None:
+                histogram = self.histograms[name] = Histogram(buckets)
+                if help:
+                    self.help[name] = help
+            histogram.observe(value)
+
+    def add_collector(self, name, kind, fn, help=None):
+        """ 注册导出时读取的指标，kind 为 gauge 或 counter """
+        self.collectors[name] = (kind, fn)
+        if help:
+            self.help[name] = help
+
+    def get_counter(self, name):
+        return self.counters.get(name, 0)
+
+    def get_histogram(self, name):
+        return self.histograms.get(name)
+
+    def collect(self):
+        """ 读取所有注册的组件指标，读取失败的指标跳过 """
+        values = {}
+        for name, (kind, fn) in list(self.collectors.items()):
+            try:
+                values[name] = (kind, fn())
+            except Exception as e:
+                logger.debug(f"[SimpleTimeTask] 读取指标 {name} 失败: {e}")
+        return values
+
+    def render_prometheus(self):
+        """ 导出为 Prometheus 文本格式 """
+        lines = []
+
+        def header(name, kind):
+            full_name = f"{self.prefix}_{name}"
+            if name in self.help:
+                lines.append(f"# HELP {full_name} {self.help[name]}")
+            lines.append(f"# TYPE {full_name} {kind}")
+            return full_name
+
+        with self.lock:
+            counters = dict(self.counters)
+            histograms = {name: (h.buckets, list(h.counts), h.count, h.sum) for name, h in self.histograms.items()}
+        for name, value in sorted(counters.items()):
+            lines.append(f"{header(name, 'counter')} {value}")
+        for name, (kind, value) in sorted(self.collect().items()):
+            lines.append(f"{header(name, kind)} {value}")
+        for name, (buckets, counts, count, total) in sorted(histograms.items()):
+            full_name = header(name, "histogram")
+            cumulative = 0
+            for bound, bucket_count in zip(buckets, counts):
+                cumulative += bucket_count
+                lines.append(f'{full_name}_bucket{{le="{bound}"}} {cumulative}')
+            lines.append(f'{full_name}_bucket{{le="+Inf"}} {count}')
+            lines.append(f"{full_name}_sum {total}")
+            lines.append(f"{full_name}_count {count}")
+        return "\n".join(lines) + "\n"
+
+    def write_prometheus(self, path):
+        """ 写入 Prometheus 文本文件，先写临时文件再替换，避免采集到写了一半的文件 """
+        tmp_path = f"{path}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            f.write(self.render_prometheus())
+        os.replace(tmp_path, path)
+
+
+class MetricsWriter:
+    """ 定期将指标写入 Prometheus 文本文件的后台线程 """
+
+    def __init__(self, metrics, path, interval=60, name="SimpleTimeTask_metrics"):
+        self.metrics = metrics
+        self.path = path
+        self.interval = interval
+        self.stop_event = threading.Event()
+        self.thread = threading.Thread(target=self._run, name=name)
+        self.thread.daemon = True
+
+    def start(self):
+        self.thread.start()
+
+    def stop(self):
+        """ 停止写入，停止前写入最后一次 """
+        self.stop_event.set()
+        self._write()
+
+    def _run(self):
+        while not self.stop_event.wait(self.interval):
+            self._write()
+
+    def _write(self):
+        try:
+            self.metrics.write_prometheus(self.path)
+        except OSError as e:
+            logger.error(f"[SimpleTimeTask] 写入指标文件 {self.path} 失败: {e}")
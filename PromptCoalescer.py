@@ -0,0 +1,90 @@
+import time
+import threading
+
+
+class _Flight:
+    """ 一次上游请求，等待的任务共享其结果 """
+
+    __slots__ = ("started", "event", "result")
+
+    def __init__(self, started):
+        self.started = started
+        self.event = threading.Event()
+        self.result = None
+
+
+class PromptCoalescer:
+    """
+    相同提示词的 GPT 请求合并(single-flight)。
+
+    同一提示词在 window 秒内发起的请求只向上游请求一次，其余请求等待并共享结果；
+    请求仍在进行时到达的相同提示词同样等待该请求。等待超过 wait_timeout 秒时返回 None，由调用方处理。
+    只有成功的结果在窗口内复用，生成失败后下一个相同提示词会重新请求。
+    """
+
+    def __init__(self, window=60, wait_timeout=60):
+        self.window = window
+        self.wait_timeout = wait_timeout
+        self.lock = threading.Lock()
+        # 提示词 -> _Flight
+        self.flights = {}
+        self.last_purge = time.monotonic()
+        # 统计信息
+        self.requests = 0
+        self.upstream = 0
+        self.shared = 0
+
+    def fetch(self, prompt, generator):
+        """
+        获取提示词的回复。
+
+        :param prompt: 提示词，相同的提示词合并请求
+        :param generator: 无参数的生成函数，只在需要向上游请求时调用
+        :return: 生成函数的返回值，生成失败或等待超时时返回 None
+        """
+        now = time.monotonic()
+        with self.lock:
+            self.requests += 1
+            self._purge(now)
+            flight = self.flights.get(prompt)
+            leader = flight is None or (flight.event.is_set() and now - flight.started >= self.window)
+            if leader:
+                flight = _Flight(now)
+                self.flights[prompt] = flight
+                self.upstream += 1
+            else:
+                self.shared += 1
+
+        if not leader:
+            flight.event.wait(self.wait_timeout)
+            return flight.result
+
+        try:
+            flight.result = generator()
+        finally:
+            if flight.result is None:
+                # 生成失败(返回 None 或抛出异常)的结果不共享，之后的相同提示词重新向上游请求，
+                # 已在等待该请求的任务仍得到 None
+                with self.lock:
+                    if self.flights.get(prompt) is flight:
+                        del self.flights[prompt]
+            flight.event.set()
+        return flight.result
+
+    def get_stats(self):
+        """ 获取合并统计信息 """
+        return {
+            "requests": self.requests,
+            "upstream": self.upstream,
+            "shared": self.shared,
+        }
+
+    def _purge(self, now):
+        """ 清理已结束且超出窗口的请求，最多每个窗口一次，调用方需持有 self.lock """
+        if now - self.last_purge < self.window:
+            return
+        self.last_purge = now
+        expired = [prompt for prompt, flight in self.flights.items()
+                   if flight.event.is_set() and now - flight.started >= self.window]
+        for prompt in expired:
+            del self.flights[prompt]
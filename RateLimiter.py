@@ -0,0 +1,65 @@
+import time
+import threading
+from collections import OrderedDict
+
+
+class RateLimiter:
+    """
+    按键(用户ID)限流的令牌桶。
+
+    每个键的令牌以每秒 rate 个的速度恢复，最多累积 burst 个，每次请求消耗 cost 个，令牌不足时拒绝；rate 为 0 时不限制令牌。
+    min_interval 大于 0 时，距同一个键上一次放行不足 min_interval 秒的请求也被拒绝，用于丢弃重复投递的消息。
+    最多记录 max_entries 个键，超出时淘汰最久未使用的键；被淘汰的键再次出现时按令牌已满处理，
+    因此淘汰只会放宽限制，不会误拒绝。
+    """
+
+    def __init__(self, rate, burst, max_entries=10000, min_interval=0):
+        self.rate = rate
+        self.burst = burst
+        self.max_entries = max_entries
+        self.min_interval = min_interval
+        # 键 -> (剩余令牌数, 更新时间(monotonic), 上一次放行时间(monotonic))，按最近使用排序
+        self.buckets = OrderedDict()
+        self.lock = threading.Lock()
+        # 统计信息
+        self.allowed = 0
+        self.rejected = 0
+        self.evicted = 0
+
+    def __len__(self):
+        return len(self.buckets)
+
+    def allow(self, key, cost=1):
+        """ 消耗 cost 个令牌，令牌不足时返回 False """
+        now = time.monotonic()
+        with self.lock:
+            bucket = self.buckets.get(key)
+            if bucket is None:
+                tokens = self.burst
+                last_allowed = None
+            else:
+                tokens = min(self.burst, bucket[0] + (now - bucket[1]) * self.rate)
+                last_allowed = bucket[2]
+                self.buckets.move_to_end(key)
+            allowed = (self.rate <= 0 or tokens >= cost) and (last_allowed is None or now - last_allowed >= self.min_interval)
+            if allowed:
+                if self.rate > 0:
+                    tokens -= cost
+                last_allowed = now
+                self.allowed += 1
+            else:
+                self.rejected += 1
+            self.buckets[key] = (tokens, now, last_allowed)
+            if len(self.buckets) > self.max_entries:
+                self.buckets.popitem(last=False)
+                self.evicted += 1
+            return allowed
+
+    def get_stats(self):
+        """ 获取限流统计信息 """
+        return {
+            "entries": len(self.buckets),
+            "allowed": self.allowed,
+            "rejected": self.rejected,
+            "evicted": self.evicted,
+        }
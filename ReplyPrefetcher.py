@@ -0,0 +1,120 @@
+import time
+import threading
+from common.log import logger
+from plugins.SimpleTimeTask.TaskScheduler import TaskScheduler
+from plugins.SimpleTimeTask.TaskDispatcher import TaskDispatcher
+
+
+class ReplyPrefetcher:
+    """
+    GPT 回复预取。
+
+    在任务下一次触发前 lead_time 秒生成回复，按 (任务ID, 触发时间) 缓存，
+    到期发送时直接取用；缓存在触发时间之后 ttl 秒过期。预取失败或未完成时由调用方即时生成。
+    预取时间复用 TaskScheduler 的最小堆，生成在独立的 TaskDispatcher 线程池中执行，不占用发送线程。
+    """
+
+    # 距离触发时间太近时不再预取，避免与触发时的即时生成重复
+    MIN_LEAD = 10
+
+    def __init__(self, generator, lead_time=120, ttl=300, max_workers=2, name="SimpleTimeTask_prefetch"):
+        # 生成回复的函数，参数为 (task, fire_time)，失败时返回 None
+        self.generator = generator
+        self.lead_time = lead_time
+        self.ttl = ttl
+        self.scheduler = TaskScheduler()
+        self.dispatcher = TaskDispatcher(self._prefetch, max_workers=max_workers, timeout=lead_time, name=f"{name}_worker")
+        self.lock = threading.Lock()
+        # 任务ID -> (任务, 触发时间)，等待预取
+        self.pending = {}
+        # (任务ID, 触发时间) -> (回复, 过期时间)
+        self.cache = {}
+        self.last_purge = time.time()
+        # 统计信息
+        self.prefetched = 0
+        self.failures = 0
+        self.hits = 0
+        self.misses = 0
+        self.thread = threading.Thread(target=self._run, name=name)
+        self.thread.daemon = True
+
+    def start(self):
+        """ 启动预取线程 """
+        self.dispatcher.start()
+        self.thread.start()
+
+    def schedule(self, task, fire_time):
+        """ 安排在 fire_time 前预取任务的回复，重复调用时以最后一次为准 """
+        now = time.time()
+        if fire_time - now < self.MIN_LEAD:
+            return
+        with self.lock:
+            self.pending[task.task_id] = (task, fire_time)
+        self.scheduler.push(task.task_id, max(now, fire_time - self.lead_time))
+
+    def remove(self, task_id):
+        """ 取消任务的预取 """
+        with self.lock:
+            if self.pending.pop(task_id, None) is None:
+                return
+        self.scheduler.remove(task_id)
+
+    def take(self, task_id, fire_time):
+        """ 取出预取的回复，没有或已过期时返回 None """
+        with self.lock:
+            entry = self.cache.pop((task_id, fire_time), None)
+        if entry is None or entry[1] < time.time():
+            self.misses += 1
+            return None
+        self.hits += 1
+        return entry[0]
+
+    def get_stats(self):
+        """ 获取预取统计信息 """
+        return {
+            "pending": len(self.pending),
+            "cached": len(self.cache),
+            "prefetched": self.prefetched,
+            "failures": self.failures,
+            "hits": self.hits,
+            "misses": self.misses,
+        }
+
+    def stop(self):
+        """ 停止预取 """
+        self.scheduler.stop()
+        self.dispatcher.stop()
+
+    def _run(self):
+        while not self.scheduler.stopped:
+            for _, task_id in self.scheduler.wait_due(60):
+                with self.lock:
+                    entry = self.pending.pop(task_id, None)
+                if entry is not None:
+                    self.dispatcher.submit(*entry)
+            self._purge()
+
+    def _prefetch(self, task, fire_time):
+        reply = None
+        try:
+            reply = self.generator(task, fire_time)
+        except Exception as e:
+            logger.warning(f"[SimpleTimeTask] 预取任务 {task.task_id} 的回复失败: {e}")
+        if reply is None:
+            self.failures += 1
+            return
+        with self.lock:
+            self.cache[(task.task_id, fire_time)] = (reply, fire_time + self.ttl)
+        self.prefetched += 1
+        logger.debug(f"[SimpleTimeTask] 已预取任务 {task.task_id} 在 {fire_time} 的回复")
+
+    def _purge(self):
+        """ 清理过期的缓存，最多每分钟一次 """
+        now = time.time()
+        if now - self.last_purge < 60:
+            return
+        self.last_purge = now
+        with self.lock:
+            expired = [key for key, (_, expires_at) in self.cache.items() if expires_at < now]
+            for key in expired:
+                del self.cache[key]
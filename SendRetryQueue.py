@@ -0,0 +1,103 @@
+import time
+import random
+import threading
+from common.log import logger
+from plugins.SimpleTimeTask.TaskScheduler import TaskScheduler
+
+
+class SendRetryQueue:
+    """
+    发送失败消息的延迟重试队列。
+
+    发送失败的消息放入队列后立即返回，不占用分发线程；后台线程按指数退避加随机抖动的时间重试，
+    达到最大尝试次数或插件停止时仍未成功的消息交给 on_dead 记录为死信。
+    重试时间复用 TaskScheduler 的最小堆，键为每条消息的序号。
+    """
+
+    def __init__(self, sender, on_dead, max_attempts=3, base_delay=3, max_delay=300, jitter=0.2, name="SimpleTimeTask_retry"):
+        # 发送函数，参数为 (reply, context)，失败时抛出异常
+        self.sender = sender
+        # 死信记录函数，参数为 (任务ID, reply, context, 尝试次数, 最后一次错误)
+        self.on_dead = on_dead
+        self.max_attempts = max(1, int(max_attempts))
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.jitter = jitter
+        self.scheduler = TaskScheduler()
+        self.lock = threading.Lock()
+        # 序号 -> [任务ID, reply, context, 已尝试次数, 最后一次错误]
+        self.entries = {}
+        self.seq = 0
+        # 统计信息
+        self.retries = 0
+        self.recovered = 0
+        self.dead = 0
+        self.thread = threading.Thread(target=self._run, name=name)
+        self.thread.daemon = True
+        self.thread.start()
+
+    def __len__(self):
+        return len(self.entries)
+
+    def add(self, task_id, reply, context, error, attempts=1):
+        """ 登记一次失败的发送，按退避时间安排重试 """
+        if attempts >= self.max_attempts:
+            self._dead([task_id, reply, context, attempts, error])
+            return
+        with self.lock:
+            self.seq += 1
+            key = self.seq
+            self.entries[key] = [task_id, reply, context, attempts, error]
+        delay = self.get_delay(attempts)
+        logger.warning(f"[SimpleTimeTask] 任务 {task_id} 第 {attempts} 次发送失败，{delay:.1f}s 后重试: {error}")
+        self.scheduler.push(key, time.time() + delay)
+
+    def get_delay(self, attempts):
+        """ 第 attempts 次失败后的重试等待时间(秒) """
+        delay = min(self.max_delay, self.base_delay * (2 ** (attempts - 1)))
+        return delay * random.uniform(1 - self.jitter, 1 + self.jitter)
+
+    def get_stats(self):
+        """ 获取重试统计信息 """
+        return {
+            "pending": len(self.entries),
+            "retries": self.retries,
+            "recovered": self.recovered,
+            "dead": self.dead,
+        }
+
+    def stop(self):
+        """ 停止重试，尚未成功的消息记录为死信 """
+        self.scheduler.stop()
+        if self.thread is not threading.current_thread():
+            self.thread.join(timeout=5)
+        with self.lock:
+            entries, self.entries = list(self.entries.values()), {}
+        for entry in entries:
+            entry[4] = f"插件停止时仍未发送成功: {entry[4]}"
+            self._dead(entry)
+
+    def _run(self):
+        while not self.scheduler.stopped:
+            for _, key in self.scheduler.wait_due(60):
+                with self.lock:
+                    entry = self.entries.pop(key, None)
+                if entry is None:
+                    continue
+                task_id, reply, context, attempts, _ = entry
+                self.retries += 1
+                try:
+                    self.sender(reply, context)
+                    self.recovered += 1
+                    logger.info(f"[SimpleTimeTask] 任务 {task_id} 第 {attempts + 1} 次发送成功")
+                except Exception as e:
+                    self.add(task_id, reply, context, e, attempts + 1)
+
+    def _dead(self, entry):
+        self.dead += 1
+        task_id, _, _, attempts, error = entry
+        logger.error(f"[SimpleTimeTask] 任务 {task_id} 发送失败，已尝试 {attempts} 次: {error}")
+        try:
+            self.on_dead(*entry)
+        except Exception as e:
+            logger.error(f"[SimpleTimeTask] 记录死信失败: {e}")
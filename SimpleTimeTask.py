@@ -1,13 +1,11 @@
 # encoding:utf-8
-import re
-import gc
+import csv
+import json
 import time
+import datetime
+import atexit
 import random
 import plugins
-import sqlite3
-import calendar
-import shutil
-import datetime
 import threading
 from plugins import *
 from lib import itchat
@@ -19,9 +17,26 @@ from channel import channel_factory
 from wcwidth import wcswidth, wcwidth
 from bridge.reply import Reply, ReplyType
 from bridge.context import ContextType, Context
-from channel.chat_message import ChatMessage
 from channel.wechat.wechat_channel import WechatChannel
 from plugins.SimpleTimeTask.Task import Task
+from plugins.SimpleTimeTask.ChannelProvider import ChannelProvider
+from plugins.SimpleTimeTask.ContextFactory import ContextFactory
+from plugins.SimpleTimeTask.SendRetryQueue import SendRetryQueue
+from plugins.SimpleTimeTask.ReplyPrefetcher import ReplyPrefetcher
+from plugins.SimpleTimeTask.PromptCoalescer import PromptCoalescer
+from plugins.SimpleTimeTask.Metrics import Metrics, MetricsWriter
+from plugins.SimpleTimeTask.TaskScheduler import TaskScheduler
+from plugins.SimpleTimeTask.GroupCache import GroupCache
+from plugins.SimpleTimeTask.LeaseCoordinator import LeaseCoordinator
+from plugins.SimpleTimeTask.RateLimiter import RateLimiter
+from plugins.SimpleTimeTask.TaskDispatcher import TaskDispatcher
+from plugins.SimpleTimeTask.TaskIndex import TaskIndex
+from plugins.SimpleTimeTask.TaskRule import compile_rule, build_frequency_grammar, set_work_calendar, get_zone
+from plugins.SimpleTimeTask.TaskStore import TaskStore, TaskWriteQueue
+from plugins.SimpleTimeTask.WorkCalendar import load_work_calendar
+
+# 插件指令的前缀
+COMMAND_PREFIX = "/time"
 
 
 @plugins.register(
@@ -36,66 +51,211 @@ class SimpleTimeTask(Plugin):
     def __init__(self):
         super().__init__()
         try:
-            self.config = super().load_config()
+            # 记录启动耗时，任务和群聊映射在后台加载，不阻塞启动
+            self.start_time = time.perf_counter()
+            self.first_tick_seconds = None
+            self.config = super().load_config() or {}
             self.handlers[Event.ON_HANDLE_CONTEXT] = self.on_handle_context
-            self.chatrooms = {}
+            # 运行指标，可通过 /time 状态 查看，并定期写入 Prometheus 文本文件
+            self.metrics = Metrics()
+            # 调度延迟超过该值(秒)的触发计为迟到
+            self.late_fire_threshold = self.config.get("late_fire_threshold", 60)
+            # 最近一次调度的时间
+            self.last_tick_time = 0
             # 获取协议类型
             self.channel_type = conf().get("channel_type")
-            if self.channel_type == "gewechat":
-                # 设置群映射关系
-                self.get_group_map()
+            self.gewe_client = None
+            # 触发任务时构造消息上下文，消息模板只解析一次
+            self.context_factory = ContextFactory(WechatChannel)
+            # 发送消息的通道，每种协议只创建一次
+            self.channel_provider = ChannelProvider(channel_factory.create_channel)
+            # 群标题到群ID的缓存，首次获取和定时刷新都在后台进行
+            self.group_cache = GroupCache(
+                self.fetch_group_map,
+                ttl=self.config.get("group_cache_ttl", 600),
+                miss_refresh_interval=self.config.get("group_miss_refresh_interval", 60),
+            )
+            self.group_cache.start()
             # 线程名
             self.daemon_name = "SimpleTimeTask_daemon"
             # 定义数据库路径
             self.DB_FILE_PATH = "plugins/SimpleTimeTask/simple_time_task.db"
             # 创建数据库锁
             self.db_lock = threading.Lock()
-            # 初始化数据库并加载任务到内存
+            # 打开数据库，整个插件生命周期共用一个连接
+            self.store = TaskStore(self.DB_FILE_PATH, synchronous=self.config.get("db_synchronous", "NORMAL"))
+            # 任务写操作合并后批量提交，进程退出时写入剩余操作
+            self.write_queue = TaskWriteQueue(
+                self.store,
+                batch_size=self.config.get("db_batch_size", 200),
+                flush_interval=self.config.get("db_flush_interval", 1.0),
+            )
+            atexit.register(self.write_queue.close)
+            # 发送失败的消息延迟重试，不占用分发线程，重试次数用尽后记录到 dead_letters 表
+            self.retry_queue = SendRetryQueue(
+                self.send_reply,
+                self.record_dead_letter,
+                max_attempts=self.config.get("send_max_attempts", 3),
+                base_delay=self.config.get("send_retry_delay", 3),
+                max_delay=self.config.get("send_retry_max_delay", 300),
+                jitter=self.config.get("send_retry_jitter", 0.2),
+            )
+            # 磁盘模式：内存中只保留 load_window 秒内需要触发的任务，其余任务只保存在数据库中
+            self.disk_backed = self.config.get("disk_backed", False)
+            self.load_window = self.config.get("load_window", 3600)
+            # 当前已加载的时间窗口的结束时间
+            self.window_end = 0
+            # 按下一次触发时间调度任务
+            self.scheduler = TaskScheduler()
+            # 相同提示词的 GPT 请求在窗口内合并为一次，window 为 0 时不合并
+            self.coalescer = None
+            if self.config.get("gpt_coalesce_window", 60) > 0:
+                self.coalescer = PromptCoalescer(
+                    window=self.config.get("gpt_coalesce_window", 60),
+                    wait_timeout=self.config.get("task_timeout", 60),
+                )
+            # 不参与合并的任务ID
+            self.coalesce_exclude = set(self.config.get("gpt_coalesce_exclude", []))
+            # 可选：在触发前预取 GPT 回复，到期时直接发送
+            self.prefetcher = None
+            if self.config.get("gpt_prefetch", False):
+                self.prefetcher = ReplyPrefetcher(
+                    self.prefetch_reply,
+                    lead_time=self.config.get("gpt_prefetch_lead", 120),
+                    ttl=self.config.get("gpt_prefetch_ttl", 300),
+                    max_workers=self.config.get("gpt_prefetch_workers", 2),
+                )
+            # 可选：多个进程共用一个数据库时，按租约协调由哪个进程触发任务
+            self.coordinator = None
+            if self.config.get("coordination", False):
+                self.coordinator = LeaseCoordinator(
+                    self.store,
+                    shard_count=self.config.get("shard_count", 1),
+                    ttl=self.config.get("lease_ttl", 15),
+                    heartbeat=self.config.get("lease_heartbeat", 5),
+                    on_acquire=self.request_task_refresh,
+                    before_release=self.write_queue.flush,
+                )
+            # 协调模式下同步其他进程添加或删除的任务的间隔(秒)
+            self.task_sync_interval = self.config.get("task_sync_interval", 30)
+            self.last_task_sync = time.time()
+            # 已同步到的任务变更序号，变更日志保留的时长(秒)
+            self.last_change_seq = 0
+            self.task_change_retention = max(3600, self.task_sync_interval * 10)
+            # 同步或接管时，数据库中的触发时间在该时长(秒)内的任务从该时间开始调度，错过的触发立即补发：
+            # 覆盖持有者失去响应到被接管(lease_ttl + lease_heartbeat)以及变更同步(task_sync_interval)的延迟
+            self.catch_up_window = self.config.get("lease_ttl", 15) + self.config.get("lease_heartbeat", 5) + self.task_sync_interval
+            # 获取到新分片后，由调度线程从数据库刷新即将触发的任务
+            self.refresh_requested = False
+            # 初始化数据库并加载任务到内存，按用户和目标群建立索引
             self.tasks = {}
-            self.init_db_and_load_tasks()
-            # 此值用于记录上一次重置任务状态的时间()初始化
-            self.last_reset_task_date = "1970-01-01"
-            # 防抖动字典
-            self.user_last_processed_time = {}
+            # 任务表中每个任务格式化后的行，任务ID -> (处理状态, 行)
+            self.task_rows = {}
+            self.user_index = TaskIndex("user_id")
+            self.group_index = TaskIndex("group_title")
+            # 启动时每批从数据库加载的任务数
+            self.load_chunk_size = self.config.get("load_chunk_size", 1000)
+            # 任务加载完成前，任务列表和取消任务直接查询数据库
+            self.tasks_loaded = threading.Event()
+            # 指令中的频率写法到任务频率的映射，只构建一次
+            self.frequency_grammar = build_frequency_grammar()
+            # 任务列表每页显示的任务数
+            self.list_page_size = self.config.get("list_page_size", 10)
+            # 批量添加的回复中最多列出的错误行数
+            self.batch_error_limit = self.config.get("batch_error_limit", 20)
+            # 工作日历：work_day 任务跳过法定节假日，调休上班日照常触发；配置为空时按周一至周五计算
+            calendar_file = self.config.get("workday_calendar_file", "plugins/SimpleTimeTask/workday_calendar.json")
+            set_work_calendar(load_work_calendar(calendar_file) if calendar_file else None)
+            db_start = time.perf_counter()
+            self.init_db()
+            db_seconds = time.perf_counter() - db_start
+            if self.coordinator is not None:
+                self.coordinator.start()
+            # 下一次重置任务状态的时间(本机时区的零点时间戳)，调度时只做整数比较
+            self.next_reset_time = self.calc_next_reset_time(time.time())
+            # 按用户限流：指令频率和添加任务频率分别使用令牌桶，最多记录 rate_limit_max_users 个用户，管理员不受限制
+            max_users = self.config.get("rate_limit_max_users", 10000)
+            self.command_limiter = None
+            if self.config.get("command_rate", 1) > 0:
+                self.command_limiter = RateLimiter(self.config.get("command_rate", 1), self.config.get("command_burst", 5), max_users)
+            # 同一用户间隔不足 command_min_interval 秒的指令视为重复投递，直接忽略
+            self.command_dedup = None
+            if self.config.get("command_min_interval", 0.1) > 0:
+                self.command_dedup = RateLimiter(0, 1, max_users, min_interval=self.config.get("command_min_interval", 0.1))
+            # 超出指令频率时回复提示，每个用户每 command_notice_interval 秒最多提示一次，其余超出的指令直接忽略
+            self.command_notice_limiter = RateLimiter(0, 1, max_users, min_interval=self.config.get("command_notice_interval", 60))
+            self.task_create_limiter = None
+            if self.config.get("task_create_rate", 0.2) > 0:
+                self.task_create_limiter = RateLimiter(self.config.get("task_create_rate", 0.2), self.config.get("task_create_burst", 10), max_users)
+            # 每个用户最多拥有的任务数，0 表示不限制
+            self.max_tasks_per_user = self.config.get("max_tasks_per_user", 0)
             # 检查线程是否关闭
             self.check_daemon()
-            # 启动任务检查线程
+            # 启动任务分发线程池，调度线程只负责将到期任务放入队列
+            self.dispatcher = TaskDispatcher(
+                self.run_with_timeout,
+                max_workers=self.config.get("dispatch_workers", 4),
+                timeout=self.config.get("task_timeout", 60),
+            )
+            self.dispatcher.start()
+            if self.prefetcher is not None:
+                self.prefetcher.start()
+            # 注册组件指标，定期写入指标文件
+            self.register_metrics()
+            self.metrics_writer = None
+            metrics_file = self.config.get("metrics_file", "plugins/SimpleTimeTask/metrics.prom")
+            if metrics_file:
+                self.metrics_writer = MetricsWriter(self.metrics, metrics_file, interval=self.config.get("metrics_interval", 60))
+                self.metrics_writer.start()
+            # 启动任务检查线程，由其分批加载任务
             self.check_thread = threading.Thread(target=self.check_and_trigger_tasks, name=self.daemon_name)
             self.check_thread.daemon = True
+            # 记录线程所属的插件实例，重新加载插件时用于停止旧的调度线程
+            self.check_thread.plugin = self
             self.check_thread.start()
             # 初始化完成
-            logger.info("[SimpleTimeTask] initialized")
+            logger.info(f"[SimpleTimeTask] initialized in {(time.perf_counter() - self.start_time) * 1000:.0f}ms "
+                        f"(数据库初始化 {db_seconds * 1000:.0f}ms)，任务和群聊映射在后台加载")
 
         except Exception as e:
             logger.error(f"[SimpleTimeTask] initialization error: {e}")
             raise "[SimpleTimeTask] init failed, ignore "
 
-    def get_group_map(self):
-        from lib.gewechat.client import GewechatClient
-        try:
-            self.gewe_base_url = conf().get("gewechat_base_url")
-            self.gewe_token = conf().get("gewechat_token")
-            self.gewe_app_id = conf().get("gewechat_app_id")
-            self.gewe_client = GewechatClient(self.gewe_base_url, self.gewe_token)
+    def fetch_group_map(self):
+        """ 获取群标题到群ID的映射，失败时返回 None """
+        groups = {}
+        if self.channel_type == "gewechat":
+            if self.gewe_client is None:
+                from lib.gewechat.client import GewechatClient
+                self.gewe_base_url = conf().get("gewechat_base_url")
+                self.gewe_token = conf().get("gewechat_token")
+                self.gewe_app_id = conf().get("gewechat_app_id")
+                self.gewe_client = GewechatClient(self.gewe_base_url, self.gewe_token)
 
             # 获取通讯录列表
             result = self.gewe_client.fetch_contacts_list(self.gewe_app_id)
-            if result and result['ret'] == 200:
-                chatrooms = result['data']['chatrooms']
-                brief_info = self.gewe_client.get_brief_info(self.gewe_app_id, chatrooms)
-                logger.info(f"[SimpleTimeTask] 群聊简要信息: \n{brief_info}")
-                if brief_info and brief_info['ret'] == 200:
-                    self.chatrooms = brief_info['data']
-                else:
-                        logger.error(f"[SimpleTimeTask] 获取群聊标题映射失败! group_id: {chatrooms}")
-                logger.debug(f"[SimpleTimeTask] 群聊映射关系: \n{self.chatrooms}")
-            else:
+            if not result or result['ret'] != 200:
                 error_info = None
                 if result:
                     error_info = f"ret: {result['ret']} msg: {result['msg']}"
                 logger.error(f"[SimpleTimeTask] 获取WX通讯录列表失败! {error_info}")
-        except Exception as e:
-            logger.error(f"[SimpleTimeTask] 设置群聊映射关系失败! {e}")
+                return None
+
+            chatrooms = result['data']['chatrooms']
+            brief_info = self.gewe_client.get_brief_info(self.gewe_app_id, chatrooms)
+            logger.debug(f"[SimpleTimeTask] 群聊简要信息: \n{brief_info}")
+            if not brief_info or brief_info['ret'] != 200:
+                logger.error(f"[SimpleTimeTask] 获取群聊标题映射失败! group_id: {chatrooms}")
+                return None
+            for chat_room in brief_info['data']:
+                # 群标题重复时保留第一个
+                groups.setdefault(chat_room["nickName"], chat_room["userName"])
+        else:
+            # 从服务器更新群聊列表
+            for chat_room in itchat.get_chatrooms(update=True):
+                groups.setdefault(chat_room["NickName"], chat_room["UserName"])
+        logger.debug(f"[SimpleTimeTask] 群聊映射关系: \n{groups}")
+        return groups
 
     def check_daemon(self):
         target_thread = None
@@ -106,77 +266,210 @@ class SimpleTimeTask(Plugin):
                 break
         # 回收线程
         if target_thread:
-            # 关闭线程
-            target_thread._stop()
+            old_plugin = getattr(target_thread, "plugin", None)
+            if old_plugin is not None:
+                # 通知旧插件实例停止调度，线程会在唤醒后退出
+                old_plugin.shutdown()
+            else:
+                # 旧版本创建的线程无法从外部停止，需要重启进程
+                logger.warning("[SimpleTimeTask] 检测到旧版本的调度线程仍在运行，无法停止，请重启进程以避免任务重复触发")
         # 没有找到同名线程
         return None
 
-    def init_db_and_load_tasks(self):
-        """ 初始化数据库，创建任务表并加载现有任务 """
+    def shutdown(self):
+        """ 停止调度线程，在插件重新加载时调用 """
+        logger.info("[SimpleTimeTask] shutting down scheduler")
+        self.scheduler.stop()
+        self.dispatcher.stop()
+        if self.prefetcher is not None:
+            self.prefetcher.stop()
+        self.group_cache.stop()
+        # 等待调度线程结束当前的处理后再关闭数据库
+        if self.check_thread is not threading.current_thread():
+            self.check_thread.join(timeout=5)
+        self.retry_queue.stop()
+        if self.coordinator is not None:
+            # 释放租约，其他进程无需等待租约过期即可接管
+            self.coordinator.stop()
+        if self.metrics_writer is not None:
+            self.metrics_writer.stop()
+        self.write_queue.close()
+        # 注销退出时的写入，避免 atexit 持有已停止的插件实例直到进程退出
+        atexit.unregister(self.write_queue.close)
+        self.store.close()
+        self.channel_provider.close()
+
+    def register_metrics(self):
+        """ 注册导出时从各组件读取的指标 """
+        metrics = self.metrics
+        metrics.add_collector("tasks_in_memory", "gauge", lambda: len(self.tasks), help="内存中的任务数")
+        metrics.add_collector("scheduled_tasks", "gauge", lambda: len(self.scheduler), help="已调度的任务数")
+        metrics.add_collector("tasks_loaded", "gauge", lambda: int(self.tasks_loaded.is_set()), help="启动时的任务加载是否已完成")
+        metrics.add_collector("first_tick_seconds", "gauge", lambda: self.first_tick_seconds or 0, help="插件启动到首次调度完成的耗时")
+        metrics.add_collector("last_tick_timestamp_seconds", "gauge", lambda: self.last_tick_time, help="最近一次调度的时间，长时间不更新说明调度线程已停止")
+        metrics.add_collector("dispatch_queue_depth", "gauge", lambda: self.dispatcher.queue.qsize(), help="等待执行的任务数")
+        metrics.add_collector("dispatch_busy_workers", "gauge", lambda: self.dispatcher.get_stats()["busy_workers"], help="正在执行任务的线程数")
+        metrics.add_collector("dispatch_timed_out_workers", "gauge", lambda: self.dispatcher.timed_out_workers, help="已超时仍在运行的线程数")
+        metrics.add_collector("dispatch_timeouts_total", "counter", lambda: self.dispatcher.timeouts, help="任务执行超时次数")
+        metrics.add_collector("dispatch_failed_total", "counter", lambda: self.dispatcher.failed, help="任务执行异常次数")
+        metrics.add_collector("write_queue_pending", "gauge", lambda: len(self.write_queue), help="等待写入数据库的操作数")
+        metrics.add_collector("retry_queue_pending", "gauge", lambda: len(self.retry_queue), help="等待重试的消息数")
+        metrics.add_collector("send_retries_total", "counter", lambda: self.retry_queue.retries, help="消息重试次数")
+        metrics.add_collector("send_recovered_total", "counter", lambda: self.retry_queue.recovered, help="重试后发送成功的消息数")
+        metrics.add_collector("dead_letters_total", "counter", lambda: self.retry_queue.dead, help="重试次数用尽的消息数")
+        metrics.add_collector("group_cache_hits_total", "counter", lambda: self.group_cache.hits, help="群ID缓存命中次数")
+        metrics.add_collector("group_cache_misses_total", "counter", lambda: self.group_cache.misses, help="群ID缓存未命中次数")
+        if self.coalescer is not None:
+            metrics.add_collector("gpt_coalesced_total", "counter", lambda: self.coalescer.shared, help="合并到相同提示词请求的 GPT 请求数")
+        if self.command_limiter is not None:
+            metrics.add_collector("command_limiter_entries", "gauge", lambda: len(self.command_limiter), help="指令限流记录的用户数")
+        if self.task_create_limiter is not None:
+            metrics.add_collector("task_create_limiter_entries", "gauge", lambda: len(self.task_create_limiter), help="添加任务限流记录的用户数")
+        if self.coordinator is not None:
+            metrics.add_collector("lease_shards_held", "gauge", lambda: len(self.coordinator.held), help="当前进程持有的分片数")
+            metrics.add_collector("lease_lost_total", "counter", lambda: self.coordinator.lost, help="被其他进程接管的分片数")
+        if self.prefetcher is not None:
+            metrics.add_collector("gpt_prefetch_hits_total", "counter", lambda: self.prefetcher.hits, help="使用预取回复的次数")
+            metrics.add_collector("gpt_prefetch_misses_total", "counter", lambda: self.prefetcher.misses, help="没有可用预取回复的次数")
+
+    def get_status_text(self):
+        """ 获取运行状态 """
+        metrics = self.metrics
+
+        def describe(name):
+            histogram = metrics.get_histogram(name)
+            if histogram is None or not histogram.count:
+                return "无数据"
+            return (f"{histogram.count} 次, 平均 {histogram.sum / histogram.count * 1000:.0f}ms, "
+                    f"p50≤{histogram.quantile(0.5) * 1000:.0f}ms, p99≤{histogram.quantile(0.99) * 1000:.0f}ms, "
+                    f"最大 {histogram.max * 1000:.0f}ms")
+
+        dispatch = self.dispatcher.get_stats()
+        last_tick = f"{time.time() - self.last_tick_time:.0f} 秒前" if self.last_tick_time else "尚未调度"
+        lines = [
+            "[SimpleTimeTask] 运行状态",
+            f"任务: 内存中 {len(self.tasks)} 个, 已调度 {len(self.scheduler)} 个{'' if self.tasks_loaded.is_set() else ', 加载中'}",
+            f"调度: {metrics.get_counter('ticks_total')} 次, 最近一次 {last_tick}",
+            f"调度耗时: {describe('tick_duration_seconds')}",
+            f"触发延迟: {describe('dispatch_lag_seconds')}",
+            f"迟到: {metrics.get_counter('late_fires_total')} 次, 跳过: {metrics.get_counter('missed_fires_total')} 次, "
+            f"错过时刻: {metrics.get_counter('skipped_slots_total')} 个",
+            f"送达延迟: {describe('delivery_latency_seconds')}",
+            f"GPT 生成: {describe('gpt_generation_seconds')}, 失败 {metrics.get_counter('gpt_failures_total')} 次",
+            f"发送: {describe('send_duration_seconds')}, 失败 {metrics.get_counter('send_failures_total')} 次",
+            f"重试: {self.retry_queue.retries} 次, 成功 {self.retry_queue.recovered} 次, 死信 {self.retry_queue.dead} 条",
+            f"限流: 记录 {len(self.command_limiter or ())}/{len(self.task_create_limiter or ())} 个用户(指令/添加任务), "
+            f"忽略指令 {metrics.get_counter('command_rate_limited_total')} 次, "
+            f"拒绝添加 {metrics.get_counter('task_create_rate_limited_total') + metrics.get_counter('task_limit_rejected_total')} 次",
+            f"队列: 待执行 {dispatch['queue_depth']}, 忙碌线程 {dispatch['busy_workers']}/{dispatch['max_workers']}, "
+            f"待写入 {len(self.write_queue)}, 待重试 {len(self.retry_queue)}",
+        ]
+        if self.coordinator is not None:
+            shards = ", ".join(str(shard) for shard in sorted(self.coordinator.held)) or "无"
+            lines.append(f"协调: 节点 {self.coordinator.node_id}, 持有分片 {shards} (共 {self.coordinator.shard_count} 个)")
+        return "\n".join(lines)
+
+    def init_db(self):
+        """ 初始化数据库，创建任务表，必要时迁移 """
         with self.db_lock:
-            # 创建数据库连接
-            with sqlite3.connect(self.DB_FILE_PATH) as conn:
-                cursor = conn.cursor()
-
-                # 检查表是否存在并获取元数据
-                cursor.execute("SELECT name FROM sqlite_master WHERE type='table' AND name='tasks';")
-                table_exists = cursor.fetchone() is not None
-
-                if table_exists:
-                    # 表存在，检查字段兼容性
-                    cursor.execute("PRAGMA table_info(tasks);")
-                    columns = cursor.fetchall()
-                    column_names = [column[1] for column in columns]  # 提取字段名
-
-                    expected_columns = [
-                        'id', 'time', 'frequency', 'content',
-                        'target_type', 'user_id', 'user_name',
-                        'user_group_name', 'group_title', 'is_processed'
-                    ]
-
-                    # 检查字段数量与名称是否兼容
-                    if len(column_names) != len(expected_columns) or set(column_names) != set(expected_columns):
-                        logger.warning("[SimpleTimeTask] Database schema is incompatible. Dropping and recreating the tasks table.")
-                        cursor.execute("DROP TABLE tasks;")
-
-                # 创建数据表（如果不存在）
-                cursor.execute('''
-                    CREATE TABLE IF NOT EXISTS tasks (
-                        id TEXT PRIMARY KEY,
-                        time TEXT NOT NULL,
-                        frequency TEXT CHECK(frequency IN ('once', 'work_day', 'every_day')),
-                        content TEXT NOT NULL,
-                        target_type INTEGER DEFAULT 0,
-                        user_id TEXT,
-                        user_name TEXT,
-                        user_group_name TEXT,
-                        group_title TEXT,
-                        is_processed INTEGER DEFAULT 0
-                    )
-                ''')
-
-                # 从数据库中加载当前的任务
-                cursor.execute('SELECT * FROM tasks')
-                # 读取所有任务行
-                rows = cursor.fetchall()
-                logger.info(f"[SimpleTimeTask] Loaded tasks from database: {rows}")
-
-                # 创建 Task 对象并添加到 self.tasks 列表
-                for row in rows:
-                    task = Task(
-                        task_id=row[0],
-                        time_value=row[1],
-                        frequency=row[2],
-                        content=row[3],
-                        target_type=row[4],
-                        user_id=row[5],
-                        user_name=row[6],
-                        user_group_name=row[7],
-                        group_title=row[8],
-                        is_processed=row[9]
-                    )
-                    # 添加 Task 实例到 self.tasks 字典，以 task_id 作为键
-                    self.tasks[task.task_id] = task
+            self.store.init_schema()
+            if self.coordinator is not None:
+                # 协调模式下通过变更日志增量同步其他进程的变更，从当前位置开始，之前的任务由启动加载读取
+                self.store.enable_change_log()
+                self.last_change_seq = self.store.last_change_seq()
+            else:
+                self.store.disable_change_log()
+
+    def load_tasks(self):
+        """
+        在调度线程中加载任务。按任务ID分批读取，每加载一批调度一次，
+        已加载的到期任务不必等待全部任务加载完成即可触发。
+        """
+        start = time.perf_counter()
+        loaded = 0
+        chunks = 0
+        try:
+            if self.disk_backed:
+                # 磁盘模式只加载当前时间窗口内的任务
+                self.fill_next_fire_times()
+                self.load_task_window()
+                loaded = len(self.tasks)
+            else:
+                rows_iter = self.store.iter_tasks(self.load_chunk_size)
+                while not self.scheduler.stopped:
+                    with self.db_lock:
+                        # 先写入加载期间取消的任务，避免读取到已删除的任务
+                        self.write_queue.flush()
+                        rows = next(rows_iter, None)
+                        if rows is None:
+                            break
+                        for row in rows:
+                            # 加载期间添加或同步的任务已在内存中
+                            if row[0] not in self.tasks and self.load_task(self.store.row_to_task(row)):
+                                loaded += 1
+                    chunks += 1
+                    self.run_tick(0)
+        except Exception as e:
+            logger.error(f"[SimpleTimeTask] Failed to load tasks: {e}")
+        finally:
+            self.tasks_loaded.set()
+        logger.info(f"[SimpleTimeTask] Loaded {loaded} tasks from database in {time.perf_counter() - start:.2f}s ({chunks} chunks)")
+
+    def load_task(self, task, catch_up=False):
+        """
+        编译任务的触发规则，添加到内存并调度，规则无效时返回 False
+
+        :param catch_up: 从数据库中的触发时间开始调度，用于同步其他进程添加的任务和接管分片：
+                         该时间在 catch_up_window 秒内时，其他进程未触发的时刻立即补发，更早的时刻跳过
+        """
+        try:
+            task.rule = compile_rule(task.frequency, task.time_value, task.tz)
+        except ValueError as e:
+            logger.error(f"[SimpleTimeTask] Invalid time or frequency format for task ID {task.task_id}: {e}")
+            return False
+        stored_next_fire = task.next_fire
+        # 添加 Task 实例到 self.tasks 字典，以 task_id 作为键
+        self.add_task_to_memory(task)
+        if catch_up and stored_next_fire >= int(time.time()) - self.catch_up_window:
+            self.schedule_task(task, stored_next_fire)
+        else:
+            self.schedule_task(task)
+        if (self.disk_backed or self.coordinator is not None) and task.next_fire != stored_next_fire:
+            # 数据库中的触发时间已过期(例如停机期间错过)，写回重新计算的结果
+            self.write_queue.put_state(task)
+        return True
+
+    def fill_next_fire_times(self):
+        """ 磁盘模式下，为尚未记录下一次触发时间的任务(旧版本数据)计算并写入触发时间 """
+        filled = 0
+        for rows in self.store.iter_tasks(unscheduled_only=True):
+            next_fires = []
+            for row in rows:
+                task = self.store.row_to_task(row)
+                try:
+                    task.rule = compile_rule(task.frequency, task.time_value, task.tz)
+                    fire_time = self.calc_next_fire_time(task)
+                except ValueError as e:
+                    logger.error(f"[SimpleTimeTask] Invalid time or frequency format for task ID {task.task_id}: {e}")
+                    fire_time = None
+                next_fires.append((-1 if fire_time is None else fire_time, task.task_id))
+            self.store.update_next_fires(next_fires)
+            filled += len(next_fires)
+        if filled:
+            logger.info(f"[SimpleTimeTask] Computed next fire time for {filled} tasks")
+
+    def load_task_window(self):
+        """ 磁盘模式下，加载下一个时间窗口内需要触发且尚未加载的任务 """
+        # 先写入待提交的操作，保证读取到最新的触发时间
+        self.write_queue.flush()
+        with self.db_lock:
+            self.window_end = int(time.time()) + self.load_window
+            rows = self.store.load_tasks_due_before(self.window_end)
+            loaded = 0
+            for row in rows:
+                if row[0] not in self.tasks and self.load_task(self.store.row_to_task(row)):
+                    loaded += 1
+            logger.info(f"[SimpleTimeTask] Loaded {loaded} tasks due before {time.strftime('%Y-%m-%d %H:%M', time.localtime(self.window_end))}, {len(self.tasks)} tasks in memory")
 
     def pad_string(self, s: str, total_width: int) -> str:
         """
@@ -213,9 +506,71 @@ class SimpleTimeTask(Plugin):
             return truncated + '...'
         return s
 
+    # 任务表的列及每列的最大显示宽度
+    TABLE_COLUMNS = (
+        ("task_id", 10),
+        ("time", 5),
+        ("frequency", 25),         # 增大频率列宽，确保完整打印
+        ("content", 20),
+        ("type", 4),
+        ("your_name", 10),
+        ("group_name", 10),
+        ("group_title", 14),
+        ("executed", 8),
+    )
+    # 分隔线，例如：+----------+-----+--------+
+    TABLE_SEPARATOR = "+" + "+".join("-" * (width + 2) for _, width in TABLE_COLUMNS) + "+"
+
+    def format_task_row(self, task):
+        """
+        格式化任务在任务表中的一行，结果按任务缓存，只在任务的处理状态变化时重新格式化。
+        每列填充到固定宽度，因此各行可以单独缓存。
+        """
+        cached = self.task_rows.get(task.task_id)
+        if cached is not None and cached[0] == task.is_processed:
+            return cached[1]
+
+        widths = dict(self.TABLE_COLUMNS)
+        user_name = str(task.user_name)
+        row = [
+            # 处理任务ID，如果超过最大宽度，截断并添加省略号
+            self.truncate_string(task.task_id, widths["task_id"], widths["task_id"] - 3),
+            # 处理时间，按原样打印（假设时间格式固定，不需要截断）
+            task.time_value,
+            # 频率部分完整打印，不进行截断
+            task.frequency,
+            # 处理内容，按要求进行截断
+            self.truncate_string(task.content, widths["content"], 17),
+            # 目标类型
+            "group" if task.target_type else "user",
+            # 处理用户昵称，按原样或截断
+            self.truncate_string(user_name, widths["your_name"], widths["your_name"] - 3),
+            # 处理用户群昵称，按原样或截断
+            self.truncate_string(task.user_group_name, widths["group_name"], widths["group_name"] - 3) if task.user_group_name else "None",
+            # 处理群标题，按要求进行截断
+            self.truncate_string(task.group_title, widths["group_title"], 11) if task.group_title else "None",
+            # 是否已处理
+            "yes" if task.is_processed else "no",
+        ]
+        formatted_row = "|" + "|".join(
+            f" {self.pad_string(item, width)} " for item, (_, width) in zip(row, self.TABLE_COLUMNS)
+        ) + "|"
+        self.task_rows[task.task_id] = (task.is_processed, formatted_row)
+        return formatted_row
+
+    def log_task_change(self, action, task, removed=False):
+        """ 记录单个任务的变更，只格式化发生变化的任务，removed 为 True 时同时丢弃该任务的缓存行 """
+        try:
+            logger.info(f"[SimpleTimeTask] 任务{action}: {self.format_task_row(task)}")
+        except Exception as e:
+            logger.error(f"[SimpleTimeTask] 记录任务变更时发生错误: {e}")
+        if removed:
+            self.task_rows.pop(task.task_id, None)
+
     def print_tasks_info(self):
         """
         打印当前 self.tasks 中的所有任务信息，以整齐的表格形式，使用一次 logger 调用。
+        由 /time 打印任务 指令按需调用，每行使用缓存的格式化结果。
         """
         try:
             # 如果没有任务，记录相应日志并返回
@@ -223,108 +578,18 @@ class SimpleTimeTask(Plugin):
                 logger.info("[SimpleTimeTask] 当前没有任务。")
                 return
 
-            # 定义表头
-            headers = [
-                "task_id", "time", "frequency", "content",
-                "type", "your_name",
-                "group_name", "group_title", "executed"
-            ]
-
-            # 定义每个列的最大显示宽度
-            max_widths = {
-                "task_id": 10,
-                "time": 5,
-                "frequency": 25,         # 增大频率列宽，确保完整打印
-                "content": 20,
-                "type": 4,
-                "your_name": 10,
-                "group_name": 10,
-                "group_title": 14,
-                "executed": 8
-            }
-
-            # 收集所有任务的数据，并应用截断
-            tasks_data = []
-            for task in self.tasks.values():
-                # 处理任务ID，如果超过最大宽度，截断并添加省略号
-                task_id = self.truncate_string(task.task_id, max_widths["task_id"], max_widths["task_id"] - 3) if wcswidth(task.task_id) > max_widths["task_id"] else self.pad_string(task.task_id, max_widths["task_id"])
-
-                # 处理时间，按原样打印（假设时间格式固定，不需要截断）
-                time_value = self.pad_string(task.time_value, max_widths["time"])
-
-                # 频率部分完整打印，不进行截断
-                frequency = self.pad_string(task.frequency, max_widths["frequency"])
-
-                # 处理内容，按要求进行截断
-                content = self.truncate_string(task.content, max_widths["content"], 17) if wcswidth(task.content) > max_widths["content"] else self.pad_string(task.content, max_widths["content"])
-
-                # 目标类型，转换为中文描述
-                target_type = self.pad_string("group" if task.target_type else "user", max_widths["type"])
-
-                # 处理用户昵称，按原样或截断
-                user_nickname = self.truncate_string(task.user_name, max_widths["your_name"], max_widths["your_name"] - 3) if wcswidth(task.user_name) > max_widths["your_name"] else self.pad_string(task.user_name, max_widths["your_name"])
-
-                # 处理用户群昵称，按原样或截断
-                if task.user_group_name:
-                    user_group_nickname = self.truncate_string(task.user_group_name, max_widths["group_name"], max_widths["group_name"] - 3) if wcswidth(task.user_group_name) > max_widths["group_name"] else self.pad_string(task.user_group_name, max_widths["group_name"])
-                else:
-                    user_group_nickname = self.pad_string("None", max_widths["group_name"])
-
-                # 处理群标题，按要求进行截断
-                if task.group_title:
-                    group_title = self.truncate_string(task.group_title, max_widths["group_title"], 11) if wcswidth(task.group_title) > max_widths["group_title"] else self.pad_string(task.group_title, max_widths["group_title"])
-                else:
-                    group_title = self.pad_string("None", max_widths["group_title"])
-
-                # 处理是否已处理，转换为中文描述
-                is_processed = self.pad_string("yes" if task.is_processed else "no", max_widths["executed"])
-
-                # 构建任务行
-                row = [
-                    task_id,
-                    time_value,
-                    frequency,
-                    content,
-                    target_type,
-                    user_nickname,
-                    user_group_nickname,
-                    group_title,
-                    is_processed
-                ]
-                tasks_data.append(row)
-
-            # 计算每列的实际宽度（取表头和数据中的最大值，不超过设定的最大宽度）
-            actual_widths = []
-            for idx, header in enumerate(headers):
-                # 获取当前列所有数据的最大显示宽度
-                max_data_width = max(wcswidth(str(row[idx])) for row in tasks_data) if tasks_data else wcswidth(header)
-                # 计算实际宽度，不超过设定的最大宽度
-                actual_width = min(max(wcswidth(header), max_data_width), max_widths[header])
-                actual_widths.append(actual_width)
-
-            # 构建分隔线，例如：+----------+-----+--------+
-            separator = "+------------+-------+---------------------------+----------------------+------+------------+------------+----------------+----------+"
-
             # 构建表头行，例如：| task_id | time | frequency |
             header_row = "|" + "|".join(
-                f" {self.pad_string(header, actual_widths[idx])} " for idx, header in enumerate(headers)
+                f" {self.pad_string(header, width)} " for header, width in self.TABLE_COLUMNS
             ) + "|"
 
-            # 构建所有数据行
-            data_rows = []
-            for row in tasks_data:
-                formatted_row = "|" + "|".join(
-                    f" {self.pad_string(str(item), actual_widths[idx])} " for idx, item in enumerate(row)
-                ) + "|"
-                data_rows.append(formatted_row)
-
             # 组合完整的表格
             table = "\n".join([
-                separator,
+                self.TABLE_SEPARATOR,
                 header_row,
-                separator
-            ] + data_rows + [
-                separator
+                self.TABLE_SEPARATOR
+            ] + [self.format_task_row(task) for task in list(self.tasks.values())] + [
+                self.TABLE_SEPARATOR
             ])
 
             # 使用一次 logger 调用打印所有任务信息
@@ -350,362 +615,310 @@ class SimpleTimeTask(Plugin):
         return user_name
 
     def get_group_id(self, group_title):
-        tempRoomId = None
-        if self.channel_type == "gewechat":
-            # 获取群聊
-            for chat_room in self.chatrooms:
-                # 根据群聊名称匹配群聊ID
-                userName = chat_room["userName"]
-                NickName = chat_room["nickName"]
-                if NickName == group_title:
-                    tempRoomId = userName
-                    break
-        else:
-            # 获取群聊ID
-            chatrooms = itchat.get_chatrooms()
-            # 获取群聊
-            for chat_room in chatrooms:
-                # 根据群聊名称匹配群聊ID
-                userName = chat_room["UserName"]
-                NickName = chat_room["NickName"]
-                if NickName == group_title:
-                    tempRoomId = userName
-                    break
-        return tempRoomId
+        """ 根据群标题获取群ID """
+        return self.group_cache.get(group_title)
 
-    def has_frequency_check_constraint(self):
+    @staticmethod
+    def join_cron_args(command_args):
         """
-        检查 tasks 表的 frequency 字段是否有 CHECK 约束。
-
-        返回:
-            bool: 如果有 CHECK 约束则返回 True，否则返回 False。
+        将按空格拆开的 cron 表达式合并，例如 ['/time', 'cron[*/15', '9-18', '*', '*', '1-5]', '喝水']
+        合并为 ['/time', 'cron', '*/15 9-18 * * 1-5', '喝水']；没有以 ] 结尾的参数时原样返回
         """
-        try:
-            conn = sqlite3.connect(self.DB_FILE_PATH)
-            cursor = conn.cursor()
-            cursor.execute("""
-                SELECT sql FROM sqlite_master
-                WHERE type='table' AND name='tasks';
-            """)
-            result = cursor.fetchone()
-            if result:
-                create_table_sql = result[0]
-                # 打印 CREATE TABLE 语句用于调试
-                logger.debug(f"CREATE TABLE 语句: {create_table_sql}")
-
-                # 查找所有 CHECK 约束
-                checks = re.findall(r'CHECK\s*\((.*?)\)', create_table_sql, re.IGNORECASE | re.DOTALL)
-                logger.debug(f"检测到的 CHECK 约束: {checks}")
-
-                for check in checks:
-                    if 'frequency' in check.lower():
-                        logger.info("检测到涉及 'frequency' 字段的 CHECK 约束。")
-                        return True
-            return False
-        except sqlite3.Error as e:
-            logger.error(f"检查约束失败: {e}")
-            return False
+        for end in range(1, len(command_args)):
+            if command_args[end].endswith(']'):
+                expression = ' '.join(command_args[1:end + 1])[len('cron['):-1].strip()
+                return [command_args[0], 'cron', expression] + command_args[end + 1:]
+        return command_args
 
-    def migrate_tasks_table(self):
+    def parse_task(self, command_args, user_id, user_name, user_group_name):
         """
-        迁移 tasks 表，移除 frequency 字段的 CHECK 约束。
-        数据表路径为 self.DB_FILE_PATH。
-        迁移成功后，删除备份文件。
+        解析添加任务的指令参数并校验时间
 
-        返回:
-            bool: 迁移是否成功。
+        :return: (任务, None)，指令无效时返回 (None, 错误信息)
         """
-        backup_path = self.DB_FILE_PATH + "_backup.db"
+        target_type = 0
+        if command_args[1].startswith('cron['):
+            command_args = self.join_cron_args(command_args)
+        # 获取参数
+        frequency = command_args[1]
+        time_value = command_args[2]
+
+        # 解析末尾的目标群、时区和是否共享 GPT 回复，顺序不限
+        group_title = None
+        tz = None
+        no_coalesce = 0
+        content_args = command_args[3:]
+        while content_args and content_args[-1].endswith(']'):
+            if content_args[-1].startswith('group['):
+                # 获取群聊名称
+                group_title = content_args.pop()[6:-1]
+            elif content_args[-1].startswith('tz['):
+                # 获取时区
+                tz = content_args.pop()[3:-1]
+            elif content_args[-1] in ('coalesce[off]', 'coalesce[on]'):
+                # coalesce[off] 表示 GPT 回复单独生成，不与相同提示词的其他任务共享
+                no_coalesce = int(content_args.pop() == 'coalesce[off]')
+            else:
+                break
+        # 获取任务内容
+        content = ' '.join(content_args)
 
-        try:
-            # 备份数据库文件
-            shutil.copyfile(self.DB_FILE_PATH, backup_path)
-            logger.info(f"数据库已成功备份到 {backup_path}")
-        except IOError as e:
-            logger.error(f"备份数据库失败: {e}")
-            return False
+        # 检查频率、时间和内容是否为空
+        if len(frequency) < 1 or len(time_value) < 1 or len(content) < 1:
+            reply_str = f"[SimpleTimeTask] 任务格式错误: {command_args}\n请使用 '/time 频率 时间 内容' 的格式。"
+            logger.warning(reply_str)
+            return None, reply_str
+
+        logger.debug(f"[SimpleTimeTask] {frequency} {time_value} {content}")
 
         try:
-            # 连接到SQLite数据库
-            conn = sqlite3.connect(self.DB_FILE_PATH)
-            cursor = conn.cursor()
-
-            # 开始事务
-            cursor.execute("BEGIN TRANSACTION;")
-
-            # 重命名现有的 tasks 表为 tasks_old
-            cursor.execute("ALTER TABLE tasks RENAME TO tasks_old;")
-            logger.info("表 'tasks' 已成功重命名为 'tasks_old'")
-
-            # 创建新的 tasks 表，不包含 CHECK 约束
-            cursor.execute('''
-                CREATE TABLE IF NOT EXISTS tasks (
-                    id TEXT PRIMARY KEY,
-                    time TEXT NOT NULL,
-                    frequency TEXT,
-                    content TEXT NOT NULL,
-                    target_type INTEGER DEFAULT 0,
-                    user_id TEXT,
-                    user_name TEXT,
-                    user_group_name TEXT,
-                    group_title TEXT,
-                    is_processed INTEGER DEFAULT 0
-                );
-            ''')
-            logger.info("新的表 'tasks' 已成功创建，不包含 CHECK 约束")
-
-            # 复制数据从 tasks_old 到 新的 tasks 表
-            cursor.execute('''
-                INSERT INTO tasks (id, time, frequency, content, target_type, user_id, user_name, user_group_name, group_title, is_processed)
-                SELECT id, time, frequency, content, target_type, user_id, user_name, user_group_name, group_title, is_processed
-                FROM tasks_old;
-            ''')
-            logger.info("数据已成功从 'tasks_old' 复制到新的 'tasks' 表")
-
-            # 删除旧的 tasks_old 表
-            cursor.execute("DROP TABLE tasks_old;")
-            logger.info("旧表 'tasks_old' 已成功删除")
-
-            # 提交事务
-            conn.commit()
-            logger.info("数据库迁移已成功完成。")
-
-            # 删除备份文件
-            try:
-                os.remove(backup_path)
-                logger.info(f"备份文件 {backup_path} 已成功删除。")
-            except OSError as e:
-                logger.info(f"删除备份文件失败: {e}")
+            zone = get_zone(tz)
+        except ValueError:
+            return None, f"[SimpleTimeTask] 添加任务失败，未知的时区: {tz}"
 
-            return True
+        # 生成任务ID
+        task_id = self.generate_unique_id()
 
-        except sqlite3.Error as e:
-            logger.error(f"数据库迁移失败: {e}")
-            if conn:
-                conn.rollback()
-                logger.info("事务已回滚。")
-            return False
+        # 按频率写法查表，未知的写法为 undefined
+        frequency_token = frequency
+        frequency = self.frequency_grammar.get(frequency_token, "undefined")
+        if frequency == "once":
+            # 为一次性任务设置具体时分，今天和明天按任务的时区计算
+            date = datetime.datetime.now(zone).date()
+            if frequency_token == "明天":
+                date += datetime.timedelta(days=1)
+            # 格式化为 年-月-日 时:分
+            time_value = f"{date.isoformat()} {time_value}"
+
+        logger.debug(f"即将设置的频率为：{frequency}")
+
+        # 检查任务时间的有效性
+        rule = self.validate_time(frequency, time_value, tz)
+        if rule:
+            if group_title:
+                target_type = 1
+            # 创建任务
+            new_task = Task(task_id, time_value, frequency, content, target_type, user_id, user_name, user_group_name, group_title, 0, tz=tz, no_coalesce=no_coalesce)
+            new_task.rule = rule
+            return new_task, None
+        return None, "[SimpleTimeTask] 添加任务失败，时间格式不正确或已过期."
+
+    @staticmethod
+    def format_task_options(task):
+        """ 格式化任务的目标群、时区和合并选项，例如 'group[办公室] tz[Asia/Tokyo] coalesce[off]' """
+        options = []
+        if task.group_title:
+            options.append(f"group[{task.group_title}]")
+        if task.tz:
+            options.append(f"tz[{task.tz}]")
+        if task.no_coalesce:
+            options.append("coalesce[off]")
+        return ' '.join(options)
 
-    def is_valid_monthly(self, frequency):
-        """
-        检查 monthly_x 是否合法。
+    def add_task(self, command_args, user_id, user_name, user_group_name):
+        """ 添加任务 """
+        new_task, reply_str = self.parse_task(command_args, user_id, user_name, user_group_name)
+        if new_task is None:
+            return reply_str
+        with self.db_lock:
+            # 将新任务添加到内存中并调度
+            self.add_task_to_memory(new_task)
+            self.schedule_task(new_task)
+            # 将新任务更新到数据库
+            self.update_task_in_db(new_task)
+            # 格式化回复内容
+            reply_str = f"[SimpleTimeTask] 😸 任务已添加: \n\n[{new_task.task_id}] {new_task.frequency} {new_task.time_value} {new_task.content} {self.format_task_options(new_task)}"
 
-        规则：
-        1. 如果 x 小于等于当前月份的天数，返回 True。
-        2. 如果 x 超过当前月份的天数且当前日期是本月的最后一天，返回 True。
-        3. 其他情况返回 False。
+            # 记录新增的任务；磁盘模式下超出时间窗口的任务已移出内存，不保留其缓存行
+            self.log_task_change("已添加", new_task, removed=new_task.task_id not in self.tasks)
 
-        :param frequency: 字符串，例如 "monthly_30"
-        :return: 布尔值
-        """
-        if not frequency.startswith("monthly_"):
-            return False
+            # 只记录任务数，格式化整个任务字典的开销与任务数成正比
+            logger.debug(f"[SimpleTimeTask] 当前任务数: {len(self.tasks)}")
 
-        try:
-            expected_day = int(frequency.split("_")[1])
-        except (IndexError, ValueError):
-            # 格式不正确或不是整数
-            return False
+        return reply_str
 
-        # 获取当前时间
-        now = time.localtime()
-        year = now.tm_year
-        month = now.tm_mon
-        current_day = now.tm_mday
+    def add_tasks(self, tasks):
+        """
+        批量添加任务：添加到内存并调度后，在一个事务中写入数据库，写入失败时从内存中撤销
 
-        # 获取当前月份的总天数
-        total_days = calendar.monthrange(year, month)[1]
+        :raises sqlite3.Error: 写入数据库失败
+        """
+        with self.db_lock:
+            for task in tasks:
+                self.add_task_to_memory(task)
+                self.schedule_task(task)
+            try:
+                self.store.apply_batch(tasks, [], [])
+            except Exception:
+                for task in tasks:
+                    self.remove_task_from_memory(task.task_id)
+                    self.scheduler.remove(task.task_id)
+                raise
+        logger.info(f"[SimpleTimeTask] 已批量添加 {len(tasks)} 个任务, 当前任务数: {len(self.tasks)}")
+
+    def parse_task_lines(self, lines, user_id, user_name, user_group_name):
+        """
+        解析批量添加的多行指令，每行格式为 '[/time] 频率 时间 内容 [group[群标题]]'，空行忽略
 
-        if expected_day < current_day:
-            # 时间未到，无需触发
-            return False
-        elif expected_day == current_day:
-            # 达到约定日期，返回True，准备触发
-            logger.debug(f"[SimpleTimeTask] trigger month_task frequency: {frequency}")
-            return True
-        else:
-            # 约定日期大于本月最后一天(如设定为31号，但是本月最多只到30号)
-            if current_day == total_days:
-                # 今天已经是本月的最后一天，触发。
-                logger.debug(f"[SimpleTimeTask] expected day({expected_day}) is not in this month, today is the last day, now trigger it!")
-                return True
+        :return: (任务列表, [(行号, 错误信息)])
+        """
+        tasks = []
+        errors = []
+        for line_no, line in enumerate(lines, 1):
+            line = line.strip()
+            if line.startswith('/time'):
+                line = line[len('/time'):].strip()
+            if not line:
+                continue
+            command_args = ['/time'] + line.split()
+            if len(command_args) < 4:
+                errors.append((line_no, "格式错误，请使用 '频率 时间 内容' 的格式"))
+                continue
+            task, error = self.parse_task(command_args, user_id, user_name, user_group_name)
+            if task is None:
+                errors.append((line_no, error.removeprefix("[SimpleTimeTask] ")))
             else:
-                return False
+                tasks.append(task)
+        return tasks, errors
 
-    def add_task(self, command_args, user_id, user_name, user_group_name):
-        """ 添加任务 """
-        # 初始化返回内容
-        reply_str = None
-        target_type = 0
-        with self.db_lock:
-            # 获取参数
-            frequency = command_args[1]
-            time_value = command_args[2]
-            content = ' '.join(command_args[3:])
-
-            # 检查频率和时间是否为空
-            if len(frequency) < 1 or len(time_value) < 1 or len(content) < 1:
-                reply_str = f"[SimpleTimeTask] 任务格式错误: {command_args}\n请使用 '/time 频率 时间 内容' 的格式。"
-                logger.warning(reply_str)
-                return reply_str
-
-            logger.debug(f"[SimpleTimeTask] {frequency} {time_value} {content}")
-
-            # 解析目标群
-            group_title = None
-            if command_args[-1].startswith('group['):
-                # 获取群聊名称
-                group_title = command_args[-1][6:-1]
-                # 获取任务内容
-                content = ' '.join(command_args[3:-1])
-
-            # 生成任务ID
-            task_id = self.generate_unique_id()
-
-            # 处理时间字符串
-            if frequency in ["今天", "明天"]:
-                # 为一次性任务设置具体时分
-                date_str = time.strftime("%Y-%m-%d") if frequency == "今天" else time.strftime("%Y-%m-%d", time.localtime(time.time() + 86400))
-                # 格式化为 年-月-日 时:分
-                time_value = f"{date_str} {time_value}"
-                frequency = "once"
-            elif frequency == "工作日":
-                frequency = "work_day"
-            elif frequency == "每天":
-                frequency = "every_day"
-            elif re.match(r"每周[一二三四五六日天]", frequency):
-                # 处理每周x
-                weekday_map = {
-                    "一": "Monday",
-                    "二": "Tuesday",
-                    "三": "Wednesday",
-                    "四": "Thursday",
-                    "五": "Friday",
-                    "六": "Saturday",
-                    "日": "Sunday",
-                    "天": "Sunday"
-                }
-                day = frequency[-1]
-                english_day = weekday_map.get(day)
-                if english_day:
-                    frequency = f"weekly_{english_day}"
-                else:
-                    # 处理未知的星期
-                    frequency = "undefined"
-            elif re.match(r"每月([1-9]|[12][0-9]|3[01])号", frequency):
-                    # 处理每月x号，确保x为1到31
-                    day_of_month = re.findall(r"每月([1-9]|[12][0-9]|3[01])号", frequency)[0]
-                    frequency = f"monthly_{day_of_month}"
-            elif re.match(r"不含周[一二三四五六日天]", frequency):
-                # 处理不含周x
-                weekday_map = {
-                    "一": "Monday",
-                    "二": "Tuesday",
-                    "三": "Wednesday",
-                    "四": "Thursday",
-                    "五": "Friday",
-                    "六": "Saturday",
-                    "日": "Sunday",
-                    "天": "Sunday"
-                }
-                day = frequency[-1]
-                english_day = weekday_map.get(day)
-                if english_day:
-                    frequency = f"excludeWeekday_{english_day}"
-                else:
-                    # 处理未知的星期
-                    frequency = "undefined"
+    def read_import_file(self, path):
+        """
+        读取导入文件，返回 [(行号, 字段字典)]。
+        CSV 文件第一行为表头，JSON 文件为对象列表；字段为 frequency、time、content，可选 group、tz、coalesce、user_id、user_name。
+        """
+        if path.lower().endswith(".json"):
+            with open(path, encoding="utf-8") as f:
+                items = json.load(f)
+            if not isinstance(items, list):
+                raise ValueError("JSON 文件的内容应为任务列表")
+            return list(enumerate(items, 1))
+        with open(path, encoding="utf-8-sig", newline="") as f:
+            reader = csv.DictReader(f)
+            return [(reader.line_num, row) for row in reader]
+
+    def import_tasks(self, path, user_id, user_name):
+        """ 从本地 CSV 或 JSON 文件导入任务，未指定 user_id 的任务属于导入者 """
+        try:
+            items = self.read_import_file(path)
+        except (OSError, ValueError, csv.Error) as e:
+            return f"[SimpleTimeTask] 读取导入文件失败: {e}"
+
+        tasks = []
+        errors = []
+        for line_no, item in items:
+            if not isinstance(item, dict):
+                errors.append((line_no, "任务应为包含 frequency、time、content 字段的对象"))
+                continue
+            frequency = str(item.get("frequency") or "").strip()
+            time_value = str(item.get("time") or "").strip()
+            content = str(item.get("content") or "").strip()
+            # cron[...] 频率自带时间，不需要 time 字段
+            is_cron = frequency.startswith("cron[")
+            if not frequency or not (time_value or is_cron) or not content:
+                errors.append((line_no, "缺少 frequency、time 或 content 字段"))
+                continue
+            command_args = ['/time', frequency] + ([] if is_cron else [time_value]) + content.split(' ')
+            group_title = str(item.get("group") or "").strip()
+            if group_title:
+                command_args.append(f"group[{group_title}]")
+            tz = str(item.get("tz") or "").strip()
+            if tz:
+                command_args.append(f"tz[{tz}]")
+            if str(item.get("coalesce") or "").strip().lower() in ("off", "false", "0"):
+                command_args.append("coalesce[off]")
+            task, error = self.parse_task(
+                command_args,
+                str(item.get("user_id") or user_id),
+                item.get("user_name") or user_name,
+                None,
+            )
+            if task is None:
+                errors.append((line_no, error.removeprefix("[SimpleTimeTask] ")))
             else:
-                # 处理其他未定义的频率
-                frequency = "undefined"
-
-            logger.debug(f"即将设置的频率为：{frequency}")
-
-            # 检查任务时间的有效性
-            if self.validate_time(frequency, time_value):
-                if group_title:
-                    target_type = 1
-                # 创建任务
-                new_task = Task(task_id, time_value, frequency, content, target_type, user_id, user_name, user_group_name, group_title, 0)
-
-                allowed_frequencies = ('once', 'work_day', 'every_day')
-                frequency_valid = new_task.frequency in allowed_frequencies
-
-                # 检查是否有 CHECK 约束
-                has_check = self.has_frequency_check_constraint()
-                logger.debug(f"检查 'tasks' 表中 'frequency' 字段是否有 CHECK 约束: {'有' if has_check else '没有'}")
-
-                # 决定是否需要迁移
-                if not frequency_valid:
-                    if has_check:
-                        logger.info(f"检测到 frequency '{new_task.frequency}' 不在 {allowed_frequencies} 中，并且存在 CHECK 约束，开始迁移数据库以移除 CHECK 约束。")
-                        migration_success = self.migrate_tasks_table()
-                        if not migration_success:
-                            logger.error("数据库迁移失败，无法添加任务。")
-                            return
-                        else:
-                            logger.info("数据库迁移成功，已移除 CHECK 约束。")
-                    else:
-                        logger.debug(f"检测到 frequency '{new_task.frequency}' 不在 {allowed_frequencies} 中，但 'frequency' 字段没有 CHECK 约束，无需迁移。")
+                tasks.append(task)
+        return self.add_parsed_tasks(tasks, errors)
 
-                # 将新任务添加到内存中
-                self.tasks[new_task.task_id] = new_task
-                # 将新任务更新到数据库
-                self.update_task_in_db(new_task)
-                # 格式化回复内容
-                reply_str = f"[SimpleTimeTask] 😸 任务已添加: \n\n[{task_id}] {frequency} {time_value} {content} {'group[' + group_title + ']' if group_title else ''}"
+    def add_parsed_tasks(self, tasks, errors):
+        """ 添加批量解析出的任务，返回包含逐行错误的回复 """
+        if tasks:
+            try:
+                self.add_tasks(tasks)
+            except Exception as e:
+                logger.error(f"[SimpleTimeTask] 批量添加任务失败: {e}")
+                return f"[SimpleTimeTask] 批量添加任务失败，未添加任何任务: {e}"
+        reply_str = f"[SimpleTimeTask] 😸 已批量添加 {len(tasks)} 个任务"
+        if errors:
+            reply_str += f"，{len(errors)} 行未添加:\n"
+            reply_str += "\n".join(f"第{line_no}行: {error}" for line_no, error in errors[:self.batch_error_limit])
+            if len(errors) > self.batch_error_limit:
+                reply_str += f"\n... 另有 {len(errors) - self.batch_error_limit} 行错误"
+        return reply_str
 
-                # 打印当前任务信息
-                self.print_tasks_info()
-            else:
-                reply_str = "[SimpleTimeTask] 添加任务失败，时间格式不正确或已过期."
+    def update_task_in_db(self, task: Task):
+        """ 更新任务到数据库(写入队列，批量提交) """
+        self.write_queue.put_task(task)
 
-            # 打印任务列表
-            logger.debug(f"[SimpleTimeTask] 任务列表: {self.tasks}")
+    def show_task_list(self, user_id, group_title=None, page=1):
+        """
+        分页显示任务列表，群聊中显示发送到当前群的任务，私聊中显示用户自己的任务。
 
-        return reply_str
+        :param user_id: 用户ID
+        :param group_title: 当前群标题，私聊时为 None
+        :param page: 页码，从 1 开始
+        """
+        column, value = ("group_title", group_title) if group_title else ("user_id", user_id)
+        scope = f"群[{group_title}]" if group_title else "你"
+        offset = (page - 1) * self.list_page_size
 
-    def update_task_in_db(self, task: Task):
-        """ 更新任务到数据库 """
-        # 由于我们该方法是对任务的插入，因此可以简化锁的使用
-        with sqlite3.connect(self.DB_FILE_PATH) as conn:
-            cursor = conn.cursor()
-            # is_processed 默认值设为 0（未处理）
-            cursor.execute('''
-                INSERT INTO tasks (id, time, frequency, content, target_type, user_id, user_name, user_group_name, group_title, is_processed)
-                VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
-            ''', (task.task_id, task.time_value, task.frequency, task.content,
-                task.target_type, task.user_id, task.user_name,
-                task.user_group_name, task.group_title, task.is_processed))
-            # 提交更改
-            conn.commit()
-            logger.info(f"[SimpleTimeTask] Task added to DB: {task.task_id}")
-
-    def show_task_list(self):
-        """ 显示所有任务 """
-        with self.db_lock:
-            tasks_list = "[SimpleTimeTask] 😸 任务列表:\n\n"
-            for task in self.tasks.values():
-                group_info = f"group[{task.group_title}]" if task.target_type else ""
-                tasks_list += f"💼[{task.user_name}|{task.task_id}] {task.frequency} {task.time_value} {task.content} {group_info}\n"
-            return tasks_list
+        if self.disk_backed or not self.tasks_loaded.is_set():
+            # 磁盘模式下大部分任务不在内存中，启动时任务尚未加载完成，通过数据库索引分页读取
+            self.write_queue.flush()
+            with self.db_lock:
+                total = self.store.count_tasks_by(column, value)
+                tasks = [self.store.row_to_task(row) for row in self.store.load_tasks_by(column, value, offset, self.list_page_size)]
+        else:
+            index = self.group_index if group_title else self.user_index
+            with self.db_lock:
+                total = index.count(value)
+                tasks = [self.tasks[task_id] for task_id in index.page(value, offset, self.list_page_size)]
+
+        if total == 0:
+            return f"[SimpleTimeTask] 😸 {scope}还没有任务。"
+        page_count = (total + self.list_page_size - 1) // self.list_page_size
+        if not tasks:
+            return f"[SimpleTimeTask] 没有第 {page} 页，{scope}的任务共 {page_count} 页。"
+
+        tasks_list = f"[SimpleTimeTask] 😸 {scope}的任务列表 (第 {page}/{page_count} 页，共 {total} 个):\n\n"
+        for task in tasks:
+            tasks_list += f"💼[{task.user_name}|{task.task_id}] {task.frequency} {task.time_value} {task.content} {self.format_task_options(task)}\n"
+        if page < page_count:
+            tasks_list += f"\n发送 /time 任务列表 {page + 1} 查看下一页"
+        return tasks_list
 
     def cancel_task(self, task_id: str) -> str:
         """取消任务"""
         try:
             with self.db_lock:
-                if not self.tasks:
+                if not self.tasks and not self.disk_backed and self.tasks_loaded.is_set():
                     logger.warning("[SimpleTimeTask] 没有可取消的任务。")
                     return "[SimpleTimeTask] 没有可取消的任务。"
 
                 # 尝试从字典中移除任务
-                task = self.tasks.pop(task_id, None)
+                task = self.remove_task_from_memory(task_id)
+                if task is None and (self.disk_backed or not self.tasks_loaded.is_set()):
+                    # 磁盘模式下任务可能只保存在数据库中，启动时任务可能尚未加载
+                    self.write_queue.flush()
+                    task = self.store.task_exists(task_id)
                 if task:
-                    logger.info(f"[SimpleTimeTask] 任务已取消: {task_id}")
+                    if isinstance(task, Task):
+                        # 记录被取消的任务
+                        self.log_task_change("已取消", task, removed=True)
+                    else:
+                        logger.info(f"[SimpleTimeTask] 任务已取消: {task_id}")
+                    # 取消任务调度
+                    self.scheduler.remove(task_id)
                     # 从数据库中删除任务
                     self.remove_task_from_db(task_id)
-                    # 打印当前任务信息
-                    self.print_tasks_info()
                     return f"[SimpleTimeTask] 😸 任务 [{task_id}] 已取消。"
                 else:
                     logger.warning(f"[SimpleTimeTask] 未找到任务 ID [{task_id}] 以供取消。")
@@ -716,87 +929,191 @@ class SimpleTimeTask(Plugin):
             return "[SimpleTimeTask] 取消任务时发生错误，请稍后重试。"
 
     def remove_task_from_db(self, task_id):
-        """ 从数据库中删除任务 """
-        # 确保线程安全
-        with sqlite3.connect(self.DB_FILE_PATH) as conn:
-            cursor = conn.cursor()
-            cursor.execute('DELETE FROM tasks WHERE id = ?', (task_id,))
-            conn.commit()
-            logger.info(f"[SimpleTimeTask] Task removed from DB: {task_id}")
-
-    def is_weekday(self):
-        today = datetime.datetime.now()
-        # weekday() 返回值：0 = 星期一, 1 = 星期二, ..., 6 = 星期日
-        return today.weekday() < 5
-
-    def update_task_status(self, task_id, is_processed=1):
-        """ 更新任务的处理状态到数据库 """
+        """ 从数据库中删除任务(写入队列，批量提交) """
+        self.write_queue.put_delete(task_id)
+
+    def update_task_status(self, task, is_processed=1):
+        """ 更新任务的处理状态和下一次触发时间到数据库 """
         try:
-            # 获取任务
-            task = self.tasks.get(task_id)
             # 更新任务状态
-            task.is_processed = 1
-            with sqlite3.connect(self.DB_FILE_PATH) as conn:
-                # 连接数据库
-                cursor = conn.cursor()
-                # 更新任务状态
-                cursor.execute('UPDATE tasks SET is_processed = ? WHERE id = ?', (is_processed, task_id))
-                # 提交更改
-                conn.commit()
-            logger.info(f"[SimpleTimeTask] Task status updated in DB: {task_id} to {is_processed}")
+            task.is_processed = is_processed
+            self.write_queue.put_state(task)
         except Exception as e:
             logger.error(f"[SimpleTimeTask] update task status failed: {e}")
 
     def check_and_trigger_tasks(self):
         """定时检查和触发任务"""
-        while True:
+        self.load_tasks()
+        while not self.scheduler.stopped:
             try:
-                once_tasks = []
-                loop_tasks = []
-                # 获取当前时间、日期和星期
-                now = time.strftime("%H:%M")
-                today_date = time.strftime("%Y-%m-%d")
-                # e.g., "Monday"
-                current_weekday = time.strftime("%A", time.localtime())
-
-                logger.debug(f"[SimpleTimeTask] 正在检查任务, 当前时间: {today_date}-{now}, 最后重置时间: {self.last_reset_task_date}")
-
-                # 每天重置未处理状态
-                if now == "00:00" and today_date != self.last_reset_task_date:
-                    self.reset_processed_status()
-                    # 更新最后重置日期
-                    self.last_reset_task_date = today_date
-                    logger.info(f"[SimpleTimeTask] 已重置所有任务的处理状态。记录最后重置日期为 {self.last_reset_task_date}。")
-
-                # 使用 list() 避免在遍历过程中修改字典
-                tasks_copy = list(self.tasks.values())
-
-                # 创建任务副本以避免在遍历时修改列表
-                for task in tasks_copy:
-                    # 检查任务是否应该被触发
-                    if self.should_trigger(task, now, today_date, current_weekday):
-                        # 处理任务
-                        self.process_task(task.task_id)
-                        if task.frequency == "once":
-                            once_tasks.append(task.task_id)
-                        else:
-                            loop_tasks.append(task.task_id)
-
-                # 删除一次性任务
-                for task_id in once_tasks:
-                    # 删除对应ID的任务缓存
-                    self.del_task_from_id(task_id)
-                    # 从数据库中删除任务
-                    self.remove_task_from_db(task_id)
-
-                # 更新任务状态
-                for task_id in loop_tasks:
-                    self.update_task_status(task_id)
-
+                # 睡眠到最早的任务触发时间，最长睡眠到下一分钟开始，用于每日重置检查以及应对系统时间调整；
+                # 协调模式下最长睡眠到下一次同步任务变更，其他进程添加的任务不必等到下一分钟才同步
+                max_wait = 60 - time.time() % 60
+                if self.coordinator is not None:
+                    max_wait = min(max_wait, max(0, self.last_task_sync + self.task_sync_interval - time.time()))
+                self.run_tick(max_wait)
             except Exception as e:
                 logger.error(f"[SimpleTimeTask] An unexpected error occurred: {e}")
-            # 每5秒检查一次
-            time.sleep(5)
+                # 避免异常时空转
+                time.sleep(1)
+
+    def run_tick(self, max_wait):
+        """
+        执行一次调度：等待最多 max_wait 秒，分发已到期的任务并调度其下一次触发。
+
+        :return: 本次到期的任务数
+        """
+        due_tasks = self.scheduler.wait_due(max_wait)
+        if self.scheduler.stopped:
+            return 0
+        tick_start = time.perf_counter()
+
+        once_tasks = []
+        loop_tasks = []
+        logger.debug(f"[SimpleTimeTask] 正在检查任务, 到期任务数: {len(due_tasks)}")
+
+        # 每天零点重置未处理状态
+        now = time.time()
+        if now >= self.next_reset_time:
+            self.reset_processed_status()
+            # 计算下一次重置时间
+            self.next_reset_time = self.calc_next_reset_time(now)
+            logger.info(f"[SimpleTimeTask] 已重置所有任务的处理状态。下一次重置时间为 {time.strftime('%Y-%m-%d %H:%M', time.localtime(self.next_reset_time))}。")
+
+        # 磁盘模式下，时间窗口过半时加载下一个窗口的任务
+        if self.disk_backed and time.time() + self.load_window / 2 >= self.window_end:
+            self.load_task_window()
+
+        # 协调模式下同步其他进程的任务变更，启动加载完成后才开始，加载时读取的已是最新的任务
+        if self.coordinator is not None and self.tasks_loaded.is_set():
+            self.sync_tasks_from_db()
+
+        # 协调模式下，租约超过本地有效期(进程停顿后恢复)时先续期，确认分片未被接管后再触发
+        if self.coordinator is not None and due_tasks:
+            self.coordinator.ensure_valid()
+
+        # 处理已到期的任务；内存中的任务和索引的变更持有 db_lock，与指令线程的查询互斥
+        with self.db_lock:
+            dispatch_time = time.time()
+            for fire_time, task_id in due_tasks:
+                task = self.tasks.get(task_id)
+                if task is None:
+                    # 任务已被取消
+                    continue
+                if self.coordinator is not None and not self.coordinator.owns(task_id):
+                    # 由持有该分片的进程触发和更新状态，这里只推进内存中的调度
+                    if task.frequency == "once":
+                        self.remove_task_from_memory(task_id)
+                    else:
+                        self.schedule_task(task, max(fire_time + 1, int(dispatch_time)))
+                    continue
+                # 记录计划触发时间与分发时间的差
+                lag = dispatch_time - fire_time
+                self.metrics.observe("dispatch_lag_seconds", lag, help="计划触发时间到分发的延迟")
+                if lag > self.late_fire_threshold:
+                    self.metrics.inc("late_fires_total", help="分发延迟超过 late_fire_threshold 的触发次数")
+                    logger.warning(f"[SimpleTimeTask] 任务 {task_id} 迟到 {lag:.0f}s 触发")
+                # 处理任务
+                self.process_task(task_id, fire_time)
+                if task.frequency == "once":
+                    once_tasks.append(task_id)
+                else:
+                    loop_tasks.append((task, fire_time))
+
+            # 删除一次性任务
+            for task_id in once_tasks:
+                # 删除对应ID的任务缓存
+                self.del_task_from_id(task_id)
+                # 从数据库中删除任务
+                self.remove_task_from_db(task_id)
+
+            # 调度下一次触发，并更新任务状态；迟到触发时跳过已错过的时刻，避免秒级任务集中补发，跳过的时刻计入指标
+            for task, fire_time in loop_tasks:
+                if int(dispatch_time) > fire_time + 1:
+                    skipped = self.count_skipped_slots(task, fire_time, int(dispatch_time))
+                    if skipped:
+                        self.metrics.inc("skipped_slots_total", skipped, help="迟到触发时跳过的触发时刻数")
+                        logger.warning(f"[SimpleTimeTask] 任务 {task.task_id} 迟到触发，跳过 {skipped} 个已错过的触发时刻")
+                self.schedule_task(task, max(fire_time + 1, int(dispatch_time)))
+                self.update_task_status(task)
+
+        if due_tasks:
+            stats = self.dispatcher.get_stats()
+            logger.info(f"[SimpleTimeTask] 已分发 {len(due_tasks)} 个任务, 队列深度: {stats['queue_depth']}, 忙碌线程: {stats['busy_workers']}/{stats['max_workers']}, 超时线程: {stats['timed_out_workers']}")
+
+        self.metrics.observe("tick_duration_seconds", time.perf_counter() - tick_start, help="每次调度的处理耗时")
+        self.metrics.inc("ticks_total", help="调度次数")
+        self.metrics.inc("due_tasks_total", len(due_tasks), help="调度时取出的到期任务数")
+        self.last_tick_time = time.time()
+        if self.first_tick_seconds is None:
+            self.first_tick_seconds = time.perf_counter() - self.start_time
+            logger.info(f"[SimpleTimeTask] 首次调度完成，距启动 {self.first_tick_seconds * 1000:.0f}ms")
+        return len(due_tasks)
+
+    def request_task_refresh(self, shards):
+        """ 获取到新分片时调用，唤醒调度线程从数据库刷新任务 """
+        self.refresh_requested = True
+        self.scheduler.wake()
+
+    def sync_tasks_from_db(self):
+        """
+        协调模式下，每隔 task_sync_interval 秒从变更日志增量同步其他进程添加或删除的任务，开销与变更数相关，与任务总数无关。
+        获取到新分片后，还按数据库中的状态重新加载即将触发的任务：之前的持有者可能已经触发过这些任务，
+        也可能在触发前退出，而当前进程没有持有分片时只推进了内存中的调度。
+        两种情况都从数据库中的触发时间开始调度(参见 load_task 的 catch_up)，同步或接管之前到期的触发不会丢失。
+        """
+        refresh = self.refresh_requested
+        if not refresh and time.time() - self.last_task_sync < self.task_sync_interval:
+            return
+        self.refresh_requested = False
+        self.last_task_sync = time.time()
+        # 先写入待提交的操作，避免刚添加的任务被当作已删除
+        self.write_queue.flush()
+        with self.db_lock:
+            changes, truncated = self.store.load_task_changes(self.last_change_seq)
+            if truncated:
+                # 落后超过变更日志的保留时长(例如进程长时间停顿)，退回按任务ID全量比较
+                logger.warning("[SimpleTimeTask] 任务变更日志已被清理，全量同步数据库中的任务")
+                self.last_change_seq = self.store.last_change_seq()
+                removed, added_rows = self.diff_tasks_with_db()
+            else:
+                # 只读取上次同步之后的变更，同一任务以最后一次变更为准
+                latest = {task_id: deleted for _, task_id, deleted in changes}
+                if changes:
+                    self.last_change_seq = changes[-1][0]
+                removed = [task_id for task_id, deleted in latest.items() if deleted and task_id in self.tasks]
+                added_rows = self.store.load_tasks_by_ids(
+                    [task_id for task_id, deleted in latest.items() if not deleted and task_id not in self.tasks])
+            for task_id in removed:
+                self.del_task_from_id(task_id)
+            for row in added_rows:
+                self.load_task(self.store.row_to_task(row), catch_up=True)
+
+            refreshed = 0
+            if refresh:
+                # 预取回复需要提前调度，刷新范围包含预取提前量
+                lead = self.prefetcher.lead_time if self.prefetcher is not None else 0
+                for row in self.store.load_tasks_due_before(int(time.time()) // 60 * 60 + 60 + lead):
+                    if self.coordinator.owns(row[0]):
+                        self.remove_task_from_memory(row[0])
+                        if self.load_task(self.store.row_to_task(row), catch_up=True):
+                            refreshed += 1
+        self.store.prune_task_changes(time.time() - self.task_change_retention)
+        if removed or added_rows or refreshed:
+            logger.info(f"[SimpleTimeTask] 已同步数据库中的任务: 新增 {len(added_rows)} 个, 删除 {len(removed)} 个, 刷新 {refreshed} 个")
+
+    def diff_tasks_with_db(self):
+        """ 按任务ID比较内存和数据库，返回 (内存中多出的任务ID, 数据库中新增的任务行)，调用方需持有 db_lock """
+        if self.disk_backed:
+            # 磁盘模式只比较当前时间窗口内的任务
+            memory_ids = set(self.tasks)
+            removed = memory_ids - {row[0] for row in self.store.load_tasks_by_ids(memory_ids)}
+            added_rows = [row for row in self.store.load_tasks_due_before(self.window_end) if row[0] not in self.tasks]
+        else:
+            db_ids = self.store.load_task_ids()
+            removed = self.tasks.keys() - db_ids
+            added_rows = self.store.load_tasks_by_ids(db_ids - self.tasks.keys())
+        return removed, added_rows
 
     def remove_task(self, task_id):
         """从任务列表和数据库中移除任务"""
@@ -807,72 +1124,107 @@ class SimpleTimeTask(Plugin):
         except Exception as e:
             logger.error(f"[SimpleTimeTask] Failed to remove task ID {task_id}: {e}")
 
-    def should_trigger(self, task, now, today_date, current_weekday):
-        """判断任务是否应该被触发"""
-        frequency = task.frequency
-        task_time = task.time_value
+    def schedule_task(self, task, after=None):
+        """
+        计算任务的下一次触发时间并加入调度。
+        磁盘模式下，触发时间超出当前时间窗口或不会再触发的任务从内存中移除，只保留在数据库中。
 
-        # 一次性任务
-        if frequency == "once":
-            try:
-                task_date, task_time = task_time.split(' ')
-            except ValueError:
-                logger.error(f"[SimpleTimeTask] Invalid time format for task ID {task.task_id}")
-                self.remove_task(task.task_id)
-                return False
-            if task_date != today_date or task_time != now:
-                return False
-        # 工作日任务
-        elif frequency == "work_day":
-            if not self.is_weekday() or task_time != now or task.is_processed == 1:
-                return False
-        # 每天任务
-        elif frequency == "every_day":
-            if task_time != now or task.is_processed == 1:
-                return False
-        # 每周任务
-        elif frequency.startswith("weekly_"):
-            try:
-                _, weekday = frequency.split("_")
-            except ValueError:
-                logger.error(f"[SimpleTimeTask] Invalid weekly frequency format for task ID {task.task_id}")
-                self.remove_task(task.task_id)
-                return False
-            if current_weekday != weekday or task_time != now or task.is_processed == 1:
-                return False
-        # 每周除星期x外任务
-        elif frequency.startswith("excludeWeekday_"):
-            try:
-                _, excluded_weekday = frequency.split("_")
-            except ValueError:
-                logger.error(f"[SimpleTimeTask] Invalid excludeWeekday frequency format for task ID {task.task_id}")
-                self.remove_task(task.task_id)
-                return False
-            if current_weekday == excluded_weekday or task_time != now or task.is_processed == 1:
-                return False
-        # 每月x号任务
-        elif frequency.startswith("monthly_"):
-            if not self.is_valid_monthly(frequency) or task_time != now or task.is_processed == 1:
-                return False
-        # 未知频率
+        :param task: 任务
+        :param after: 时间戳，参见 calc_next_fire_time
+        :return: 下一次触发时间，任务不会再触发时返回 None
+        """
+        fire_time = self.calc_next_fire_time(task, after)
+        task.next_fire = -1 if fire_time is None else fire_time
+        if fire_time is None:
+            self.scheduler.remove(task.task_id)
+            logger.debug(f"[SimpleTimeTask] Task {task.task_id} will not be triggered again.")
+            if self.disk_backed:
+                self.remove_task_from_memory(task.task_id)
+        elif self.disk_backed and fire_time >= self.window_end:
+            # 超出当前时间窗口，等窗口推进时再从数据库加载
+            self.scheduler.remove(task.task_id)
+            self.remove_task_from_memory(task.task_id)
         else:
-            logger.warning(f"[SimpleTimeTask] Unknown frequency '{frequency}' for task ID {task.task_id}")
-            return False
+            self.scheduler.push(task.task_id, fire_time)
+            if self.prefetcher is not None and "GPT" in task.content and (self.coordinator is None or self.coordinator.owns(task.task_id)):
+                self.prefetcher.schedule(task, fire_time)
+        return fire_time
+
+    # 统计跳过的触发时刻时最多计算的时刻数，避免长时间停顿后为秒级任务逐个计算
+    SKIPPED_SLOTS_LIMIT = 10000
+
+    def count_skipped_slots(self, task, fire_time, until):
+        """ 统计 fire_time 之后、until(不含) 之前被跳过的触发时刻数，最多统计 SKIPPED_SLOTS_LIMIT 个 """
+        skipped = 0
+        after = fire_time + 1
+        while skipped < self.SKIPPED_SLOTS_LIMIT:
+            next_fire = task.rule.next_fire_time(after)
+            if next_fire is None or next_fire >= until:
+                break
+            skipped += 1
+            after = int(next_fire) + 1
+        return skipped
+
+    @staticmethod
+    def calc_next_reset_time(after):
+        """ 计算 after(时间戳) 之后下一个本机时区零点的时间戳 """
+        date = datetime.date.fromtimestamp(after) + datetime.timedelta(days=1)
+        return int(time.mktime((date.year, date.month, date.day, 0, 0, 0, 0, 0, -1)))
+
+    @staticmethod
+    def grace_start(rule):
+        """ 添加或加载任务时计算触发时间的起点：整分的规则从当前分钟开始，精确到秒的规则从当前秒开始 """
+        now = int(time.time())
+        return now if rule.has_seconds else now // 60 * 60
+
+    def calc_next_fire_time(self, task, after=None):
+        """
+        计算任务的下一次触发时间(整数时间戳)，不会再触发时返回 None。
 
-        return True
+        :param task: 已编译触发规则的任务
+        :param after: 时间戳，从该时间(含)开始计算；默认为当前分钟的开始，
+                      使在触发分钟内添加或加载的任务仍能触发，已处理的任务则跳过当前分钟；
+                      触发时间精确到秒的规则没有该宽限，默认从当前秒开始
+        """
+        if after is None:
+            after = self.grace_start(task.rule)
+            if task.is_processed == 1:
+                after += 1 if task.rule.has_seconds else 60
+        fire_time = task.rule.next_fire_time(after)
+        return None if fire_time is None else int(fire_time)
 
     def get_task(self, task_id):
         """获取任务"""
         return self.tasks.get(task_id)
 
+    def add_task_to_memory(self, task):
+        """ 将任务添加到内存及用户、群索引 """
+        self.tasks[task.task_id] = task
+        self.user_index.add(task)
+        self.group_index.add(task)
+
+    def remove_task_from_memory(self, task_id):
+        """ 将任务从内存及用户、群索引中移除，返回被移除的任务 """
+        task = self.tasks.pop(task_id, None)
+        if task is not None:
+            self.user_index.remove(task)
+            self.group_index.remove(task)
+            self.task_rows.pop(task_id, None)
+            if self.prefetcher is not None:
+                self.prefetcher.remove(task_id)
+        return task
+
     def del_task_from_id(self, task_id: str) -> bool:
         """删除任务并返回是否成功"""
         # 从内存中删除任务
-        self.tasks.pop(task_id, None)
-        # 打印当前任务信息
-        self.print_tasks_info()
-
-    def process_task(self, task_id):
+        task = self.remove_task_from_memory(task_id)
+        # 取消任务调度
+        self.scheduler.remove(task_id)
+        if task is not None:
+            # 记录被删除的任务
+            self.log_task_change("已删除", task, removed=True)
+
+    def process_task(self, task_id, fire_time=None):
         """处理并触发任务"""
         try:
             # 获取任务
@@ -881,8 +1233,8 @@ class SimpleTimeTask(Plugin):
                 # 任务不存在
                 logger.error(f"[SimpleTimeTask] Task ID {task_id} not found.")
             else:
-                # 运行任务
-                self.run_task_in_thread(task)
+                # 放入分发队列，由工作线程执行
+                self.dispatcher.submit(task, fire_time)
         except Exception as e:
             logger.error(f"[SimpleTimeTask] Failed to process task ID {task_id}: {e}")
             self.remove_task(task_id)
@@ -896,12 +1248,12 @@ class SimpleTimeTask(Plugin):
                     if task.is_processed == 1:
                         # 重置为 False
                         task.is_processed = 0
-                        # 更新数据库中的状态
-                        with sqlite3.connect(self.DB_FILE_PATH) as conn:
-                            cursor = conn.cursor()
-                            cursor.execute('UPDATE tasks SET is_processed = ? WHERE id = ?', (0, task.task_id))
-                            conn.commit()
-                            logger.info(f"[SimpleTimeTask] Task status updated in DB: {task.task_id} to {0}")
+                        # 更新数据库中的状态(写入队列，批量提交)
+                        self.write_queue.put_state(task)
+                if self.disk_backed or not self.tasks_loaded.is_set():
+                    # 未加载到内存中的任务直接在数据库中重置
+                    self.write_queue.flush()
+                    self.store.reset_processed_status()
         except Exception as e:
             logger.error(f"[SimpleTimeTask] Failed to reset processed status: {e}")
 
@@ -909,88 +1261,97 @@ class SimpleTimeTask(Plugin):
         """ 生成唯一任务ID """
         return ''.join(random.choices('0123456789ABCDEFGHIJKLMNOPQRSTUVWXYZ', k=10))
 
-    def validate_time(self, frequency, time_value):
-        """ 验证时间和频率 """
-        if frequency not in [ "once", "work_day", "every_day", "weekly_Monday", "weekly_Tuesday", "weekly_Wednesday", "weekly_Thursday", "weekly_Friday", "weekly_Saturday", "weekly_Sunday", "monthly_1", "monthly_2", "monthly_3", "monthly_4", "monthly_5", "monthly_6", "monthly_7", "monthly_8", "monthly_9", "monthly_10", "monthly_11", "monthly_12", "monthly_13", "monthly_14", "monthly_15", "monthly_16", "monthly_17", "monthly_18", "monthly_19", "monthly_20", "monthly_21", "monthly_22", "monthly_23", "monthly_24", "monthly_25", "monthly_26", "monthly_27", "monthly_28", "monthly_29", "monthly_30", "monthly_31", "excludeWeekday_Monday", "excludeWeekday_Tuesday", "excludeWeekday_Wednesday", "excludeWeekday_Thursday", "excludeWeekday_Friday", "excludeWeekday_Saturday", "excludeWeekday_Sunday"]:
-            return False
-        # 初始化返回值
-        ret = True
-        # 获取当前时间
-        current_time = time.strftime("%H:%M")
+    def validate_time(self, frequency, time_value, tz=None):
+        """ 验证时间、频率和时区，返回编译后的触发规则，无效或已过期时返回 None """
+        try:
+            rule = compile_rule(frequency, time_value, tz)
+        except ValueError as e:
+            logger.debug(f"[SimpleTimeTask] 无效的时间或频率: {e}")
+            return None
 
-        if frequency == "once":
-            # 如果是一次性任务，检查时间格式
-            if time_value < f"{time.strftime('%Y-%m-%d')} {current_time}":
-                # 今天的时间已过期
-                ret = False
+        # 检查是否还会触发：一次性任务是否已过期(整分的时间在当前分钟内仍有效)，cron 表达式的日期是否存在(例如 2 月 30 日)
+        if rule.next_fire_time(self.grace_start(rule)) is None:
+            return None
 
-        return ret
+        return rule
+
+    def build_context(self, task: Task):
+        """ 构建任务的消息上下文，未获取到目标群ID时返回 None """
+        receiver = None
+        is_group = False
+        if task.target_type == 1:
+            is_group = True
+            receiver = self.get_group_id(task.group_title)
+            if receiver is None:
+                return None
+        else:
+            receiver = task.user_id
+
+        return self.context_factory.build(task, receiver, is_group)
+
+    def generate_gpt_reply(self, task: Task, context: Context):
+        """ 生成 GPT 回复，相同提示词的请求合并，回复无效时返回 None """
+        content = task.content.replace("GPT", "")
+
+        def fetch():
+            start = time.perf_counter()
+            reply: Reply = Bridge().fetch_reply_content(content, context)
+            self.metrics.observe("gpt_generation_seconds", time.perf_counter() - start, help="GPT 回复生成耗时")
+            # 检查reply是否有效
+            if reply and reply.type:
+                return reply
+            self.metrics.inc("gpt_failures_total", help="GPT 回复无效的次数")
+            return None
+
+        if self.coalescer is None or task.no_coalesce or task.task_id in self.coalesce_exclude:
+            return fetch()
+        return self.coalescer.fetch(content, fetch)
+
+    def prefetch_reply(self, task: Task, fire_time):
+        """ 在触发前预取 GPT 回复，任务已取消或已重新调度时跳过 """
+        if self.tasks.get(task.task_id) is not task or task.next_fire != fire_time:
+            return None
+        context = self.build_context(task)
+        if context is None:
+            return None
+        return self.generate_gpt_reply(task, context)
 
-    def trigger_task(self, task: Task):
-        """ 触发任务的实际逻辑 """
+    def trigger_task(self, task: Task, fire_time=None):
+        """ 触发任务的实际逻辑，fire_time 为本次触发时间，用于取出预取的回复 """
         try:
-            # 初始化变量
             content = task.content
-            receiver = None
-            is_group = False
-            is_group_str = "用户消息"
-            if task.target_type == 1:
-                is_group = True
-                receiver = self.get_group_id(task.group_title)
-                if receiver is None:
-                    # 未获取到群id，跳过此次任务处理
-                    return
-                is_group_str = "群组消息"
-            else:
-                receiver = task.user_id
+            is_group_str = "群组消息" if task.target_type == 1 else "用户消息"
+            context = self.build_context(task)
+            if context is None:
+                # 未获取到群id，跳过此次任务处理
+                self.metrics.inc("missed_fires_total", help="未找到目标群而跳过的触发次数")
+                return
+            receiver = context["receiver"]
 
             logger.info(f"[SimpleTimeTask] 触发[{task.user_name}]的{is_group_str}: [{content}] to {receiver}")
 
-            # 构造消息
-            orgin_string = "id=0, create_time=0, ctype=TEXT, content=/time 每天 17:55 text, from_user_id=@, from_user_nickname=用户昵称, to_user_id==, to_user_nickname=, other_user_id=@123, other_user_nickname=用户昵称, is_group=False, is_at=False, actual_user_id=None, actual_user_nickname=None, at_list=None"
-            pattern = r'(\w+)\s*=\s*([^,]+)'
-            matches = re.findall(pattern, orgin_string)
-            content_dict = {match[0]: match[1] for match in matches}
-            content_dict["content"] = content
-            content_dict["receiver"] = receiver
-            content_dict["session_id"] = receiver
-            content_dict["isgroup"] = is_group
-            content_dict["ActualUserName"] = task.user_name
-            content_dict["from_user_nickname"] = task.user_name
-            content_dict["from_user_id"] = task.user_id
-            content_dict["User"] = {
-                'MemberList': [{'UserName': task.user_id, 'NickName': task.user_name}]
-            }
-
-            # 构建上下文
-            msg: ChatMessage = ChatMessage(content_dict)
-            for key, value in content_dict.items():
-                if hasattr(msg, key):
-                    setattr(msg, key, value)
-            msg.is_group = is_group
-            content_dict["msg"] = msg
-            context = Context(ContextType.TEXT, content, content_dict)
-
             # reply默认值
             reply_text = f"[SimpleTimeTask]\n--定时提醒任务--\n{content}"
             replyType = ReplyType.TEXT
 
             # 以下部分保持不变
             if "GPT" in content:
-                content = content.replace("GPT", "")
-                reply: Reply = Bridge().fetch_reply_content(content, context)
+                reply = None
+                if self.prefetcher is not None and fire_time is not None:
+                    # 优先使用预取的回复
+                    reply = self.prefetcher.take(task.task_id, fire_time)
+                if reply is None:
+                    reply = self.generate_gpt_reply(task, context)
 
                 # 检查reply是否有效
-                if reply and reply.type:
+                if reply:
                     # 替换reply类型和内容
                     reply_text = reply.content
                     replyType = reply.type
             else:
                 e_context = None
                 # 初始化插件上下文
-                channel = WechatChannel()
-                channel.channel_type = "wx"
-                content_dict["content"] = content
+                channel = self.context_factory.get_routing_channel()
                 context.__setitem__("content", content)
                 logger.info(f"[SimpleTimeTask] content: {content}")
                 try:
@@ -1014,54 +1375,47 @@ class SimpleTimeTask(Plugin):
             reply = Reply()
             reply.type = replyType
             reply.content = reply_text
-            self.replay_use_custom(reply, context)
+            if self.replay_use_custom(reply, context, task.task_id) and fire_time is not None:
+                self.metrics.observe("delivery_latency_seconds", time.time() - fire_time, help="计划触发时间到发送完成的延迟")
 
         except Exception as e:
             logger.error(f"[SimpleTimeTask] 发送消息失败: {e}")
 
-    def run_task_in_thread(self, task: Task):
-        """ 在新线程中运行任务 """
-        try:
-            logger.info(f"[SimpleTimeTask] 开始运行任务 {task.task_id}")
-            # 控制线程的事件
-            task_thread = threading.Thread(target=self.run_with_timeout, args=(task,))
-            task_thread.start()
-            # 设置超时为60秒
-            task_thread.join(timeout=60)
-
-            if task_thread.is_alive():
-                logger.warning(f"[SimpleTimeTask] 任务 {task.task_id} 超时结束")
-                # 结束线程
-                task_thread.join()
-        except Exception as e:
-            logger.error(f"[SimpleTimeTask] 运行任务时发生异常: {e}")
-
-    def run_with_timeout(self, task: Task):
-        """ 运行任务并捕获异常 """
+    def run_with_timeout(self, task: Task, fire_time=None):
+        """ 运行任务并捕获异常，在分发线程池中执行，超时由 TaskDispatcher 检查 """
         try:
-            self.trigger_task(task)
+            self.trigger_task(task, fire_time)
         except Exception as e:
             logger.error(f"[SimpleTimeTask] 触发任务时发生异常: {e}")
 
-    def replay_use_custom(self, reply, context : Context, retry_cnt=0):
+    def send_reply(self, reply, context: Context):
+        """ 通过共享的通道发送消息，失败时丢弃通道并抛出异常 """
+        channel_name = RobotConfig.conf().get("channel_type", "wx")
+        channel = self.channel_provider.get(channel_name)
+        start = time.perf_counter()
         try:
-            # 发送消息
-            channel_name = RobotConfig.conf().get("channel_type", "wx")
-            channel = channel_factory.create_channel(channel_name)
             channel.send(reply, context)
-
-            #释放
-            channel = None
-            gc.collect()
-
+        except Exception:
+            self.metrics.inc("send_failures_total", help="发送失败次数(含重试)")
+            # 通道可能已失效，重试时重新创建
+            self.channel_provider.invalidate(channel_name, channel)
+            raise
+        finally:
+            self.metrics.observe("send_duration_seconds", time.perf_counter() - start, help="通道发送耗时")
+
+    def replay_use_custom(self, reply, context: Context, task_id=None):
+        """ 发送消息，失败时放入重试队列后立即返回，返回是否发送成功 """
+        try:
+            self.send_reply(reply, context)
+            return True
         except Exception as e:
-            if retry_cnt < 2:
-                # 重试（最多三次）
-                time.sleep(3 + 3 * retry_cnt)
-                logger.warning(f"[SimpleTimeTask] 发送消息失败，正在重试: {e}")
-                self.replay_use_custom(reply, context, retry_cnt + 1)
-            else:
-                logger.error(f"[SimpleTimeTask] 发送消息失败，重试次数达到上限: {e}")
+            self.retry_queue.add(task_id, reply, context, e)
+            return False
+
+    def record_dead_letter(self, task_id, reply, context: Context, attempts, error):
+        """ 将重试次数用尽的消息写入 dead_letters 表 """
+        receiver = context.get("receiver") if context is not None else None
+        self.store.add_dead_letter(task_id, receiver, str(reply.content), attempts, str(error))
 
     def detect_time_command(self, text):
         # 判断输入是否为空
@@ -1069,7 +1423,7 @@ class SimpleTimeTask(Plugin):
             return None
 
         # 查找/time在文本中的位置
-        time_index = text.find('/time')
+        time_index = text.find(COMMAND_PREFIX)
 
         # 如果找到，就返回包含/time之后的文本
         if time_index != -1:
@@ -1085,13 +1439,16 @@ class SimpleTimeTask(Plugin):
         # 检查消息类型
         if e_context["context"].type not in [ContextType.TEXT]:
             return
+        # 不包含指令前缀的消息直接忽略，不读取用户信息，也不记录任何状态
+        msg = e_context['context']['msg']
+        if not msg.content or COMMAND_PREFIX not in msg.content:
+            return
 
         # 初始化变量
         user_id = None
         user_name = None
         user_group_name = None
         # 获取用户ID
-        msg = e_context['context']['msg']
         if self.channel_type == "gewechat":
             # gewe协议无需区分真实ID
             user_id = msg.actual_user_id
@@ -1104,24 +1461,24 @@ class SimpleTimeTask(Plugin):
                 # 私聊消息，获取用户ID
                 user_id = msg.from_user_id
 
-        # 获取当前时间（以毫秒为单位）
-        current_time = time.monotonic() * 1000  # 转换为毫秒
-        # 防抖动检查
-        last_time = self.user_last_processed_time.get(user_id, 0)
-        # 防抖动间隔为100毫秒
-        if current_time - last_time < 100:
-            # 如果在100毫秒内重复触发，不做处理
-            logger.debug(f"[SimpleTimeTask] Ignored duplicate command from {user_id}.")
-            return
-        # 更新用户最后处理时间
-        self.user_last_processed_time[user_id] = current_time
-
         # 获取用户指令
         command = self.detect_time_command(msg.content.strip())
         logger.debug(f"[SimpleTimeTask] Command received: {command}")
 
         # 检查指令是否有效
         if command is not None:
+            # 重复投递的指令直接忽略，不回复，对管理员同样生效
+            if self.command_dedup is not None and not self.command_dedup.allow(user_id):
+                self.metrics.inc("command_rate_limited_total", help="因频率限制被忽略的指令数")
+                logger.debug(f"[SimpleTimeTask] Ignored command from {user_id}: duplicate delivery.")
+                return
+            # 按用户限流，管理员不受限制；超出频率时提示一次，之后的指令直接忽略
+            if self.command_limiter is not None and not self.is_admin(user_id) and not self.command_limiter.allow(user_id):
+                self.metrics.inc("command_rate_limited_total", help="因频率限制被忽略的指令数")
+                logger.debug(f"[SimpleTimeTask] Ignored command from {user_id}: rate limited.")
+                if self.command_notice_limiter.allow(user_id):
+                    self.set_reply(e_context, "[SimpleTimeTask] 指令发送过于频繁，请稍后再试。")
+                return
             # 初始化回复字符串
             reply_str = ''
             if self.channel_type == "gewechat":
@@ -1142,9 +1499,42 @@ class SimpleTimeTask(Plugin):
 
             # 解析指令
             command_args = command.split(' ')
-            if command_args[1] == '任务列表':
-                # 获取任务列表
-                reply_str = self.show_task_list()
+            if len(command_args) < 2 or not command_args[1]:
+                # 只有指令前缀时回复用法
+                reply_str = f"[SimpleTimeTask] 用法:\n{self.get_help_text()}"
+            elif command_args[1] == '任务列表':
+                # 获取任务列表，群聊中显示发送到当前群的任务，私聊中显示自己的任务
+                page = int(command_args[2]) if len(command_args) > 2 and command_args[2].isdigit() and int(command_args[2]) > 0 else 1
+                group_title = msg.other_user_nickname if msg.is_group else None
+                reply_str = self.show_task_list(user_id, group_title, page)
+            elif command_args[1] == '状态':
+                # 查看运行状态，仅管理员可用
+                if self.is_admin(user_id):
+                    reply_str = self.get_status_text()
+                else:
+                    reply_str = "[SimpleTimeTask] 只有管理员可以查看运行状态。"
+            elif command_args[1].split('\n', 1)[0] == '批量':
+                # 批量添加任务，第一行之后每行一个任务
+                tasks, errors = self.parse_task_lines(command.split('\n')[1:], user_id, user_name, user_group_name)
+                if tasks or errors:
+                    reply_str = self.check_task_quota(user_id, len(tasks)) or self.add_parsed_tasks(tasks, errors)
+                else:
+                    reply_str = "[SimpleTimeTask] 请在 '/time 批量' 之后每行输入一个任务: 频率 时间 内容 [group[群标题]]"
+            elif command_args[1] == '导入':
+                # 从本地文件导入任务，仅管理员可用
+                if not self.is_admin(user_id):
+                    reply_str = "[SimpleTimeTask] 只有管理员可以导入任务。"
+                elif len(command_args) < 3:
+                    reply_str = "[SimpleTimeTask] 请输入导入文件的路径"
+                else:
+                    reply_str = self.import_tasks(' '.join(command_args[2:]), user_id, user_name)
+            elif command_args[1] == '打印任务':
+                # 将内存中的完整任务表输出到日志，开销与任务总数成正比，仅管理员可用
+                if self.is_admin(user_id):
+                    self.print_tasks_info()
+                    reply_str = f"[SimpleTimeTask] 已将 {len(self.tasks)} 个任务输出到日志。"
+                else:
+                    reply_str = "[SimpleTimeTask] 只有管理员可以打印任务。"
             elif command_args[1] == '取消任务':
                 # 取消任务
                 if len(command_args) != 3:
@@ -1157,18 +1547,57 @@ class SimpleTimeTask(Plugin):
                     reply_str = f"[SimpleTimeTask] 任务格式错误: {command_args}\n请使用 '/time 频率 时间 内容' 的格式。"
                     logger.warning(reply_str)
                 else:
-                    reply_str = self.add_task(command_args, user_id, user_name, user_group_name)
+                    reply_str = self.check_task_quota(user_id) or self.add_task(command_args, user_id, user_name, user_group_name)
 
             if reply_str is not None:
-                # 创建回复对象
-                reply = Reply()
-                reply.type = ReplyType.TEXT
-                reply.content = reply_str
-                e_context['reply'] = reply
-                e_context.action = EventAction.BREAK_PASS
+                self.set_reply(e_context, reply_str)
                 return
 
+    @staticmethod
+    def set_reply(e_context, reply_str):
+        """ 回复文本消息，不再交给其他插件处理 """
+        # 创建回复对象
+        reply = Reply()
+        reply.type = ReplyType.TEXT
+        reply.content = reply_str
+        e_context['reply'] = reply
+        e_context.action = EventAction.BREAK_PASS
+
+    def count_user_tasks(self, user_id):
+        """ 获取用户拥有的任务数 """
+        if self.disk_backed or not self.tasks_loaded.is_set():
+            # 磁盘模式下大部分任务不在内存中，启动时任务尚未加载完成
+            self.write_queue.flush()
+            with self.db_lock:
+                return self.store.count_tasks_by("user_id", user_id)
+        return self.user_index.count(user_id)
+
+    def check_task_quota(self, user_id, count=1):
+        """
+        检查用户能否再添加 count 个任务，超出添加频率或任务数上限时返回提示，管理员不受限制。
+        批量添加的每个任务都消耗一个令牌，超过 task_create_burst 个的批量添加直接拒绝。
+        """
+        if self.is_admin(user_id):
+            return None
+        if self.task_create_limiter is not None:
+            if count > self.task_create_limiter.burst:
+                self.metrics.inc("task_create_rate_limited_total", help="因频率限制被拒绝的添加任务请求数")
+                return f"[SimpleTimeTask] 一次最多批量添加 {self.task_create_limiter.burst:g} 个任务，本次有 {count} 个，请分多次添加。"
+            if not self.task_create_limiter.allow(user_id, cost=count):
+                self.metrics.inc("task_create_rate_limited_total", help="因频率限制被拒绝的添加任务请求数")
+                return "[SimpleTimeTask] 添加任务过于频繁，请稍后再试。"
+        if self.max_tasks_per_user > 0:
+            owned = self.count_user_tasks(user_id)
+            if owned + count > self.max_tasks_per_user:
+                self.metrics.inc("task_limit_rejected_total", help="因超出每个用户的任务数上限被拒绝的添加任务请求数")
+                return f"[SimpleTimeTask] 每个用户最多 {self.max_tasks_per_user} 个任务，你已有 {owned} 个，请先取消部分任务。"
+        return None
+
+    def is_admin(self, user_id):
+        """ 是否为机器人管理员 """
+        return user_id in RobotConfig.global_config.get("admin_users", [])
+
     def get_help_text(self, **kwargs):
         """获取帮助文本"""
-        help_text = "- [任务列表]：/time 任务列表\n- [取消任务]：/time 取消任务 任务ID\n- [添加任务]：/time <freq> <time> <GPT> <content> <group>\n\n示例：\n    /time 今天 17:00 提醒喝水\n    /time 今天 17:00 GPT 提醒喝水\n    /time 每周日 08:00 GPT 提醒我逛超市\n    /time 不含周日 08:55 摸鱼\n    /time 每月10号 17:00 GPT 提醒我存钱\n    /time 今天 17:00 提醒喝水\n    /time 今天 17:00 GPT 提醒喝水 group[群标题]\n\n注意：设定每月固定日期触发时，如果本月没有指定的日期，任务会默认在当月的最后一天触发。"
+        help_text = "- [任务列表]：/time 任务列表 [页码]\n- [取消任务]：/time 取消任务 任务ID\n- [打印任务]：/time 打印任务 (管理员)\n- [运行状态]：/time 状态 (管理员)\n- [批量添加]：/time 批量 (之后每行一个任务)\n- [导入任务]：/time 导入 文件路径 (管理员，CSV/JSON)\n- [添加任务]：/time <freq> <time> <GPT> <content> <group> <tz> <coalesce[off]>\n- [cron 任务]：/time cron[分 时 日 月 周] <content> <group>\n\n示例：\n    /time 今天 17:00 提醒喝水\n    /time 每天 08:00:30 打卡\n    /time cron[*/15 9-18 * * 1-5] 起来活动一下\n    /time 每天 09:00 东京早会 tz[Asia/Tokyo]\n    /time 今天 17:00 GPT 提醒喝水\n    /time 每周日 08:00 GPT 提醒我逛超市\n    /time 不含周日 08:55 摸鱼\n    /time 每月10号 17:00 GPT 提醒我存钱\n    /time 今天 17:00 提醒喝水\n    /time 今天 17:00 GPT 提醒喝水 group[群标题]\n    /time 每天 08:00 GPT 讲个笑话 coalesce[off]\n\n注意：设定每月固定日期触发时，如果本月没有指定的日期，任务会默认在当月的最后一天触发。\n指令发送过快时会提示稍后再试，提示之后一段时间内超出频率的指令不再回复。"
         return help_text
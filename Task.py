@@ -1,12 +1,38 @@
+import sys
+
+
+def _intern(value):
+    """ 驻留字符串，相同的值在所有任务间共享一个对象；非字符串(例如 None)原样返回 """
+    return sys.intern(value) if type(value) is str else value
+
+
 class Task:
-    def __init__(self, task_id=None, time_value="", frequency="", content="", target_type=0, user_id="", user_name="", user_group_name="", group_title="", is_processed=0):
+    """
+    定时任务。
+
+    使用 __slots__ 去掉每个实例的 __dict__；时间、频率、时区、用户和群等在大量任务间重复的字段驻留(intern)，
+    从数据库读取的每一行不再各自持有一份相同的字符串。任务ID和内容通常各不相同，不做驻留。
+    """
+
+    __slots__ = ("task_id", "time_value", "frequency", "content", "target_type", "user_id", "user_name",
+                 "user_group_name", "group_title", "is_processed", "next_fire", "tz", "no_coalesce", "rule")
+
+    def __init__(self, task_id=None, time_value="", frequency="", content="", target_type=0, user_id="", user_name="", user_group_name="", group_title="", is_processed=0, next_fire=None, tz=None, no_coalesce=0):
         self.task_id = task_id
-        self.time_value = time_value
-        self.frequency = frequency
+        self.time_value = _intern(time_value)
+        self.frequency = _intern(frequency)
         self.content = content
         self.target_type = target_type
-        self.user_id = user_id
-        self.user_name = user_name
-        self.user_group_name = user_group_name
-        self.group_title = group_title
+        self.user_id = _intern(user_id)
+        self.user_name = _intern(user_name)
+        self.user_group_name = _intern(user_group_name)
+        self.group_title = _intern(group_title)
         self.is_processed = is_processed
+        # 下一次触发时间(时间戳)，-1 表示不会再触发
+        self.next_fire = next_fire
+        # 时区(IANA 名称，例如 Asia/Tokyo)，None 表示使用本机时区
+        self.tz = _intern(tz)
+        # 为 1 时 GPT 回复单独生成，不与相同提示词的其他任务共享(coalesce[off])
+        self.no_coalesce = no_coalesce
+        # 编译后的触发规则(TaskRule)，加载或添加任务时生成，频率和时间相同的任务共享同一个规则
+        self.rule = None
@@ -0,0 +1,137 @@
+import time
+import queue
+import threading
+from common.log import logger
+
+
+class TaskDispatcher:
+    """
+    有界的任务分发线程池。
+
+    调度线程只负责把到期任务放入队列，由固定数量的工作线程执行。
+    看门狗线程检查每个任务的运行时间，超时的任务会被记录，并补充一个新的工作线程，
+    避免一个卡住的发送占满线程池；超时线程在任务结束后自行退出。
+    """
+
+    # 运行状态: 正常、已超时、已超时且已补充新线程
+    RUNNING, TIMED_OUT, REPLACED = 0, 1, 2
+
+    def __init__(self, handler, max_workers=4, timeout=60, name="SimpleTimeTask_worker"):
+        self.handler = handler
+        self.max_workers = max(1, int(max_workers))
+        self.timeout = timeout
+        self.name = name
+        self.queue = queue.Queue()
+        self.lock = threading.Lock()
+        # 工作线程 -> [任务ID, 开始时间, 状态]
+        self.running = {}
+        self.workers = set()
+        # 已超时但仍在运行的线程数
+        self.timed_out_workers = 0
+        self.worker_seq = 0
+        self.stopped = False
+        # 统计信息
+        self.submitted = 0
+        self.completed = 0
+        self.failed = 0
+        self.timeouts = 0
+
+    def start(self):
+        """ 启动工作线程和看门狗线程 """
+        with self.lock:
+            for _ in range(self.max_workers):
+                self._spawn_worker()
+        watchdog = threading.Thread(target=self._watchdog, name=f"{self.name}_watchdog")
+        watchdog.daemon = True
+        watchdog.start()
+
+    def submit(self, task, fire_time=None):
+        """ 将任务放入分发队列，不阻塞调用方，fire_time 为本次触发时间，会传给 handler """
+        with self.lock:
+            self.submitted += 1
+        self.queue.put((task, fire_time))
+
+    def get_stats(self):
+        """ 获取队列深度和线程使用情况 """
+        with self.lock:
+            return {
+                "queue_depth": self.queue.qsize(),
+                "busy_workers": sum(1 for entry in self.running.values() if entry[2] != self.REPLACED),
+                "max_workers": self.max_workers,
+                "timed_out_workers": self.timed_out_workers,
+                "submitted": self.submitted,
+                "completed": self.completed,
+                "failed": self.failed,
+                "timeouts": self.timeouts,
+            }
+
+    def stop(self):
+        """ 停止分发，正在执行的任务会继续运行到结束 """
+        with self.lock:
+            self.stopped = True
+            worker_count = len(self.workers)
+        for _ in range(worker_count):
+            self.queue.put(None)
+
+    def _spawn_worker(self):
+        """ 创建工作线程，调用方需持有 self.lock """
+        self.worker_seq += 1
+        worker = threading.Thread(target=self._worker_loop, name=f"{self.name}_{self.worker_seq}")
+        worker.daemon = True
+        self.workers.add(worker)
+        worker.start()
+
+    def _worker_loop(self):
+        worker = threading.current_thread()
+        while True:
+            item = self.queue.get()
+            if item is None:
+                break
+            task, fire_time = item
+            with self.lock:
+                self.running[worker] = [task.task_id, time.monotonic(), self.RUNNING]
+            success = True
+            try:
+                self.handler(task, fire_time)
+            except Exception as e:
+                success = False
+                logger.error(f"[SimpleTimeTask] 执行任务 {task.task_id} 时发生异常: {e}")
+            with self.lock:
+                entry = self.running.pop(worker, None)
+                if success:
+                    self.completed += 1
+                else:
+                    self.failed += 1
+                if entry and entry[2] == self.REPLACED:
+                    # 该线程已超时并被替换，任务结束后退出
+                    self.timed_out_workers -= 1
+                    self.workers.discard(worker)
+                    logger.info(f"[SimpleTimeTask] 超时任务 {task.task_id} 已结束，耗时 {time.monotonic() - entry[1]:.1f}s")
+                    return
+        with self.lock:
+            self.workers.discard(worker)
+
+    def _watchdog(self):
+        """ 检查任务是否超时，超时后补充工作线程 """
+        while not self.stopped:
+            time.sleep(1)
+            now = time.monotonic()
+            with self.lock:
+                for entry in self.running.values():
+                    task_id, start_time, state = entry
+                    if state == self.REPLACED or now - start_time < self.timeout:
+                        continue
+                    if state == self.RUNNING:
+                        entry[2] = self.TIMED_OUT
+                        self.timeouts += 1
+                        logger.warning(f"[SimpleTimeTask] 任务 {task_id} 运行超过 {self.timeout}s，已超时")
+                    if self.stopped:
+                        continue
+                    if self.timed_out_workers >= self.max_workers:
+                        # 卡住的线程过多，暂不补充，避免线程无限增长
+                        if state == self.RUNNING:
+                            logger.error(f"[SimpleTimeTask] 超时线程数已达上限 {self.max_workers}，暂不补充工作线程")
+                        continue
+                    entry[2] = self.REPLACED
+                    self.timed_out_workers += 1
+                    self._spawn_worker()
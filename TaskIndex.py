@@ -0,0 +1,39 @@
+from itertools import islice
+
+
+class TaskIndex:
+    """
+    按任务的某个字段建立的内存二级索引。
+
+    每个字段值对应一个保持插入顺序的任务ID字典，增删为 O(1)，
+    分页读取只遍历到所需的页，开销与结果大小相关，与任务总数无关。
+    """
+
+    def __init__(self, attr):
+        self.attr = attr
+        # 字段值 -> {任务ID: None}
+        self.entries = {}
+
+    def add(self, task):
+        """ 将任务加入索引 """
+        key = getattr(task, self.attr)
+        if key:
+            self.entries.setdefault(key, {})[task.task_id] = None
+
+    def remove(self, task):
+        """ 将任务移出索引 """
+        key = getattr(task, self.attr)
+        task_ids = self.entries.get(key)
+        if task_ids is None:
+            return
+        task_ids.pop(task.task_id, None)
+        if not task_ids:
+            del self.entries[key]
+
+    def count(self, key):
+        """ 获取字段值对应的任务数 """
+        return len(self.entries.get(key, ()))
+
+    def page(self, key, offset, limit):
+        """ 获取字段值对应的一页任务ID """
+        return list(islice(self.entries.get(key, ()), offset, offset + limit))
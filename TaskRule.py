@@ -0,0 +1,383 @@
+import time
+import bisect
+import calendar
+import datetime
+import functools
+import zoneinfo
+
+# date.weekday() 对应的星期名称
+WEEKDAYS = ("Monday", "Tuesday", "Wednesday", "Thursday", "Friday", "Saturday", "Sunday")
+WEEKDAY_BITS = {name: 1 << index for index, name in enumerate(WEEKDAYS)}
+# 指令中星期的写法
+CHINESE_WEEKDAYS = {"一": "Monday", "二": "Tuesday", "三": "Wednesday", "四": "Thursday",
+                    "五": "Friday", "六": "Saturday", "日": "Sunday", "天": "Sunday"}
+# 星期掩码
+ALL_DAYS = 0x7F
+
+# 日期上下文缓存，键为 date.toordinal()
+_day_contexts = {}
+# 工作日历(WorkCalendar)，为 None 时工作日按周一至周五计算
+_work_calendar = None
+# 编译后规则的缓存大小，规则不可变，频率和时间相同的任务共享同一个规则
+RULE_CACHE_SIZE = 65536
+
+
+class DayContext:
+    """ 某一天的日期信息，每个日期只计算一次，供所有任务做整数比较 """
+
+    __slots__ = ("date", "ordinal", "weekday_bit", "day", "month", "days_in_month", "is_workday")
+
+    def __init__(self, date):
+        self.date = date
+        self.ordinal = date.toordinal()
+        self.weekday_bit = 1 << date.weekday()
+        self.day = date.day
+        self.month = date.month
+        self.days_in_month = calendar.monthrange(date.year, date.month)[1]
+        self.is_workday = _work_calendar.is_workday(date) if _work_calendar is not None else date.weekday() < 5
+
+
+def set_work_calendar(work_calendar):
+    """ 设置 work_day 任务使用的工作日历，并丢弃按旧日历计算的日期上下文 """
+    global _work_calendar
+    _work_calendar = work_calendar
+    _day_contexts.clear()
+
+
+def get_zone(tz):
+    """ 获取时区，tz 为空时返回 None(本机时区)，未知的时区抛出 ValueError """
+    if not tz:
+        return None
+    try:
+        return zoneinfo.ZoneInfo(tz)
+    except (zoneinfo.ZoneInfoNotFoundError, ValueError) as e:
+        raise ValueError(f"unknown time zone: {tz}") from e
+
+
+def to_local(timestamp, zone):
+    """ 将时间戳换算为时区 zone(None 为本机时区) 的本地日期序数和当天的秒数 """
+    if zone is None:
+        local = time.localtime(timestamp)
+        ordinal = datetime.date(local.tm_year, local.tm_mon, local.tm_mday).toordinal()
+        return ordinal, local.tm_hour * 3600 + local.tm_min * 60 + min(local.tm_sec, 59)
+    local = datetime.datetime.fromtimestamp(timestamp, zone)
+    return local.toordinal(), local.hour * 3600 + local.minute * 60 + local.second
+
+
+def to_timestamp(date, second_of_day, zone):
+    """
+    将时区 zone(None 为本机时区) 的本地日期和当天的秒数换算为时间戳。
+    夏令时开始时跳过的本地时间按切换前的偏移换算，即推迟切换的时长(通常为一小时，例如纽约的 02:30 换算为 03:30 EDT)，
+    结束时重复的本地时间取第一次。
+    """
+    hour, rest = divmod(second_of_day, 3600)
+    minute, second = divmod(rest, 60)
+    # 不带时区的 datetime 按本机时区换算，与 zoneinfo 一样用 fold=0 处理跳过和重复的时间
+    return datetime.datetime(date.year, date.month, date.day, hour, minute, second, tzinfo=zone).timestamp()
+
+
+def utc_offset(timestamp, zone):
+    """ 时间戳在时区 zone(None 为本机时区) 的 UTC 偏移(秒) """
+    if zone is None:
+        return time.localtime(timestamp).tm_gmtoff
+    return int(datetime.datetime.fromtimestamp(timestamp, zone).utcoffset().total_seconds())
+
+
+@functools.lru_cache(maxsize=64)
+def repeated_window(ordinal, zone):
+    """
+    夏令时结束当天(日期序数 ordinal)本地时间重复的区间。
+    返回 (开始秒数, 结束秒数, 第二次经过开始时刻的时间戳)，当天没有重复的本地时间时返回 None。
+    """
+    date = datetime.date.fromordinal(ordinal)
+    low = int(to_timestamp(date, 0, zone))
+    high = int(to_timestamp(date + datetime.timedelta(days=1), 0, zone))
+    offset_before, offset_after = utc_offset(low, zone), utc_offset(high, zone)
+    if offset_after >= offset_before:
+        return None
+    # 二分查找切换时刻：第一个使用切换后偏移的时间戳
+    while low < high:
+        middle = (low + high) // 2
+        if utc_offset(middle, zone) == offset_after:
+            high = middle
+        else:
+            low = middle + 1
+    _, start = to_local(low, zone)
+    return start, start + offset_before - offset_after, low
+
+
+def get_day_context(ordinal):
+    """ 获取指定日期(序数)的上下文 """
+    day = _day_contexts.get(ordinal)
+    if day is None:
+        if len(_day_contexts) > 512:
+            _day_contexts.clear()
+        day = DayContext(datetime.date.fromordinal(ordinal))
+        _day_contexts[ordinal] = day
+    return day
+
+
+class TaskRule:
+    """
+    由任务频率和时间编译而成的触发规则，创建后不再修改，可由多个任务共享。
+
+    every_day、weekly_*、excludeWeekday_* 统一为星期掩码，work_day 按工作日历判断(含法定节假日和调休)，
+    monthly_N 记录日期 N，once 记录日期序数，时间统一为当天的秒数，按任务的时区 zone(None 为本机时区) 解释。
+    """
+
+    __slots__ = ("frequency", "weekday_mask", "month_day", "once_ordinal", "second_of_day", "workday", "zone")
+
+    def __init__(self, frequency, weekday_mask=0, month_day=0, once_ordinal=0, second_of_day=0, workday=False, zone=None):
+        self.frequency = frequency
+        self.weekday_mask = weekday_mask
+        self.month_day = month_day
+        self.once_ordinal = once_ordinal
+        self.second_of_day = second_of_day
+        self.workday = workday
+        self.zone = zone
+
+    @property
+    def is_once(self):
+        return self.once_ordinal != 0
+
+    @property
+    def has_seconds(self):
+        """ 触发时间是否精确到秒(不在整分) """
+        return self.second_of_day % 60 != 0
+
+    def matches(self, day):
+        """ 判断规则在指定日期(DayContext)是否需要触发 """
+        if self.once_ordinal:
+            return day.ordinal == self.once_ordinal
+        if self.month_day:
+            # 如果本月没有指定的日期，在本月最后一天触发
+            return day.day == self.month_day or (self.month_day > day.days_in_month and day.day == day.days_in_month)
+        if self.workday:
+            return day.is_workday
+        return (self.weekday_mask & day.weekday_bit) != 0
+
+    def next_fire_time(self, after):
+        """ 计算 after(时间戳, 含) 之后的下一次触发时间，不会再触发时返回 None """
+        if self.once_ordinal:
+            fire_time = to_timestamp(datetime.date.fromordinal(self.once_ordinal), self.second_of_day, self.zone)
+            return fire_time if fire_time >= after else None
+
+        start, _ = to_local(after, self.zone)
+        # 相邻两次触发最多间隔一个月
+        for ordinal in range(start, start + 62):
+            day = get_day_context(ordinal)
+            if not self.matches(day):
+                continue
+            fire_time = to_timestamp(day.date, self.second_of_day, self.zone)
+            if fire_time >= after:
+                return fire_time
+        return None
+
+
+class CronRule:
+    """
+    由 cron 表达式编译而成的触发规则，接口与 TaskRule 相同。
+
+    表达式为 "分 时 日 月 周" 五段，或在最前面加上秒的六段；每段支持 *、数字、a-b、*/n、a-b/n 和逗号分隔的列表，
+    周的 0 和 7 都表示周日。日和周都不是 * 时，满足其一即触发(与 cron 相同)。
+    日期部分编译为位掩码，时分秒编译为有序列表：计算下一次触发时先按天跳过不匹配的日期，
+    再在当天用二分查找定位第一个不早于起点的时分秒，不需要逐分钟检查。
+    夏令时结束时重复的本地时间默认只触发一次；秒、分或时字段含 * 的间隔表达式在第二次经过时也继续触发。
+    """
+
+    __slots__ = ("frequency", "expression", "seconds", "minutes", "hours", "month_day_mask", "month_mask",
+                 "weekday_mask", "day_or", "zone", "repeat_on_fold")
+
+    # 日期条件永远无法满足时(例如 2 月 30 日)停止查找的天数，覆盖闰年 2 月 29 日的最长间隔
+    MAX_SEARCH_DAYS = 366 * 8 + 1
+
+    def __init__(self, expression, seconds, minutes, hours, month_day_mask, month_mask, weekday_mask, day_or, zone=None,
+                 repeat_on_fold=False):
+        self.frequency = "cron"
+        self.expression = expression
+        self.seconds = seconds
+        self.minutes = minutes
+        self.hours = hours
+        self.month_day_mask = month_day_mask
+        self.month_mask = month_mask
+        self.weekday_mask = weekday_mask
+        self.day_or = day_or
+        self.zone = zone
+        self.repeat_on_fold = repeat_on_fold
+
+    @property
+    def is_once(self):
+        return False
+
+    @property
+    def has_seconds(self):
+        """ 秒字段是否不只有 0 """
+        return self.seconds != [0]
+
+    def matches(self, day):
+        """ 判断规则在指定日期(DayContext)是否可能触发 """
+        if not (self.month_mask >> day.month) & 1:
+            return False
+        month_day = (self.month_day_mask >> day.day) & 1
+        weekday = (self.weekday_mask & day.weekday_bit) != 0
+        return (month_day or weekday) if self.day_or else (month_day and weekday)
+
+    def first_second_of_day(self, start):
+        """ 当天不早于 start(当天的秒数) 的第一个触发时刻(秒数)，没有时返回 None """
+        hour, rest = divmod(start, 3600)
+        minute, second = divmod(rest, 60)
+        for hour_value in self.hours[bisect.bisect_left(self.hours, hour):]:
+            if hour_value != hour:
+                return hour_value * 3600 + self.minutes[0] * 60 + self.seconds[0]
+            for minute_value in self.minutes[bisect.bisect_left(self.minutes, minute):]:
+                if minute_value != minute:
+                    return hour_value * 3600 + minute_value * 60 + self.seconds[0]
+                index = bisect.bisect_left(self.seconds, second)
+                if index < len(self.seconds):
+                    return hour_value * 3600 + minute_value * 60 + self.seconds[index]
+        return None
+
+    def next_fire_time(self, after):
+        """ 计算 after(时间戳, 含) 之后的下一次触发时间，不会再触发时返回 None """
+        after = int(-(-after // 1))
+        start, start_second = to_local(after, self.zone)
+        for ordinal in range(start, start + self.MAX_SEARCH_DAYS):
+            day = get_day_context(ordinal)
+            if not self.matches(day):
+                continue
+            fire_time = None
+            second_of_day = self.first_second_of_day(start_second if ordinal == start else 0)
+            while second_of_day is not None:
+                fire_time = to_timestamp(day.date, second_of_day, self.zone)
+                # 夏令时切换当天本地时间可能不连续，换算后早于起点的时刻继续向后查找
+                if fire_time >= after:
+                    break
+                fire_time = None
+                second_of_day = self.first_second_of_day(second_of_day + 1)
+            if self.repeat_on_fold:
+                repeated_time = self.repeated_fire_time(ordinal, after)
+                if repeated_time is not None and (fire_time is None or repeated_time < fire_time):
+                    fire_time = repeated_time
+            if fire_time is not None:
+                return fire_time
+        return None
+
+    def repeated_fire_time(self, ordinal, after):
+        """ 夏令时结束当天第二次经过重复的本地时间时，不早于 after 的第一个触发时间，没有时返回 None """
+        window = repeated_window(ordinal, self.zone)
+        if window is None:
+            return None
+        start, end, switch_time = window
+        if after >= switch_time + end - start:
+            return None
+        lower = start if after < switch_time else start + after - switch_time
+        second_of_day = self.first_second_of_day(lower)
+        if second_of_day is None or second_of_day >= end:
+            return None
+        return switch_time + second_of_day - start
+
+
+def parse_second_of_day(time_value):
+    """ 将 HH:MM 或 HH:MM:SS 解析为当天的秒数 """
+    parts = [int(x) for x in time_value.split(":")]
+    if len(parts) == 2:
+        parts.append(0)
+    hour, minute, second = parts
+    if not (0 <= hour < 24 and 0 <= minute < 60 and 0 <= second < 60):
+        raise ValueError(f"invalid time: {time_value}")
+    return hour * 3600 + minute * 60 + second
+
+
+def parse_cron_field(field, low, high):
+    """ 将 cron 表达式的一段解析为取值集合，取值范围为 [low, high] """
+    values = set()
+    for part in field.split(","):
+        value_range, _, step = part.partition("/")
+        step = int(step) if step else 1
+        if value_range == "*":
+            start, end = low, high
+        elif "-" in value_range:
+            start, end = [int(x) for x in value_range.split("-")]
+        else:
+            start = int(value_range)
+            # a/n 表示从 a 开始到最大值
+            end = high if "/" in part else start
+        if not (low <= start <= end <= high and step > 0):
+            raise ValueError(f"invalid cron field: {field}")
+        values.update(range(start, end + 1, step))
+    return values
+
+
+def compile_cron(expression, zone=None):
+    """ 编译 cron 表达式，返回 CronRule，zone 为解释表达式的时区 """
+    fields = expression.split()
+    if len(fields) == 5:
+        fields.insert(0, "0")
+    if len(fields) != 6:
+        raise ValueError(f"invalid cron expression: {expression}")
+    second, minute, hour, month_day, month, weekday = fields
+    weekday_mask = 0
+    for value in parse_cron_field(weekday, 0, 7):
+        # cron 的周日为 0 或 7，星期一为 1；掩码与 date.weekday() 一致，星期一为第 0 位
+        weekday_mask |= 1 << ((value - 1) % 7)
+    return CronRule(
+        expression,
+        seconds=sorted(parse_cron_field(second, 0, 59)),
+        minutes=sorted(parse_cron_field(minute, 0, 59)),
+        hours=sorted(parse_cron_field(hour, 0, 23)),
+        month_day_mask=sum(1 << value for value in parse_cron_field(month_day, 1, 31)),
+        month_mask=sum(1 << value for value in parse_cron_field(month, 1, 12)),
+        weekday_mask=weekday_mask,
+        day_or=month_day != "*" and weekday != "*",
+        zone=zone,
+        repeat_on_fold="*" in second + minute + hour,
+    )
+
+
+def build_frequency_grammar():
+    """
+    构建指令中的频率写法到任务频率的映射，例如 "每周一" -> "weekly_Monday"、"每月10号" -> "monthly_10"。
+    "今天"、"明天" 映射为 "once"，由调用方在时间前补充日期；"cron" 的时间为 cron 表达式。
+    """
+    grammar = {"今天": "once", "明天": "once", "每天": "every_day", "工作日": "work_day", "cron": "cron"}
+    for char, name in CHINESE_WEEKDAYS.items():
+        grammar[f"每周{char}"] = f"weekly_{name}"
+        grammar[f"不含周{char}"] = f"excludeWeekday_{name}"
+    for day in range(1, 32):
+        grammar[f"每月{day}号"] = f"monthly_{day}"
+    return grammar
+
+
+@functools.lru_cache(maxsize=RULE_CACHE_SIZE)
+def compile_rule(frequency, time_value, tz=None):
+    """
+    编译任务频率和时间，结果按参数缓存，返回的规则不可修改。
+
+    :param frequency: 频率，例如 "once"、"work_day"、"weekly_Monday"、"monthly_10"、"cron"
+    :param time_value: 时间，一次性任务为 "YYYY-MM-DD HH:MM[:SS]"，cron 任务为 cron 表达式，其他任务为 "HH:MM[:SS]"
+    :param tz: IANA 时区名，例如 "Asia/Tokyo"，为空时使用本机时区
+    :return: TaskRule 或 CronRule
+    :raises ValueError: 频率、时间或时区不正确
+    """
+    zone = get_zone(tz)
+    if frequency == "once":
+        date_str, time_str = time_value.split(" ")
+        date = datetime.datetime.strptime(date_str, "%Y-%m-%d").date()
+        return TaskRule(frequency, once_ordinal=date.toordinal(), second_of_day=parse_second_of_day(time_str), zone=zone)
+    if frequency == "cron":
+        return compile_cron(time_value, zone)
+
+    second_of_day = parse_second_of_day(time_value)
+    if frequency == "every_day":
+        return TaskRule(frequency, weekday_mask=ALL_DAYS, second_of_day=second_of_day, zone=zone)
+    if frequency == "work_day":
+        return TaskRule(frequency, workday=True, second_of_day=second_of_day, zone=zone)
+
+    kind, _, arg = frequency.partition("_")
+    if kind == "weekly" and arg in WEEKDAY_BITS:
+        return TaskRule(frequency, weekday_mask=WEEKDAY_BITS[arg], second_of_day=second_of_day, zone=zone)
+    if kind == "excludeWeekday" and arg in WEEKDAY_BITS:
+        return TaskRule(frequency, weekday_mask=ALL_DAYS & ~WEEKDAY_BITS[arg], second_of_day=second_of_day, zone=zone)
+    if kind == "monthly" and arg.isdigit() and 1 <= int(arg) <= 31:
+        return TaskRule(frequency, month_day=int(arg), second_of_day=second_of_day, zone=zone)
+    raise ValueError(f"unknown frequency: {frequency}")
@@ -0,0 +1,97 @@
+import time
+import heapq
+import threading
+
+
+class TaskScheduler:
+    """
+    按下一次触发时间排序的任务堆。
+
+    堆中保存 (触发时间戳, 任务ID)，self.next_fire 记录每个任务当前有效的触发时间，
+    取消或重新调度时不在堆中查找删除，而是在出堆时丢弃与 self.next_fire 不一致的旧条目，
+    因此入堆、出堆的开销均为 O(log N)。
+    """
+
+    def __init__(self):
+        self.heap = []
+        self.next_fire = {}
+        self.cond = threading.Condition()
+        self.stopped = False
+
+    def __len__(self):
+        return len(self.next_fire)
+
+    def push(self, task_id, fire_time):
+        """ 调度任务在 fire_time(时间戳) 触发，如果比当前最早的触发时间更早则唤醒等待线程 """
+        with self.cond:
+            self.next_fire[task_id] = fire_time
+            heapq.heappush(self.heap, (fire_time, task_id))
+            if self.heap[0][1] == task_id and self.heap[0][0] == fire_time:
+                self.cond.notify_all()
+
+    def remove(self, task_id):
+        """ 取消任务的调度，堆中的旧条目在出堆时丢弃 """
+        with self.cond:
+            if self.next_fire.pop(task_id, None) is not None:
+                self.cond.notify_all()
+
+    def clear(self):
+        """ 清空所有调度 """
+        with self.cond:
+            self.heap = []
+            self.next_fire.clear()
+            self.cond.notify_all()
+
+    def get_next_fire(self, task_id):
+        """ 获取任务当前的下一次触发时间 """
+        return self.next_fire.get(task_id)
+
+    def peek(self):
+        """ 返回最早的有效触发时间，没有任务时返回 None """
+        with self.cond:
+            self._drop_stale()
+            return self.heap[0][0] if self.heap else None
+
+    def wait_due(self, max_wait):
+        """
+        阻塞直到最早的任务到期、有新任务/取消唤醒、调度器停止或等待超过 max_wait 秒。
+
+        返回:
+            list: 已到期的 (触发时间戳, 任务ID) 列表，按触发时间排序；没有到期任务时为空列表。
+        """
+        with self.cond:
+            if self.stopped:
+                return []
+            self._drop_stale()
+            now = time.time()
+            if not self.heap or self.heap[0][0] > now:
+                # 睡眠到最早的触发时间
+                timeout = max_wait if not self.heap else min(self.heap[0][0] - now, max_wait)
+                if timeout > 0:
+                    self.cond.wait(timeout)
+                self._drop_stale()
+                now = time.time()
+
+            due = []
+            while self.heap and self.heap[0][0] <= now:
+                fire_time, task_id = heapq.heappop(self.heap)
+                if self.next_fire.get(task_id) == fire_time:
+                    del self.next_fire[task_id]
+                    due.append((fire_time, task_id))
+            return due
+
+    def wake(self):
+        """ 唤醒等待线程，使其立即执行一次调度 """
+        with self.cond:
+            self.cond.notify_all()
+
+    def stop(self):
+        """ 停止调度并唤醒等待线程 """
+        with self.cond:
+            self.stopped = True
+            self.cond.notify_all()
+
+    def _drop_stale(self):
+        """ 丢弃堆顶已取消或已重新调度的旧条目 """
+        while self.heap and self.next_fire.get(self.heap[0][1]) != self.heap[0][0]:
+            heapq.heappop(self.heap)
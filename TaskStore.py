@@ -0,0 +1,626 @@
+import os
+import re
+import sqlite3
+import time
+import threading
+from common.log import logger
+from plugins.SimpleTimeTask.Task import Task
+
+# 任务表字段，顺序与 task_to_row / row_to_task 一致
+TASK_COLUMNS = (
+    'id', 'time', 'frequency', 'content',
+    'target_type', 'user_id', 'user_name',
+    'user_group_name', 'group_title', 'is_processed',
+    'next_fire', 'tz', 'no_coalesce'
+)
+# 后续版本新增的字段及其定义，旧表缺少这些字段时通过 ALTER TABLE 补充，不再重建表
+ADDED_COLUMNS = {
+    'next_fire': 'INTEGER',
+    'tz': 'TEXT',
+    'no_coalesce': 'INTEGER DEFAULT 0',
+}
+
+CREATE_TASKS_SQL = '''
+    CREATE TABLE IF NOT EXISTS tasks (
+        id TEXT PRIMARY KEY,
+        time TEXT NOT NULL,
+        frequency TEXT,
+        content TEXT NOT NULL,
+        target_type INTEGER DEFAULT 0,
+        user_id TEXT,
+        user_name TEXT,
+        user_group_name TEXT,
+        group_title TEXT,
+        is_processed INTEGER DEFAULT 0,
+        next_fire INTEGER,
+        tz TEXT,
+        no_coalesce INTEGER DEFAULT 0
+    )
+'''
+# 任务表索引，next_fire 为下一次触发时间(时间戳)，-1 表示不会再触发，NULL 表示尚未计算
+TASK_INDEXES = {
+    'idx_tasks_next_fire': 'CREATE INDEX IF NOT EXISTS idx_tasks_next_fire ON tasks(next_fire)',
+    'idx_tasks_user_id': 'CREATE INDEX IF NOT EXISTS idx_tasks_user_id ON tasks(user_id)',
+    'idx_tasks_group_title': 'CREATE INDEX IF NOT EXISTS idx_tasks_group_title ON tasks(group_title)',
+}
+# 发送失败且重试次数用尽的消息
+CREATE_DEAD_LETTERS_SQL = '''
+    CREATE TABLE IF NOT EXISTS dead_letters (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        task_id TEXT,
+        receiver TEXT,
+        content TEXT,
+        attempts INTEGER,
+        error TEXT,
+        created_at INTEGER
+    )
+'''
+# 多进程协调使用的租约，name 为租约名，owner 为持有者，expires_at 为过期时间(时间戳)
+CREATE_LEASES_SQL = '''
+    CREATE TABLE IF NOT EXISTS leases (
+        name TEXT PRIMARY KEY,
+        owner TEXT NOT NULL,
+        expires_at REAL NOT NULL
+    )
+'''
+# 协调模式下记录任务的插入和删除，由触发器写入，各进程按 seq 增量同步其他进程的变更
+CREATE_TASK_CHANGES_SQL = '''
+    CREATE TABLE IF NOT EXISTS task_changes (
+        seq INTEGER PRIMARY KEY AUTOINCREMENT,
+        task_id TEXT NOT NULL,
+        deleted INTEGER NOT NULL,
+        created_at INTEGER NOT NULL
+    )
+'''
+TASK_CHANGE_TRIGGERS = {
+    'trg_tasks_insert': '''
+        CREATE TRIGGER IF NOT EXISTS trg_tasks_insert AFTER INSERT ON tasks BEGIN
+            INSERT INTO task_changes (task_id, deleted, created_at) VALUES (NEW.id, 0, CAST(strftime('%s', 'now') AS INTEGER));
+        END
+    ''',
+    'trg_tasks_delete': '''
+        CREATE TRIGGER IF NOT EXISTS trg_tasks_delete AFTER DELETE ON tasks BEGIN
+            INSERT INTO task_changes (task_id, deleted, created_at) VALUES (OLD.id, 1, CAST(strftime('%s', 'now') AS INTEGER));
+        END
+    ''',
+}
+
+# SQL 语句保持为常量，sqlite3 按语句文本缓存预编译结果，长连接上可重复使用
+_COLUMNS_SQL = ", ".join(TASK_COLUMNS)
+_VALUES_SQL = ", ".join("?" * len(TASK_COLUMNS))
+INSERT_TASK_SQL = f'INSERT INTO tasks ({_COLUMNS_SQL}) VALUES ({_VALUES_SQL})'
+UPSERT_TASK_SQL = f'INSERT OR REPLACE INTO tasks ({_COLUMNS_SQL}) VALUES ({_VALUES_SQL})'
+DELETE_TASK_SQL = 'DELETE FROM tasks WHERE id = ?'
+UPDATE_STATUS_SQL = 'UPDATE tasks SET is_processed = ? WHERE id = ?'
+UPDATE_STATE_SQL = 'UPDATE tasks SET is_processed = ?, next_fire = ? WHERE id = ?'
+UPDATE_NEXT_FIRE_SQL = 'UPDATE tasks SET next_fire = ? WHERE id = ?'
+RESET_STATUS_SQL = 'UPDATE tasks SET is_processed = 0 WHERE is_processed = 1'
+SELECT_TASKS_SQL = f'SELECT {_COLUMNS_SQL} FROM tasks'
+SELECT_TASK_PAGE_SQL = f'SELECT {_COLUMNS_SQL} FROM tasks WHERE id > ? ORDER BY id LIMIT ?'
+SELECT_UNSCHEDULED_PAGE_SQL = f'SELECT {_COLUMNS_SQL} FROM tasks WHERE next_fire IS NULL AND id > ? ORDER BY id LIMIT ?'
+SELECT_DUE_TASKS_SQL = f'SELECT {_COLUMNS_SQL} FROM tasks WHERE next_fire >= 0 AND next_fire < ?'
+SELECT_TASK_EXISTS_SQL = 'SELECT 1 FROM tasks WHERE id = ?'
+SELECT_TASK_IDS_SQL = 'SELECT id FROM tasks'
+# 租约不存在、已过期或由自己持有时获取成功
+ACQUIRE_LEASE_SQL = '''
+    INSERT INTO leases (name, owner, expires_at) VALUES (?, ?, ?)
+    ON CONFLICT(name) DO UPDATE SET owner = excluded.owner, expires_at = excluded.expires_at
+    WHERE leases.owner = excluded.owner OR leases.expires_at < ?
+'''
+RELEASE_LEASE_SQL = 'DELETE FROM leases WHERE name = ? AND owner = ?'
+COUNT_LEASES_SQL = 'SELECT COUNT(*) FROM leases WHERE name LIKE ? AND expires_at >= ?'
+SELECT_TASK_CHANGES_SQL = 'SELECT seq, task_id, deleted FROM task_changes WHERE seq > ? ORDER BY seq'
+SELECT_MIN_CHANGE_SEQ_SQL = 'SELECT MIN(seq) FROM task_changes'
+SELECT_LAST_CHANGE_SEQ_SQL = "SELECT COALESCE((SELECT seq FROM sqlite_sequence WHERE name = 'task_changes'), 0)"
+PRUNE_TASK_CHANGES_SQL = 'DELETE FROM task_changes WHERE created_at < ?'
+INSERT_DEAD_LETTER_SQL = 'INSERT INTO dead_letters (task_id, receiver, content, attempts, error, created_at) VALUES (?, ?, ?, ?, ?, ?)'
+# 可按字段分页查询的列，键为字段名
+COUNT_TASKS_BY_SQL = {column: f'SELECT COUNT(*) FROM tasks WHERE {column} = ?' for column in ('user_id', 'group_title')}
+SELECT_TASKS_BY_SQL = {column: f'SELECT {_COLUMNS_SQL} FROM tasks WHERE {column} = ? ORDER BY rowid LIMIT ? OFFSET ?' for column in ('user_id', 'group_title')}
+
+
+class TaskStore:
+    """
+    任务数据库存储层。
+
+    持有一个长连接，使用 WAL 日志模式和可配置的 synchronous 级别，
+    所有读写通过同一把锁串行化，可在调度线程、分发线程和指令线程中共同使用。
+    """
+
+    def __init__(self, db_path, synchronous="NORMAL", busy_timeout=5000):
+        self.db_path = db_path
+        self.lock = threading.RLock()
+        self.conn = sqlite3.connect(db_path, timeout=busy_timeout / 1000, check_same_thread=False, cached_statements=256)
+        self.conn.execute("PRAGMA journal_mode=WAL;")
+        self.conn.execute(f"PRAGMA synchronous={synchronous};")
+        self.conn.execute(f"PRAGMA busy_timeout={int(busy_timeout)};")
+
+    def init_schema(self):
+        """ 创建任务表，表结构不兼容时重建，存在 frequency 的 CHECK 约束时迁移 """
+        with self.lock, self.conn:
+            cursor = self.conn.cursor()
+
+            # 检查表是否存在并获取元数据
+            cursor.execute("SELECT name FROM sqlite_master WHERE type='table' AND name='tasks';")
+            table_exists = cursor.fetchone() is not None
+
+            if table_exists:
+                # 表存在，检查字段兼容性
+                cursor.execute("PRAGMA table_info(tasks);")
+                column_names = [column[1] for column in cursor.fetchall()]
+
+                # 检查字段是否兼容，只缺少新增字段时补充字段
+                missing_columns = [name for name in TASK_COLUMNS if name not in column_names]
+                unknown_columns = [name for name in column_names if name not in TASK_COLUMNS]
+                if unknown_columns or any(name not in ADDED_COLUMNS for name in missing_columns):
+                    logger.warning("[SimpleTimeTask] Database schema is incompatible. Dropping and recreating the tasks table.")
+                    cursor.execute("DROP TABLE tasks;")
+                else:
+                    for name in missing_columns:
+                        logger.info(f"[SimpleTimeTask] Adding column '{name}' to the tasks table.")
+                        cursor.execute(f"ALTER TABLE tasks ADD COLUMN {name} {ADDED_COLUMNS[name]};")
+
+            # 创建数据表（如果不存在）
+            cursor.execute(CREATE_TASKS_SQL)
+
+        # 旧版本创建的表带有 frequency 的 CHECK 约束，启动时迁移一次
+        if self.has_frequency_check_constraint():
+            logger.info("[SimpleTimeTask] 检测到 frequency 字段的 CHECK 约束，开始迁移数据库。")
+            if self.migrate_tasks_table():
+                logger.info("[SimpleTimeTask] 数据库迁移成功，已移除 CHECK 约束。")
+            else:
+                logger.error("[SimpleTimeTask] 数据库迁移失败，新频率的任务将无法保存。")
+
+        with self.lock, self.conn:
+            for create_index_sql in TASK_INDEXES.values():
+                self.conn.execute(create_index_sql)
+            self.conn.execute(CREATE_DEAD_LETTERS_SQL)
+            self.conn.execute(CREATE_LEASES_SQL)
+
+    def load_tasks(self):
+        """ 读取所有任务行 """
+        with self.lock:
+            return self.conn.execute(SELECT_TASKS_SQL).fetchall()
+
+    def iter_tasks(self, chunk_size=1000, unscheduled_only=False):
+        """
+        按任务ID分页读取任务行，每页单独查询，不在两页之间持有锁。
+
+        :param chunk_size: 每页行数
+        :param unscheduled_only: 只读取尚未计算下一次触发时间的任务
+        :return: 逐页返回行列表的生成器
+        """
+        sql = SELECT_UNSCHEDULED_PAGE_SQL if unscheduled_only else SELECT_TASK_PAGE_SQL
+        last_id = ""
+        while True:
+            with self.lock:
+                rows = self.conn.execute(sql, (last_id, chunk_size)).fetchall()
+            if not rows:
+                return
+            yield rows
+            last_id = rows[-1][0]
+
+    def load_tasks_due_before(self, until):
+        """ 读取下一次触发时间早于 until(时间戳) 的任务行 """
+        with self.lock:
+            return self.conn.execute(SELECT_DUE_TASKS_SQL, (until,)).fetchall()
+
+    def count_tasks_by(self, column, value):
+        """ 统计字段(user_id 或 group_title)等于 value 的任务数 """
+        with self.lock:
+            return self.conn.execute(COUNT_TASKS_BY_SQL[column], (value,)).fetchone()[0]
+
+    def load_tasks_by(self, column, value, offset, limit):
+        """ 分页读取字段(user_id 或 group_title)等于 value 的任务行，按添加顺序排列 """
+        with self.lock:
+            return self.conn.execute(SELECT_TASKS_BY_SQL[column], (value, limit, offset)).fetchall()
+
+    def task_exists(self, task_id):
+        """ 检查任务是否存在 """
+        with self.lock:
+            return self.conn.execute(SELECT_TASK_EXISTS_SQL, (task_id,)).fetchone() is not None
+
+    def load_task_ids(self):
+        """ 读取所有任务ID """
+        with self.lock:
+            return {row[0] for row in self.conn.execute(SELECT_TASK_IDS_SQL)}
+
+    def load_tasks_by_ids(self, task_ids, chunk_size=500):
+        """ 读取指定ID的任务行，分批查询以避免超过 SQLite 的参数数量限制 """
+        task_ids = list(task_ids)
+        rows = []
+        for offset in range(0, len(task_ids), chunk_size):
+            chunk = task_ids[offset:offset + chunk_size]
+            sql = f'{SELECT_TASKS_SQL} WHERE id IN ({", ".join("?" * len(chunk))})'
+            with self.lock:
+                rows.extend(self.conn.execute(sql, chunk).fetchall())
+        return rows
+
+    def enable_change_log(self):
+        """ 创建任务变更日志表和触发器(协调模式) """
+        with self.lock, self.conn:
+            self.conn.execute(CREATE_TASK_CHANGES_SQL)
+            for create_trigger_sql in TASK_CHANGE_TRIGGERS.values():
+                self.conn.execute(create_trigger_sql)
+
+    def disable_change_log(self):
+        """ 删除任务变更日志表和触发器，未启用协调时不再为每次写入记录变更 """
+        with self.lock, self.conn:
+            for trigger_name in TASK_CHANGE_TRIGGERS:
+                self.conn.execute(f"DROP TRIGGER IF EXISTS {trigger_name};")
+            self.conn.execute("DROP TABLE IF EXISTS task_changes;")
+
+    def last_change_seq(self):
+        """ 最后一条任务变更的序号，没有变更时为 0 """
+        with self.lock:
+            return self.conn.execute(SELECT_LAST_CHANGE_SEQ_SQL).fetchone()[0]
+
+    def load_task_changes(self, after_seq):
+        """
+        读取序号大于 after_seq 的任务变更
+
+        :return: ([(序号, 任务ID, 是否删除)], 是否缺失)，after_seq 之后的变更已被清理时"是否缺失"为 True，调用方需全量同步
+        """
+        with self.lock:
+            changes = self.conn.execute(SELECT_TASK_CHANGES_SQL, (after_seq,)).fetchall()
+            oldest = self.conn.execute(SELECT_MIN_CHANGE_SEQ_SQL).fetchone()[0]
+            if oldest is None:
+                oldest = self.conn.execute(SELECT_LAST_CHANGE_SEQ_SQL).fetchone()[0] + 1
+        return changes, oldest > after_seq + 1
+
+    def prune_task_changes(self, before):
+        """ 清理 before(时间戳) 之前的任务变更 """
+        try:
+            with self.lock, self.conn:
+                self.conn.execute(PRUNE_TASK_CHANGES_SQL, (int(before),))
+        except sqlite3.Error as e:
+            logger.error(f"[SimpleTimeTask] Failed to prune task changes: {e}")
+
+    def acquire_lease(self, name, owner, ttl):
+        """ 获取或续期租约，租约由其他持有者持有且未过期时返回 False """
+        now = time.time()
+        try:
+            with self.lock, self.conn:
+                cursor = self.conn.execute(ACQUIRE_LEASE_SQL, (name, owner, now + ttl, now))
+                return cursor.rowcount == 1
+        except sqlite3.Error as e:
+            logger.error(f"[SimpleTimeTask] Failed to acquire lease {name}: {e}")
+            return False
+
+    def release_lease(self, name, owner):
+        """ 释放自己持有的租约 """
+        try:
+            with self.lock, self.conn:
+                self.conn.execute(RELEASE_LEASE_SQL, (name, owner))
+        except sqlite3.Error as e:
+            logger.error(f"[SimpleTimeTask] Failed to release lease {name}: {e}")
+
+    def count_leases(self, prefix):
+        """ 统计名称以 prefix 开头且未过期的租约数 """
+        with self.lock:
+            return self.conn.execute(COUNT_LEASES_SQL, (prefix + "%", time.time())).fetchone()[0]
+
+    def update_next_fires(self, next_fires):
+        """ 在一个事务中写入多个任务的下一次触发时间，next_fires 为 (下一次触发时间, 任务ID) 列表 """
+        with self.lock, self.conn:
+            self.conn.executemany(UPDATE_NEXT_FIRE_SQL, next_fires)
+
+    def reset_processed_status(self):
+        """ 重置数据库中所有任务的处理状态 """
+        try:
+            with self.lock, self.conn:
+                self.conn.execute(RESET_STATUS_SQL)
+        except sqlite3.Error as e:
+            logger.error(f"[SimpleTimeTask] Failed to reset processed status: {e}")
+
+    def insert_task(self, task):
+        """ 插入任务，成功返回 True """
+        try:
+            with self.lock, self.conn:
+                self.conn.execute(INSERT_TASK_SQL, self.task_to_row(task))
+            logger.info(f"[SimpleTimeTask] Task added to DB: {task.task_id}")
+            return True
+        except sqlite3.Error as e:
+            logger.error(f"[SimpleTimeTask] Failed to add task {task.task_id} to DB: {e}")
+            return False
+
+    def delete_task(self, task_id):
+        """ 删除任务 """
+        try:
+            with self.lock, self.conn:
+                self.conn.execute(DELETE_TASK_SQL, (task_id,))
+            logger.info(f"[SimpleTimeTask] Task removed from DB: {task_id}")
+        except sqlite3.Error as e:
+            logger.error(f"[SimpleTimeTask] Failed to remove task {task_id} from DB: {e}")
+
+    def update_task_status(self, task_id, is_processed):
+        """ 更新任务的处理状态 """
+        self.update_task_statuses([task_id], is_processed)
+
+    def update_task_statuses(self, task_ids, is_processed):
+        """ 在一个事务中更新多个任务的处理状态 """
+        if not task_ids:
+            return
+        try:
+            with self.lock, self.conn:
+                self.conn.executemany(UPDATE_STATUS_SQL, [(is_processed, task_id) for task_id in task_ids])
+            logger.info(f"[SimpleTimeTask] Task status updated in DB: {len(task_ids)} task(s) to {is_processed}")
+        except sqlite3.Error as e:
+            logger.error(f"[SimpleTimeTask] update task status failed: {e}")
+
+    def apply_batch(self, upserts, states, deletes):
+        """
+        在一个事务中写入一批合并后的操作。
+
+        :param upserts: 需要插入或覆盖的任务列表
+        :param states: 需要更新处理状态和下一次触发时间的任务列表
+        :param deletes: 需要删除的任务ID列表
+        :raises sqlite3.Error: 写入失败，事务已回滚
+        """
+        with self.lock, self.conn:
+            if upserts:
+                self.conn.executemany(UPSERT_TASK_SQL, [self.task_to_row(task) for task in upserts])
+            if states:
+                self.conn.executemany(UPDATE_STATE_SQL, [(task.is_processed, task.next_fire, task.task_id) for task in states])
+            if deletes:
+                self.conn.executemany(DELETE_TASK_SQL, [(task_id,) for task_id in deletes])
+
+    def add_dead_letter(self, task_id, receiver, content, attempts, error):
+        """ 记录发送失败且不再重试的消息 """
+        try:
+            with self.lock, self.conn:
+                self.conn.execute(INSERT_DEAD_LETTER_SQL, (task_id, receiver, content, attempts, error, int(time.time())))
+        except sqlite3.Error as e:
+            logger.error(f"[SimpleTimeTask] Failed to add dead letter for task {task_id}: {e}")
+
+    def has_frequency_check_constraint(self):
+        """
+        检查 tasks 表的 frequency 字段是否有 CHECK 约束。
+
+        返回:
+            bool: 如果有 CHECK 约束则返回 True，否则返回 False。
+        """
+        try:
+            with self.lock:
+                result = self.conn.execute("""
+                    SELECT sql FROM sqlite_master
+                    WHERE type='table' AND name='tasks';
+                """).fetchone()
+            if result:
+                create_table_sql = result[0]
+                # 打印 CREATE TABLE 语句用于调试
+                logger.debug(f"CREATE TABLE 语句: {create_table_sql}")
+
+                # 查找所有 CHECK 约束
+                checks = re.findall(r'CHECK\s*\((.*?)\)', create_table_sql, re.IGNORECASE | re.DOTALL)
+                logger.debug(f"检测到的 CHECK 约束: {checks}")
+
+                for check in checks:
+                    if 'frequency' in check.lower():
+                        return True
+            return False
+        except sqlite3.Error as e:
+            logger.error(f"检查约束失败: {e}")
+            return False
+
+    def migrate_tasks_table(self):
+        """
+        迁移 tasks 表，移除 frequency 字段的 CHECK 约束。
+        迁移前使用 SQLite 在线备份接口备份数据库(WAL 模式下直接复制文件可能丢失未检查点的数据)，
+        迁移失败时保留备份文件。
+
+        返回:
+            bool: 迁移是否成功。
+        """
+        backup_path = self.db_path + "_backup.db"
+
+        with self.lock:
+            try:
+                # 备份数据库文件
+                with sqlite3.connect(backup_path) as backup_conn:
+                    self.conn.backup(backup_conn)
+                backup_conn.close()
+                logger.info(f"数据库已成功备份到 {backup_path}")
+            except sqlite3.Error as e:
+                logger.error(f"备份数据库失败: {e}")
+                return False
+
+            try:
+                cursor = self.conn.cursor()
+
+                # 开始事务
+                cursor.execute("BEGIN TRANSACTION;")
+
+                # 索引随旧表保留，先删除以便在新表上重建
+                for index_name in TASK_INDEXES:
+                    cursor.execute(f"DROP INDEX IF EXISTS {index_name};")
+
+                # 重命名现有的 tasks 表为 tasks_old
+                cursor.execute("ALTER TABLE tasks RENAME TO tasks_old;")
+
+                # 创建新的 tasks 表，不包含 CHECK 约束
+                cursor.execute(CREATE_TASKS_SQL)
+
+                # 复制数据从 tasks_old 到 新的 tasks 表
+                cursor.execute(f'''
+                    INSERT INTO tasks ({", ".join(TASK_COLUMNS)})
+                    SELECT {", ".join(TASK_COLUMNS)}
+                    FROM tasks_old;
+                ''')
+
+                # 删除旧的 tasks_old 表
+                cursor.execute("DROP TABLE tasks_old;")
+
+                # 提交事务
+                self.conn.commit()
+                logger.info("数据库迁移已成功完成。")
+            except sqlite3.Error as e:
+                logger.error(f"数据库迁移失败: {e}")
+                self.conn.rollback()
+                logger.info("事务已回滚。")
+                return False
+
+        # 删除备份文件
+        try:
+            os.remove(backup_path)
+            logger.info(f"备份文件 {backup_path} 已成功删除。")
+        except OSError as e:
+            logger.info(f"删除备份文件失败: {e}")
+        return True
+
+    def close(self):
+        """ 关闭数据库连接 """
+        with self.lock:
+            try:
+                self.conn.close()
+            except sqlite3.Error as e:
+                logger.error(f"[SimpleTimeTask] 关闭数据库连接失败: {e}")
+
+    @staticmethod
+    def task_to_row(task):
+        """ 将任务转换为与 TASK_COLUMNS 顺序一致的行 """
+        return (task.task_id, task.time_value, task.frequency, task.content,
+                task.target_type, task.user_id, task.user_name,
+                task.user_group_name, task.group_title, task.is_processed,
+                task.next_fire, task.tz, task.no_coalesce)
+
+    @staticmethod
+    def row_to_task(row):
+        """ 将与 TASK_COLUMNS 顺序一致的行转换为任务 """
+        return Task(
+            task_id=row[0],
+            time_value=row[1],
+            frequency=row[2],
+            content=row[3],
+            target_type=row[4],
+            user_id=row[5],
+            user_name=row[6],
+            user_group_name=row[7],
+            group_title=row[8],
+            is_processed=row[9],
+            next_fire=row[10],
+            tz=row[11],
+            no_coalesce=row[12] or 0
+        )
+
+
+class TaskWriteQueue:
+    """
+    任务写操作的合并提交队列(write-behind)。
+
+    插入、状态更新和删除按任务ID合并，同一任务只保留最终需要写入的操作，
+    队列长度达到 batch_size 或距上次提交超过 flush_interval 秒时，在后台线程中用一个事务批量写入。
+    内存中的任务状态始终是权威数据，队列只负责持久化。
+    """
+
+    UPSERT, STATE, DELETE = 0, 1, 2
+
+    def __init__(self, store, batch_size=200, flush_interval=1.0, name="SimpleTimeTask_writer"):
+        self.store = store
+        self.batch_size = max(1, int(batch_size))
+        self.flush_interval = flush_interval
+        self.cond = threading.Condition()
+        # 任务ID -> (操作, 数据)，保持写入顺序
+        self.pending = {}
+        # 保证同一时间只有一个批次在写入，避免后提交的批次先落盘
+        self.flush_lock = threading.Lock()
+        self.closed = False
+        # 统计信息
+        self.batches = 0
+        self.written = 0
+        self.thread = threading.Thread(target=self._run, name=name)
+        self.thread.daemon = True
+        self.thread.start()
+
+    def __len__(self):
+        return len(self.pending)
+
+    def put_task(self, task):
+        """ 插入或覆盖任务，写入时读取任务对象的最新字段 """
+        self._put(task.task_id, self.UPSERT, task)
+
+    def put_state(self, task):
+        """ 更新任务的处理状态和下一次触发时间，写入时读取任务对象的最新字段 """
+        with self.cond:
+            op = self.pending.get(task.task_id)
+            if op is not None and op[0] != self.STATE:
+                # 待插入的任务会写入对象的最新状态，待删除的任务无需更新
+                return
+            self._put(task.task_id, self.STATE, task)
+
+    def put_delete(self, task_id):
+        """ 删除任务 """
+        self._put(task_id, self.DELETE, None)
+
+    def flush(self):
+        """ 立即写入所有待提交的操作 """
+        with self.flush_lock:
+            with self.cond:
+                if not self.pending:
+                    return
+                pending, self.pending = self.pending, {}
+
+            upserts, states, deletes = [], [], []
+            for task_id, (op, data) in pending.items():
+                if op == self.UPSERT:
+                    upserts.append(data)
+                elif op == self.STATE:
+                    states.append(data)
+                else:
+                    deletes.append(task_id)
+
+            try:
+                self.store.apply_batch(upserts, states, deletes)
+            except sqlite3.Error as e:
+                # 批量写入失败时逐条写入，只丢弃出错的操作
+                logger.error(f"[SimpleTimeTask] 批量写入数据库失败，改为逐条写入: {e}")
+                self._apply_one_by_one(upserts, states, deletes)
+            self.batches += 1
+            self.written += len(pending)
+            logger.info(f"[SimpleTimeTask] Tasks written to DB: {len(upserts)} upserted, {len(states)} state updated, {len(deletes)} removed")
+
+    def close(self):
+        """ 停止后台线程并写入所有剩余操作，可重复调用 """
+        with self.cond:
+            self.closed = True
+            self.cond.notify_all()
+        if self.thread is not threading.current_thread():
+            self.thread.join(timeout=5)
+        self.flush()
+
+    def _put(self, task_id, op, data):
+        with self.cond:
+            self.pending.pop(task_id, None)
+            self.pending[task_id] = (op, data)
+            if len(self.pending) >= self.batch_size:
+                self.cond.notify_all()
+
+    def _run(self):
+        while True:
+            with self.cond:
+                deadline = time.monotonic() + self.flush_interval
+                while not self.closed and len(self.pending) < self.batch_size:
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        break
+                    self.cond.wait(remaining)
+                if self.closed:
+                    return
+            try:
+                self.flush()
+            except Exception as e:
+                logger.error(f"[SimpleTimeTask] 写入数据库时发生错误: {e}")
+
+    def _apply_one_by_one(self, upserts, states, deletes):
+        for task in upserts:
+            self._apply_safely([task], [], [], task.task_id)
+        for task in states:
+            self._apply_safely([], [task], [], task.task_id)
+        for task_id in deletes:
+            self._apply_safely([], [], [task_id], task_id)
+
+    def _apply_safely(self, upserts, states, deletes, task_id):
+        try:
+            self.store.apply_batch(upserts, states, deletes)
+        except sqlite3.Error as e:
+            logger.error(f"[SimpleTimeTask] 写入任务 {task_id} 失败: {e}")
@@ -0,0 +1,78 @@
+import json
+import datetime
+from common.log import logger
+
+
+class WorkCalendar:
+    """
+    工作日历：按年份保存法定节假日和调休上班日，每年编译为一个整数位图，第 N 位表示当年第 N+1 天是否为工作日。
+
+    数据文件为 JSON，键为年份，值包含 holidays(放假日期)和 workdays(调休上班日期)，
+    日期写作 "MM-DD"，连续的日期写作 "MM-DD~MM-DD"。数据文件中没有的年份按周一至周五为工作日计算。
+    """
+
+    def __init__(self, years=None):
+        # 年份 -> 工作日位图
+        self.bitmaps = {}
+        for year, spec in (years or {}).items():
+            self.bitmaps[int(year)] = self.build_bitmap(int(year), spec.get("holidays", []), spec.get("workdays", []))
+
+    @classmethod
+    def load(cls, path):
+        """ 从 JSON 数据文件加载工作日历 """
+        with open(path, encoding="utf-8") as f:
+            return cls(json.load(f))
+
+    @staticmethod
+    def expand_dates(year, items):
+        """ 将 "MM-DD" 和 "MM-DD~MM-DD" 展开为当年的日期 """
+        for item in items:
+            start, _, end = item.partition("~")
+            first = datetime.datetime.strptime(f"{year}-{start.strip()}", "%Y-%m-%d").date()
+            last = datetime.datetime.strptime(f"{year}-{end.strip()}", "%Y-%m-%d").date() if end else first
+            if last < first:
+                raise ValueError(f"invalid date range: {item}")
+            for ordinal in range(first.toordinal(), last.toordinal() + 1):
+                yield datetime.date.fromordinal(ordinal)
+
+    @classmethod
+    def build_bitmap(cls, year, holidays, workdays):
+        """ 按周一至周五初始化全年的工作日，再去掉放假日期、加上调休上班日期 """
+        first = datetime.date(year, 1, 1)
+        days = (datetime.date(year + 1, 1, 1) - first).days
+        bitmap = 0
+        for offset in range(days):
+            if (first.weekday() + offset) % 7 < 5:
+                bitmap |= 1 << offset
+        for date in cls.expand_dates(year, holidays):
+            bitmap &= ~(1 << (date.toordinal() - first.toordinal()))
+        for date in cls.expand_dates(year, workdays):
+            bitmap |= 1 << (date.toordinal() - first.toordinal())
+        return bitmap
+
+    @property
+    def years(self):
+        return sorted(self.bitmaps)
+
+    def is_workday(self, date):
+        """ 判断指定日期是否为工作日 """
+        bitmap = self.bitmaps.get(date.year)
+        if bitmap is None:
+            return date.weekday() < 5
+        return (bitmap >> (date.timetuple().tm_yday - 1)) & 1 == 1
+
+
+def load_work_calendar(path):
+    """ 加载工作日历，文件不存在或格式错误时返回 None，work_day 任务按周一至周五触发 """
+    try:
+        calendar = WorkCalendar.load(path)
+    except FileNotFoundError:
+        logger.warning(f"[SimpleTimeTask] 未找到工作日历文件 {path}，工作日按周一至周五计算")
+        return None
+    except (OSError, ValueError, AttributeError) as e:
+        logger.error(f"[SimpleTimeTask] 加载工作日历 {path} 失败: {e}，工作日按周一至周五计算")
+        return None
+    logger.info(f"[SimpleTimeTask] 已加载工作日历: {', '.join(str(year) for year in calendar.years)}")
+    if datetime.date.today().year not in calendar.bitmaps:
+        logger.warning(f"[SimpleTimeTask] 工作日历 {path} 中没有今年的节假日安排，请及时更新")
+    return calendar
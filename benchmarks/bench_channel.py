@@ -0,0 +1,79 @@
+"""
+消息发送开销基准测试：对比每次发送都创建通道并执行 gc.collect()(旧实现)
+与 ChannelProvider 复用通道的单次发送耗时。
+
+gc.collect() 的耗时与进程中存活的对象数量成正比，这里预先创建一批对象模拟宿主进程的内存。
+
+用法: python benchmarks/bench_channel.py [发送次数] [存活对象数]
+"""
+import gc
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+import host_stubs  # noqa: E402
+
+host_stubs.install()
+
+from plugins.SimpleTimeTask.ChannelProvider import ChannelProvider  # noqa: E402
+
+
+class FakeChannel:
+    """ 模拟通道：发送本身不做任何事，只测量获取通道和回收的开销 """
+
+    def __init__(self, channel_type):
+        self.channel_type = channel_type
+        self.handlers = {}
+        self.sent = 0
+
+    def send(self, reply, context):
+        self.sent += 1
+
+
+def legacy_send(reply, context):
+    """ 旧实现：每次发送创建通道，发送后执行完整的垃圾回收 """
+    channel = FakeChannel("wx")
+    channel.send(reply, context)
+    channel = None
+    gc.collect()
+
+
+def measure(send, count):
+    timings = []
+    for _ in range(count):
+        start = time.perf_counter()
+        send("reply", "context")
+        timings.append(time.perf_counter() - start)
+    timings.sort()
+    return {
+        "mean_us": sum(timings) / count * 1e6,
+        "p50_us": timings[count // 2] * 1e6,
+        "p99_us": timings[min(count - 1, count * 99 // 100)] * 1e6,
+    }
+
+
+def run(count, live_objects):
+    # 模拟宿主进程中存活的对象
+    heap = [{"id": i, "name": f"obj{i}"} for i in range(live_objects)]
+    provider = ChannelProvider(FakeChannel)
+    report = {
+        "legacy": measure(legacy_send, count),
+        "provider": measure(lambda reply, context: provider.get("wx").send(reply, context), count),
+    }
+    del heap
+    return report
+
+
+def main():
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 200
+    live_objects = int(sys.argv[2]) if len(sys.argv) > 2 else 200000
+    report = run(count, live_objects)
+    print(f"{count} sends, {live_objects} live objects")
+    print(f"{'strategy':<12}{'mean us':>14}{'p50 us':>14}{'p99 us':>14}")
+    for name, result in report.items():
+        print(f"{name:<12}{result['mean_us']:>14.1f}{result['p50_us']:>14.1f}{result['p99_us']:>14.1f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,136 @@
+"""
+指令处理基准测试：模拟群聊消息流(绝大多数为普通聊天，少量为 /time 指令)，测量 on_handle_context 的单条消息开销，
+并与旧实现对比：旧实现对每条消息先读取用户ID、记录防抖时间戳再查找指令，添加任务时用一串正则匹配频率。
+
+用法: python benchmarks/bench_command.py [消息数] [指令比例]
+"""
+import os
+import re
+import sys
+import time
+import random
+import tempfile
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+import host_stubs  # noqa: E402
+
+host_stubs.install()
+
+from bridge.context import Context, ContextType  # noqa: E402
+from channel.chat_message import ChatMessage  # noqa: E402
+from plugins import Event, EventContext  # noqa: E402
+from common.log import logger  # noqa: E402
+from bench_suite import DB_DIR  # noqa: E402
+
+CHAT_LINES = ("哈哈哈", "今天中午吃什么", "收到", "明天几点开会？", "[图片]", "好的👌", "https://example.com/a/b?c=d",
+              "这个需求下周再评审一下，先把接口文档发群里", "@张三 看一下", "晚上一起打球吗")
+COMMANDS = ("/time 任务列表", "/time 每天 08:00 提醒喝水", "/time 每周一 09:30 周会 group[办公室]")
+FREQUENCY_TOKENS = ("今天", "明天", "每天", "工作日", "每周一", "每周日", "每周天", "不含周六", "每月10号", "每月31号", "每两天")
+
+
+def make_messages(count, command_ratio, seed=2024):
+    """ 生成群聊消息，每条消息预先构造好上下文，只测量处理开销 """
+    rng = random.Random(seed)
+    messages = []
+    for _ in range(count):
+        text = rng.choice(COMMANDS) if rng.random() < command_ratio else rng.choice(CHAT_LINES)
+        user_id = f"@member{rng.randrange(5000)}"
+        msg = ChatMessage({"ActualUserName": user_id, "User": {"MemberList": [{"UserName": user_id, "NickName": "成员"}]}})
+        msg.content = text
+        msg.is_group = True
+        msg.actual_user_nickname = "测试群"
+        messages.append(Context(ContextType.TEXT, text, {"msg": msg}))
+    return messages
+
+
+def legacy_prefilter(e_context, last_processed):
+    """ 旧实现在判断是否为指令之前对每条消息执行的步骤 """
+    if e_context["context"].type not in [ContextType.TEXT]:
+        return None
+    msg = e_context['context']['msg']
+    user_id = msg._rawmsg['ActualUserName'] if msg.is_group else msg.from_user_id
+    current_time = time.monotonic() * 1000
+    last_time = last_processed.get(user_id, 0)
+    if current_time - last_time < 100:
+        return None
+    last_processed[user_id] = current_time
+    text = msg.content.strip()
+    time_index = text.find('/time') if text else -1
+    command = text[time_index:] if time_index != -1 else None
+    logger.debug(f"[SimpleTimeTask] Command received: {command}")
+    return command
+
+
+def legacy_parse_frequency(frequency):
+    """ 旧实现的频率解析：依次正则匹配，每次调用重建星期映射 """
+    if frequency in ["今天", "明天"]:
+        return "once"
+    elif frequency == "工作日":
+        return "work_day"
+    elif frequency == "每天":
+        return "every_day"
+    elif re.match(r"每周[一二三四五六日天]", frequency):
+        weekday_map = {"一": "Monday", "二": "Tuesday", "三": "Wednesday", "四": "Thursday", "五": "Friday", "六": "Saturday", "日": "Sunday", "天": "Sunday"}
+        english_day = weekday_map.get(frequency[-1])
+        return f"weekly_{english_day}" if english_day else "undefined"
+    elif re.match(r"每月([1-9]|[12][0-9]|3[01])号", frequency):
+        return f"monthly_{re.findall(r'每月([1-9]|[12][0-9]|3[01])号', frequency)[0]}"
+    elif re.match(r"不含周[一二三四五六日天]", frequency):
+        weekday_map = {"一": "Monday", "二": "Tuesday", "三": "Wednesday", "四": "Thursday", "五": "Friday", "六": "Saturday", "日": "Sunday", "天": "Sunday"}
+        english_day = weekday_map.get(frequency[-1])
+        return f"excludeWeekday_{english_day}" if english_day else "undefined"
+    return "undefined"
+
+
+def per_call_ns(fn, items, repeat=3):
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        for item in items:
+            fn(item)
+        best = min(best, time.perf_counter() - start)
+    return best / len(items) * 1e9
+
+
+def main():
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 200000
+    command_ratio = float(sys.argv[2]) if len(sys.argv) > 2 else 0.01
+
+    with tempfile.TemporaryDirectory() as tmp:
+        os.chdir(tmp)
+        os.makedirs(DB_DIR)
+        # 只测量消息处理，不限流，避免指令被忽略
+        host_stubs.PLUGIN_CONFIG.update({"metrics_file": "", "command_rate": 0, "command_min_interval": 0, "task_create_rate": 0})
+        from plugins.SimpleTimeTask.SimpleTimeTask import SimpleTimeTask
+        plugin = SimpleTimeTask()
+        plugin.tasks_loaded.wait()
+
+        chat = make_messages(count, 0)
+        mixed = make_messages(count, command_ratio)
+
+        last_processed = {}
+        legacy_ns = per_call_ns(lambda context: legacy_prefilter(EventContext(Event.ON_HANDLE_CONTEXT, {"context": context}), last_processed), chat)
+        current_ns = per_call_ns(lambda context: plugin.on_handle_context(EventContext(Event.ON_HANDLE_CONTEXT, {"context": context})), chat)
+        print(f"{count} group chat messages without commands, per message:")
+        print(f"  legacy prefilter {legacy_ns:8.0f} ns, debounce entries {len(last_processed)}")
+        print(f"  on_handle_context {current_ns:7.0f} ns, limiter entries {len(plugin.command_limiter or ())}")
+
+        start = time.perf_counter()
+        for context in mixed:
+            plugin.on_handle_context(EventContext(Event.ON_HANDLE_CONTEXT, {"context": context}))
+        elapsed = time.perf_counter() - start
+        print(f"mixed traffic ({command_ratio:.1%} commands): {elapsed / count * 1e9:.0f} ns per message, {len(plugin.tasks)} tasks added")
+
+        for token in FREQUENCY_TOKENS:
+            assert legacy_parse_frequency(token) == plugin.frequency_grammar.get(token, "undefined"), token
+        tokens = list(FREQUENCY_TOKENS) * 10000
+        legacy_ns = per_call_ns(legacy_parse_frequency, tokens)
+        grammar_ns = per_call_ns(lambda token: plugin.frequency_grammar.get(token, "undefined"), tokens)
+        print(f"frequency parsing, per token: regex chain {legacy_ns:.0f} ns, grammar table {grammar_ns:.0f} ns")
+
+        plugin.shutdown()
+        os.chdir("/")
+
+
+if __name__ == "__main__":
+    main()
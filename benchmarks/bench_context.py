@@ -0,0 +1,96 @@
+"""
+触发上下文构建基准测试：对比每次触发都用正则解析消息模板、逐个 setattr 并新建路由通道(旧实现)
+与 ContextFactory 复制原型的单次耗时和内存分配(tracemalloc)。
+
+用法: python benchmarks/bench_context.py [触发次数]
+"""
+import os
+import re
+import sys
+import time
+import tracemalloc
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+import host_stubs  # noqa: E402
+
+host_stubs.install()
+
+from bridge.context import Context, ContextType  # noqa: E402
+from channel.chat_message import ChatMessage  # noqa: E402
+from channel.wechat.wechat_channel import WechatChannel  # noqa: E402
+from plugins.SimpleTimeTask.Task import Task  # noqa: E402
+from plugins.SimpleTimeTask.ContextFactory import ContextFactory, MESSAGE_TEMPLATE, MESSAGE_TEMPLATE_PATTERN  # noqa: E402
+
+
+def legacy_build(task, receiver, is_group):
+    """ 旧实现：每次触发解析模板、构造消息并新建路由通道 """
+    matches = re.findall(MESSAGE_TEMPLATE_PATTERN, MESSAGE_TEMPLATE)
+    content_dict = {match[0]: match[1] for match in matches}
+    content_dict["content"] = task.content
+    content_dict["receiver"] = receiver
+    content_dict["session_id"] = receiver
+    content_dict["isgroup"] = is_group
+    content_dict["ActualUserName"] = task.user_name
+    content_dict["from_user_nickname"] = task.user_name
+    content_dict["from_user_id"] = task.user_id
+    content_dict["User"] = {
+        'MemberList': [{'UserName': task.user_id, 'NickName': task.user_name}]
+    }
+    msg = ChatMessage(content_dict)
+    for key, value in content_dict.items():
+        if hasattr(msg, key):
+            setattr(msg, key, value)
+    msg.is_group = is_group
+    content_dict["msg"] = msg
+    channel = WechatChannel()
+    channel.channel_type = "wx"
+    return Context(ContextType.TEXT, task.content, content_dict), channel
+
+
+def factory_build(factory):
+    def build(task, receiver, is_group):
+        return factory.build(task, receiver, is_group), factory.get_routing_channel()
+    return build
+
+
+def measure(build, tasks):
+    # CPU 时间
+    start = time.perf_counter()
+    for task in tasks:
+        build(task, task.user_id, False)
+    cpu_us = (time.perf_counter() - start) / len(tasks) * 1e6
+
+    # 内存分配：统计构建过程中分配的内存块数和字节数(包括随后释放的临时对象)
+    tracemalloc.start()
+    before = tracemalloc.take_snapshot()
+    results = [build(task, task.user_id, False) for task in tasks]
+    after = tracemalloc.take_snapshot()
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    stats = after.compare_to(before, "filename")
+    blocks = sum(stat.count_diff for stat in stats)
+    size = sum(stat.size_diff for stat in stats)
+    del results
+    return {
+        "cpu_us": cpu_us,
+        "retained_blocks": blocks / len(tasks),
+        "retained_bytes": size / len(tasks),
+        "peak_bytes": peak / len(tasks),
+    }
+
+
+def main():
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 20000
+    tasks = [Task(f"T{i:09d}", "08:00", "every_day", f"content {i}", 0, f"user{i}", f"name{i}", None, None, 0) for i in range(count)]
+    report = {
+        "legacy": measure(legacy_build, tasks),
+        "factory": measure(factory_build(ContextFactory(WechatChannel)), tasks),
+    }
+    print(f"{count} triggers, per trigger:")
+    print(f"{'strategy':<10}{'cpu us':>10}{'blocks':>10}{'bytes':>10}{'peak bytes':>12}")
+    for name, result in report.items():
+        print(f"{name:<10}{result['cpu_us']:>10.2f}{result['retained_blocks']:>10.1f}{result['retained_bytes']:>10.0f}{result['peak_bytes']:>12.0f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,95 @@
+"""
+任务内存基准测试：从数据库加载任务并编译触发规则，用 tracemalloc 统计内存中的任务占用的内存，
+对比旧实现(每个实例带 __dict__、每行各自持有一份字符串、每个任务单独编译规则)与当前的紧凑实现。
+
+用法: python benchmarks/bench_memory.py [--sizes 100000,1000000]
+"""
+import os
+import sys
+import gc
+import time
+import argparse
+import tempfile
+import tracemalloc
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+import host_stubs  # noqa: E402
+
+host_stubs.install()
+
+from bench_suite import build_store, DB_FILE  # noqa: E402
+
+from plugins.SimpleTimeTask.TaskRule import compile_rule  # noqa: E402
+from plugins.SimpleTimeTask.TaskStore import TaskStore  # noqa: E402
+
+
+class LegacyTask:
+    """ 旧实现：普通类，每个实例带 __dict__，字段不驻留 """
+
+    def __init__(self, task_id=None, time_value="", frequency="", content="", target_type=0, user_id="", user_name="", user_group_name="", group_title="", is_processed=0, next_fire=None, tz=None):
+        self.task_id = task_id
+        self.time_value = time_value
+        self.frequency = frequency
+        self.content = content
+        self.target_type = target_type
+        self.user_id = user_id
+        self.user_name = user_name
+        self.user_group_name = user_group_name
+        self.group_title = group_title
+        self.is_processed = is_processed
+        self.next_fire = next_fire
+        self.tz = tz
+        self.rule = None
+
+
+def load_legacy(row):
+    task = LegacyTask(*row)
+    # 旧实现每个任务单独编译规则
+    task.rule = compile_rule.__wrapped__(task.frequency, task.time_value, task.tz)
+    return task
+
+
+def load_compact(row):
+    task = TaskStore.row_to_task(row)
+    task.rule = compile_rule(task.frequency, task.time_value, task.tz)
+    return task
+
+
+def measure(store, load):
+    """ 加载所有任务，返回内存中任务占用的字节数和耗时 """
+    compile_rule.cache_clear()
+    gc.collect()
+    tracemalloc.start()
+    start = time.perf_counter()
+    tasks = []
+    for rows in store.iter_tasks(10000):
+        tasks.extend(load(row) for row in rows)
+    elapsed = time.perf_counter() - start
+    gc.collect()
+    size, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    count = len(tasks)
+    del tasks
+    return size, elapsed, count
+
+
+def main():
+    parser = argparse.ArgumentParser(description="SimpleTimeTask task memory benchmark")
+    parser.add_argument("--sizes", default="100000,1000000", help="任务数，逗号分隔")
+    args = parser.parse_args()
+
+    print(f"{'tasks':>9} {'strategy':<9}{'total MB':>10}{'bytes/task':>12}{'load s':>9}")
+    for count in [int(size) for size in args.sizes.split(",")]:
+        with tempfile.TemporaryDirectory() as tmp:
+            os.chdir(tmp)
+            build_store(count)
+            store = TaskStore(DB_FILE)
+            for name, load in (("legacy", load_legacy), ("compact", load_compact)):
+                size, elapsed, loaded = measure(store, load)
+                print(f"{loaded:>9} {name:<9}{size / 1024 / 1024:>10.1f}{size / loaded:>12.0f}{elapsed:>9.2f}")
+            store.close()
+            os.chdir("/")
+
+
+if __name__ == "__main__":
+    main()
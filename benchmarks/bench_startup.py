@@ -0,0 +1,87 @@
+"""
+启动基准测试：测量插件构造函数返回的耗时、启动到首次调度完成的耗时(time-to-first-tick)、
+群聊映射首次获取完成和全部任务加载完成的耗时。通讯录接口的延迟用 --contacts-delay 模拟。
+
+每个规模在独立的子进程中运行，保证模块导入和数据库缓存状态一致。
+
+用法: python benchmarks/bench_startup.py [--sizes 1000,100000] [--contacts-delay 2]
+"""
+import os
+import sys
+import json
+import time
+import argparse
+import tempfile
+import subprocess
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+import host_stubs  # noqa: E402
+from bench_suite import build_store  # noqa: E402
+
+
+def wait_until(predicate, timeout=600):
+    """ 轮询等待条件成立，返回从调用到成立的耗时 """
+    start = time.perf_counter()
+    while not predicate():
+        if time.perf_counter() - start > timeout:
+            raise TimeoutError
+        time.sleep(0.001)
+    return time.perf_counter() - start
+
+
+def run_single(count, contacts_delay):
+    """ 在当前进程中测量一个规模，返回结果字典 """
+    result = {"tasks": count, "contacts_delay_s": contacts_delay}
+    with tempfile.TemporaryDirectory() as tmp:
+        os.chdir(tmp)
+        build_store(count)
+
+        def get_chatrooms(update=False):
+            time.sleep(contacts_delay)
+            return host_stubs.CHATROOMS
+        sys.modules["lib.itchat"].get_chatrooms = get_chatrooms
+
+        host_stubs.PLUGIN_CONFIG.clear()
+        host_stubs.PLUGIN_CONFIG.update({"metrics_file": ""})
+        from plugins.SimpleTimeTask.SimpleTimeTask import SimpleTimeTask
+
+        start = time.perf_counter()
+        plugin = SimpleTimeTask()
+        result["constructor_ms"] = (time.perf_counter() - start) * 1e3
+        wait_until(lambda: plugin.first_tick_seconds is not None)
+        result["first_tick_ms"] = plugin.first_tick_seconds * 1e3
+        plugin.tasks_loaded.wait()
+        result["tasks_loaded_s"] = time.perf_counter() - start
+        wait_until(lambda: plugin.group_cache.refreshes > 0)
+        result["group_map_s"] = time.perf_counter() - start
+        result["tasks_in_memory"] = len(plugin.tasks)
+        plugin.shutdown()
+        os.chdir("/")
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser(description="SimpleTimeTask startup benchmark")
+    parser.add_argument("--sizes", default="1000,100000", help="任务数，逗号分隔")
+    parser.add_argument("--contacts-delay", type=float, default=2.0, help="模拟的通讯录接口延迟(秒)")
+    parser.add_argument("--single", type=int, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.single is not None:
+        # 子进程：输出一个规模的结果
+        print(json.dumps(run_single(args.single, args.contacts_delay)))
+        return
+
+    print(f"{'tasks':>8}{'constructor ms':>16}{'first tick ms':>15}{'tasks loaded s':>16}{'group map s':>13}")
+    for count in [int(size) for size in args.sizes.split(",")]:
+        output = subprocess.run(
+            [sys.executable, os.path.abspath(__file__), "--single", str(count), "--contacts-delay", str(args.contacts_delay)],
+            check=True, capture_output=True, text=True
+        ).stdout
+        result = json.loads(output.strip().splitlines()[-1])
+        print(f"{count:>8}{result['constructor_ms']:>16.1f}{result['first_tick_ms']:>15.1f}"
+              f"{result['tasks_loaded_s']:>16.2f}{result['group_map_s']:>13.2f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,117 @@
+"""
+数据库写入基准测试：对比每次操作新建连接(旧实现)、TaskStore 长连接逐条提交
+以及 TaskWriteQueue 合并批量提交的吞吐量。
+
+用法: python benchmarks/bench_store.py [任务数]
+"""
+import os
+import sys
+import time
+import sqlite3
+import tempfile
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+import host_stubs  # noqa: E402
+
+host_stubs.install()
+
+from plugins.SimpleTimeTask.Task import Task  # noqa: E402
+from plugins.SimpleTimeTask.TaskStore import TaskStore, TaskWriteQueue, CREATE_TASKS_SQL, INSERT_TASK_SQL, DELETE_TASK_SQL, UPDATE_STATUS_SQL  # noqa: E402
+
+
+class LegacyStore:
+    """ 旧实现：每次写入都新建连接，使用默认的回滚日志模式 """
+
+    def __init__(self, db_path):
+        self.db_path = db_path
+        with sqlite3.connect(db_path) as conn:
+            conn.execute(CREATE_TASKS_SQL)
+
+    def insert_task(self, task):
+        with sqlite3.connect(self.db_path) as conn:
+            conn.execute(INSERT_TASK_SQL, TaskStore.task_to_row(task))
+            conn.commit()
+
+    def update_task_status(self, task_id, is_processed):
+        with sqlite3.connect(self.db_path) as conn:
+            conn.execute(UPDATE_STATUS_SQL, (is_processed, task_id))
+            conn.commit()
+
+    def delete_task(self, task_id):
+        with sqlite3.connect(self.db_path) as conn:
+            conn.execute(DELETE_TASK_SQL, (task_id,))
+            conn.commit()
+
+
+class QueuedStore:
+    """ 通过 TaskWriteQueue 写入，每个阶段结束时 flush，计时包含提交 """
+
+    def __init__(self, store):
+        self.queue = TaskWriteQueue(store, flush_interval=3600)
+        self.tasks = {}
+
+    def insert_task(self, task):
+        self.tasks[task.task_id] = task
+        self.queue.put_task(task)
+
+    def update_task_status(self, task_id, is_processed):
+        task = self.tasks[task_id]
+        task.is_processed = is_processed
+        self.queue.put_state(task)
+
+    def delete_task(self, task_id):
+        self.queue.put_delete(task_id)
+
+    def flush(self):
+        self.queue.flush()
+
+
+def make_tasks(count):
+    return [Task(f"T{i:09d}", "08:00", "every_day", f"content {i}", 0, f"user{i % 100}", "name", None, None, 0) for i in range(count)]
+
+
+def measure(store, tasks):
+    results = {}
+    for name, op in (
+        ("insert", lambda task: store.insert_task(task)),
+        ("update_status", lambda task: store.update_task_status(task.task_id, 1)),
+        ("delete", lambda task: store.delete_task(task.task_id)),
+    ):
+        start = time.perf_counter()
+        for task in tasks:
+            op(task)
+        if hasattr(store, "flush"):
+            store.flush()
+        elapsed = time.perf_counter() - start
+        results[name] = len(tasks) / elapsed
+    return results
+
+
+def run(count):
+    tasks = make_tasks(count)
+    report = {}
+    with tempfile.TemporaryDirectory() as tmp:
+        report["legacy"] = measure(LegacyStore(os.path.join(tmp, "legacy.db")), tasks)
+        store = TaskStore(os.path.join(tmp, "store.db"))
+        store.init_schema()
+        report["task_store"] = measure(store, tasks)
+        store.close()
+        store = TaskStore(os.path.join(tmp, "queued.db"))
+        store.init_schema()
+        queued = QueuedStore(store)
+        report["write_queue"] = measure(queued, tasks)
+        queued.queue.close()
+        store.close()
+    return report
+
+
+def main():
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 2000
+    report = run(count)
+    print(f"{'operation':<16}{'legacy ops/s':>16}{'TaskStore ops/s':>18}{'queued ops/s':>16}")
+    for name in report["legacy"]:
+        print(f"{name:<16}{report['legacy'][name]:>16.0f}{report['task_store'][name]:>18.0f}{report['write_queue'][name]:>16.0f}")
+
+
+if __name__ == "__main__":
+    main()
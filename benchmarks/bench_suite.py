@@ -0,0 +1,212 @@
+"""
+基准测试套件：生成 1k 到 1M 个覆盖所有频率类型的任务，测量插件在不同规模下的
+启动时间、任务加载时间、调度(tick)开销、触发规则计算开销、添加/取消任务延迟、数据库写入吞吐量和峰值内存(RSS)，
+结果写入 JSON 文件，便于对比不同版本。
+
+每个规模和模式在独立的子进程中运行，以便分别统计峰值内存。宿主框架由 host_stubs 提供，无需安装 chatgpt-on-wechat。
+
+用法: python benchmarks/bench_suite.py [--sizes 1000,10000,100000] [--modes memory,disk] [--output benchmarks/results.json]
+"""
+import os
+import sys
+import json
+import time
+import random
+import argparse
+import platform
+import resource
+import tempfile
+import subprocess
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+import host_stubs  # noqa: E402
+
+host_stubs.install()
+
+from plugins.SimpleTimeTask.Task import Task  # noqa: E402
+from plugins.SimpleTimeTask.TaskStore import TaskStore  # noqa: E402
+
+WEEKDAYS = ("Monday", "Tuesday", "Wednesday", "Thursday", "Friday", "Saturday", "Sunday")
+DB_DIR = os.path.join("plugins", "SimpleTimeTask")
+DB_FILE = os.path.join(DB_DIR, "simple_time_task.db")
+
+
+def make_frequency(rng):
+    """ 随机生成一种频率及对应的时间 """
+    time_value = f"{rng.randrange(24):02d}:{rng.randrange(60):02d}"
+    kind = rng.randrange(6)
+    if kind == 0:
+        date = time.strftime("%Y-%m-%d", time.localtime(time.time() + rng.randrange(1, 30) * 86400))
+        return "once", f"{date} {time_value}"
+    if kind == 1:
+        return "every_day", time_value
+    if kind == 2:
+        return "work_day", time_value
+    if kind == 3:
+        return f"weekly_{rng.choice(WEEKDAYS)}", time_value
+    if kind == 4:
+        return f"excludeWeekday_{rng.choice(WEEKDAYS)}", time_value
+    return f"monthly_{rng.randrange(1, 32)}", time_value
+
+
+def make_tasks(count, seed=7301):
+    """ 生成任务，约 20% 发送到群，用户数为任务数的 1/10 """
+    rng = random.Random(seed)
+    users = max(1, count // 10)
+    tasks = []
+    for i in range(count):
+        frequency, time_value = make_frequency(rng)
+        is_group = rng.random() < 0.2
+        tasks.append(Task(
+            f"B{i:09d}", time_value, frequency, f"reminder {i}",
+            1 if is_group else 0, f"user{rng.randrange(users)}", "name", None,
+            f"group{rng.randrange(100)}" if is_group else None, 0
+        ))
+    return tasks
+
+
+def build_store(count):
+    """ 生成任务数据库，返回耗时 """
+    start = time.perf_counter()
+    os.makedirs(DB_DIR, exist_ok=True)
+    store = TaskStore(DB_FILE)
+    store.init_schema()
+    tasks = make_tasks(count)
+    for offset in range(0, count, 10000):
+        store.apply_batch(tasks[offset:offset + 10000], [], [])
+    store.close()
+    return time.perf_counter() - start
+
+
+def summarize(timings):
+    """ 计算耗时(秒)列表的统计值，单位微秒 """
+    timings = sorted(timings)
+    count = len(timings)
+    return {
+        "count": count,
+        "mean_us": sum(timings) / count * 1e6,
+        "p50_us": timings[count // 2] * 1e6,
+        "p99_us": timings[min(count - 1, count * 99 // 100)] * 1e6,
+        "max_us": timings[-1] * 1e6,
+    }
+
+
+def timed(fn, *args):
+    start = time.perf_counter()
+    fn(*args)
+    return time.perf_counter() - start
+
+
+def run_single(count, mode):
+    """ 在当前进程中测量一个规模，返回结果字典 """
+    result = {"tasks": count, "mode": mode}
+    with tempfile.TemporaryDirectory() as tmp:
+        os.chdir(tmp)
+        result["generate_s"] = build_store(count)
+
+        host_stubs.PLUGIN_CONFIG.clear()
+        host_stubs.PLUGIN_CONFIG.update({"disk_backed": mode == "disk"})
+        from plugins.SimpleTimeTask.SimpleTimeTask import SimpleTimeTask
+
+        start = time.perf_counter()
+        plugin = SimpleTimeTask()
+        result["startup_s"] = time.perf_counter() - start
+        # 任务在调度线程中分批加载，等待加载完成
+        plugin.tasks_loaded.wait()
+        result["loaded_s"] = time.perf_counter() - start
+        result["tasks_in_memory"] = len(plugin.tasks)
+
+        # 停止插件自身的调度线程，由基准测试驱动调度；分发只计数，只测量调度线程的开销
+        plugin.scheduler.stop()
+        plugin.check_thread.join()
+        plugin.scheduler.stopped = False
+        dispatched = [0]
+
+        def submit(task, fire_time=None):
+            dispatched[0] += 1
+        plugin.dispatcher.submit = submit
+
+        # 没有到期任务时的调度开销
+        result["tick_idle"] = summarize([timed(plugin.run_tick, 0) for _ in range(1000)])
+
+        # 一批循环任务同时到期时的调度开销(分发、计算下一次触发、写入状态)
+        now = int(time.time())
+        recurring = [task for task in plugin.tasks.values() if task.frequency != "once"]
+        for burst in (100, 1000):
+            if len(recurring) < burst:
+                continue
+            for task in recurring[:burst]:
+                plugin.scheduler.push(task.task_id, now - 1)
+            elapsed = timed(plugin.run_tick, 0)
+            result[f"tick_burst_{burst}"] = {"total_ms": elapsed * 1e3, "per_task_us": elapsed / burst * 1e6}
+
+        # 触发规则计算：重新计算内存中所有任务的下一次触发时间
+        tasks = list(plugin.tasks.values())
+        if tasks:
+            elapsed = timed(lambda: [plugin.calc_next_fire_time(task) for task in tasks])
+            result["next_fire_all"] = {"total_ms": elapsed * 1e3, "per_task_us": elapsed / len(tasks) * 1e6}
+
+        # 添加、取消任务的延迟
+        add_timings = []
+        before = set(plugin.tasks)
+        for i in range(200):
+            args = ["/time", "每天", f"{i % 24:02d}:{i % 60:02d}", f"bench {i}"]
+            add_timings.append(timed(plugin.add_task, args, "bench_user", "bench", None))
+        added = [task_id for task_id in plugin.tasks if task_id not in before]
+        result["add_task"] = summarize(add_timings)
+        result["cancel_task"] = summarize([timed(plugin.cancel_task, task_id) for task_id in added])
+
+        # 数据库写入吞吐量：所有内存中任务的状态更新经写入队列批量提交
+        plugin.write_queue.flush()
+        elapsed = timed(lambda: ([plugin.write_queue.put_state(task) for task in tasks], plugin.write_queue.flush()))
+        result["db_write_ops_per_s"] = len(tasks) / elapsed if tasks else 0
+
+        plugin.shutdown()
+        result["dispatched"] = dispatched[0]
+        # Linux 下 ru_maxrss 单位为 KB，macOS 为字节
+        max_rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        result["peak_rss_mb"] = max_rss / (1024 * 1024 if sys.platform == "darwin" else 1024)
+        os.chdir("/")
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser(description="SimpleTimeTask benchmark suite")
+    parser.add_argument("--sizes", default="1000,10000,100000", help="任务数，逗号分隔，例如 1000,10000,100000,1000000")
+    parser.add_argument("--modes", default="memory,disk", help="运行模式，memory(全部加载)或 disk(磁盘模式)")
+    parser.add_argument("--output", default=os.path.join(os.path.dirname(os.path.abspath(__file__)), "results.json"))
+    parser.add_argument("--single", type=int, help=argparse.SUPPRESS)
+    parser.add_argument("--mode", default="memory", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.single is not None:
+        # 子进程：输出一个规模的结果
+        print(json.dumps(run_single(args.single, args.mode)))
+        return
+
+    results = []
+    for count in [int(size) for size in args.sizes.split(",")]:
+        for mode in args.modes.split(","):
+            output = subprocess.run(
+                [sys.executable, os.path.abspath(__file__), "--single", str(count), "--mode", mode],
+                check=True, capture_output=True, text=True
+            ).stdout
+            result = json.loads(output.strip().splitlines()[-1])
+            results.append(result)
+            print(f"{count:>8} {mode:<7} startup {result['startup_s']:6.2f}s  loaded {result['loaded_s']:7.2f}s  idle tick {result['tick_idle']['p50_us']:8.1f}us  "
+                  f"add p50 {result['add_task']['p50_us']:8.1f}us  cancel p50 {result['cancel_task']['p50_us']:8.1f}us  "
+                  f"writes {result['db_write_ops_per_s']:10.0f}/s  rss {result['peak_rss_mb']:7.1f}MB")
+
+    report = {
+        "created_at": time.strftime("%Y-%m-%dT%H:%M:%S%z"),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "results": results,
+    }
+    with open(args.output, "w", encoding="utf-8") as f:
+        json.dump(report, f, indent=2, ensure_ascii=False)
+    print(f"results written to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
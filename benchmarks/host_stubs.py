@@ -0,0 +1,203 @@
+"""
+宿主框架(chatgpt-on-wechat)的桩模块。
+
+基准测试在插件目录之外单独运行，install() 将插件目录注册为 plugins.SimpleTimeTask 包，
+并提供插件导入和运行时依赖的宿主模块：plugins、bridge、channel、config、common.log、lib.itchat。
+发送消息和 GPT 回复只计数，不访问网络。
+"""
+import os
+import sys
+import enum
+import types
+import logging
+
+PLUGIN_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# 插件配置(config.json)，在创建插件实例前修改
+PLUGIN_CONFIG = {}
+# 宿主配置
+HOST_CONFIG = {"channel_type": "wx"}
+GLOBAL_CONFIG = {"admin_users": []}
+# itchat 返回的群聊列表
+CHATROOMS = [{"UserName": "@@bench_room", "NickName": "bench"}]
+# 统计信息
+SENT = []
+GPT_CALLS = [0]
+
+
+def _module(name, **attrs):
+    module = types.ModuleType(name)
+    module.__dict__.update(attrs)
+    sys.modules[name] = module
+    return module
+
+
+class ContextType(enum.Enum):
+    TEXT = 1
+
+
+class Context:
+    """ 与 bridge.context.Context 一致的最小实现 """
+
+    def __init__(self, type=None, content=None, kwargs=dict()):
+        self.type = type
+        self.content = content
+        self.kwargs = kwargs
+
+    def __getitem__(self, key):
+        if key == "type":
+            return self.type
+        if key == "content":
+            return self.content
+        return self.kwargs[key]
+
+    def __setitem__(self, key, value):
+        if key == "type":
+            self.type = value
+        elif key == "content":
+            self.content = value
+        else:
+            self.kwargs[key] = value
+
+    def get(self, key, default=None):
+        try:
+            return self[key]
+        except KeyError:
+            return default
+
+
+class ReplyType(enum.Enum):
+    TEXT = 1
+    ERROR = 10
+
+
+class Reply:
+    def __init__(self, type=None, content=None):
+        self.type = type
+        self.content = content
+
+
+class ChatMessage:
+    """ 与 channel.chat_message.ChatMessage 一致的最小实现 """
+
+    msg_id = None
+    create_time = None
+    ctype = None
+    content = None
+    from_user_id = None
+    from_user_nickname = None
+    to_user_id = None
+    to_user_nickname = None
+    other_user_id = None
+    other_user_nickname = None
+    my_msg = False
+    self_display_name = None
+    is_group = False
+    is_at = False
+    actual_user_id = None
+    actual_user_nickname = None
+    at_list = None
+    _prepare_fn = None
+    _prepared = False
+    _rawmsg = None
+
+    def __init__(self, _rawmsg):
+        self._rawmsg = _rawmsg
+
+
+class WechatChannel:
+    """ 插件路由使用的通道 """
+
+    def __init__(self):
+        self.channel_type = None
+        self.handlers = {}
+
+
+class NullChannel:
+    """ 只记录发送次数的通道 """
+
+    def __init__(self, channel_type):
+        self.channel_type = channel_type
+
+    def send(self, reply, context):
+        SENT.append(context.get("receiver"))
+
+
+class Bridge:
+    def fetch_reply_content(self, query, context):
+        GPT_CALLS[0] += 1
+        return Reply(ReplyType.TEXT, query)
+
+
+class Event(enum.Enum):
+    ON_HANDLE_CONTEXT = 2
+
+
+class EventAction(enum.Enum):
+    CONTINUE = 1
+    BREAK = 2
+    BREAK_PASS = 3
+
+
+class EventContext:
+    def __init__(self, event, econtext=dict()):
+        self.event = event
+        self.econtext = econtext
+        self.action = EventAction.CONTINUE
+
+    def __getitem__(self, key):
+        return self.econtext[key]
+
+    def __setitem__(self, key, value):
+        self.econtext[key] = value
+
+
+class Plugin:
+    def __init__(self):
+        self.handlers = {}
+
+    def load_config(self):
+        return PLUGIN_CONFIG
+
+
+class PluginManager:
+    def emit_event(self, e_context):
+        return e_context
+
+
+def register(**kwargs):
+    def wrapper(plugincls):
+        plugincls.name = kwargs.get("name")
+        return plugincls
+    return wrapper
+
+
+def install():
+    """ 安装桩模块，重复调用无副作用 """
+    if "plugins.SimpleTimeTask" in sys.modules:
+        return
+
+    _module("plugins", __path__=[], Plugin=Plugin, Event=Event, EventAction=EventAction,
+            EventContext=EventContext, PluginManager=PluginManager, register=register)
+    _module("plugins.SimpleTimeTask", __path__=[PLUGIN_DIR])
+
+    logger = logging.getLogger("SimpleTimeTask.bench")
+    logger.setLevel(logging.WARNING)
+    _module("common", __path__=[])
+    _module("common.log", logger=logger)
+
+    _module("config", conf=lambda: HOST_CONFIG, global_config=GLOBAL_CONFIG)
+
+    _module("bridge", __path__=[])
+    _module("bridge.bridge", Bridge=Bridge)
+    _module("bridge.reply", Reply=Reply, ReplyType=ReplyType)
+    _module("bridge.context", Context=Context, ContextType=ContextType)
+    _module("channel", __path__=[])
+    _module("channel.channel_factory", create_channel=NullChannel)
+    _module("channel.chat_message", ChatMessage=ChatMessage)
+    _module("channel.wechat", __path__=[])
+    _module("channel.wechat.wechat_channel", WechatChannel=WechatChannel)
+
+    itchat = _module("lib.itchat", get_chatrooms=lambda update=False: CHATROOMS)
+    _module("lib", __path__=[], itchat=itchat)
+    sys.modules["channel"].channel_factory = sys.modules["channel.channel_factory"]
@@ -0,0 +1,142 @@
+"""
+多进程协调测试：当前进程和一个子进程共用一个数据库，验证其他进程添加的任务和接管分片时错过的任务都会触发。
+
+宿主框架由 benchmarks/host_stubs 提供。子进程运行本文件的 run_node()，按参数添加任务，收到 SIGTERM 或被杀死前一直运行。
+
+用法: python -m pytest tests/test_coordination.py
+"""
+import os
+import sys
+import json
+import time
+import signal
+import tempfile
+import unittest
+import subprocess
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "benchmarks"))
+import host_stubs  # noqa: E402
+
+host_stubs.install()
+
+from bridge.context import Context, ContextType  # noqa: E402
+from channel.chat_message import ChatMessage  # noqa: E402
+from plugins import Event, EventContext  # noqa: E402
+
+DB_DIR = os.path.join("plugins", "SimpleTimeTask")
+USER_ID = "@coordination_user"
+# 租约和同步间隔缩短到秒级，使接管和同步在测试时间内完成
+CONFIG = {
+    "coordination": True,
+    "shard_count": 1,
+    "lease_ttl": 3,
+    "lease_heartbeat": 0.5,
+    "task_sync_interval": 2,
+    "metrics_file": "",
+    "workday_calendar_file": "",
+    "command_rate": 0,
+    "command_min_interval": 0,
+    "task_create_rate": 0,
+}
+
+
+def send_command(plugin, text):
+    """ 以私聊消息发送指令，返回回复内容 """
+    msg = ChatMessage({})
+    msg.content = text
+    msg.from_user_id = USER_ID
+    msg.from_user_nickname = "协调测试"
+    e_context = EventContext(Event.ON_HANDLE_CONTEXT, {"context": Context(ContextType.TEXT, text, {"msg": msg})})
+    plugin.on_handle_context(e_context)
+    return e_context["reply"].content
+
+
+def once_command(delay, content):
+    """ delay 秒后触发一次的添加任务指令 """
+    return f"/time 今天 {time.strftime('%H:%M:%S', time.localtime(time.time() + delay))} {content}"
+
+
+def run_node(workdir, command):
+    """ 子进程：在 workdir 中启动插件，可选地添加任务，然后等待被终止 """
+    os.chdir(workdir)
+    host_stubs.PLUGIN_CONFIG.update(CONFIG)
+    from plugins.SimpleTimeTask.SimpleTimeTask import SimpleTimeTask
+    plugin = SimpleTimeTask()
+    plugin.tasks_loaded.wait()
+    if command:
+        send_command(plugin, command)
+        plugin.write_queue.flush()
+    print(json.dumps({"node_id": plugin.coordinator.node_id, "shards": sorted(plugin.coordinator.held)}), flush=True)
+    signal.signal(signal.SIGTERM, lambda signum, frame: sys.exit(0))
+    while True:
+        time.sleep(1)
+
+
+class CoordinationTest(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.cwd = os.getcwd()
+        os.chdir(self.tmp.name)
+        os.makedirs(DB_DIR)
+        host_stubs.PLUGIN_CONFIG.clear()
+        host_stubs.PLUGIN_CONFIG.update(CONFIG)
+        del host_stubs.SENT[:]
+        self.node = None
+        self.plugin = None
+
+    def tearDown(self):
+        if self.plugin is not None:
+            self.plugin.shutdown()
+        if self.node is not None and self.node.poll() is None:
+            self.node.kill()
+            self.node.wait()
+        os.chdir(self.cwd)
+        self.tmp.cleanup()
+
+    def start_plugin(self):
+        from plugins.SimpleTimeTask.SimpleTimeTask import SimpleTimeTask
+        self.plugin = SimpleTimeTask()
+        self.plugin.tasks_loaded.wait()
+        return self.plugin
+
+    def start_node(self, command=""):
+        """ 启动另一个进程，返回其持有的分片 """
+        self.node = subprocess.Popen([sys.executable, os.path.abspath(__file__), self.tmp.name, command],
+                                     stdout=subprocess.PIPE, text=True)
+        return json.loads(self.node.stdout.readline())["shards"]
+
+    def wait_sent(self, timeout):
+        deadline = time.time() + timeout
+        while not host_stubs.SENT and time.time() < deadline:
+            time.sleep(0.1)
+        return list(host_stubs.SENT)
+
+    def test_task_added_by_follower_fires_on_owner(self):
+        plugin = self.start_plugin()
+        self.assertEqual(plugin.coordinator.held, {0})
+        # 不持有分片的进程添加 2 秒后触发的任务，由当前进程同步后触发
+        self.assertEqual(self.start_node(once_command(2, "同步补发")), [])
+        sent = self.wait_sent(2 + CONFIG["task_sync_interval"] + 5)
+        self.assertEqual(sent, [USER_ID])
+        # 触发后由持有者删除一次性任务
+        time.sleep(0.5)
+        plugin.write_queue.flush()
+        self.assertEqual(plugin.store.load_task_ids(), set())
+
+    def test_takeover_fires_missed_task(self):
+        # 持有分片的进程先启动，当前进程添加任务后，持有者在触发前被杀死
+        self.assertEqual(self.start_node(), [0])
+        plugin = self.start_plugin()
+        self.assertEqual(plugin.coordinator.held, frozenset())
+        self.assertIn("任务已添加", send_command(plugin, once_command(1, "接管补发")))
+        plugin.write_queue.flush()
+        self.node.kill()
+        self.node.wait()
+        # 租约过期后接管，触发时刻已过，仍应补发
+        sent = self.wait_sent(CONFIG["lease_ttl"] + CONFIG["lease_heartbeat"] + 5)
+        self.assertEqual(sent, [USER_ID])
+        self.assertEqual(plugin.coordinator.held, {0})
+
+
+if __name__ == "__main__":
+    run_node(sys.argv[1], sys.argv[2])
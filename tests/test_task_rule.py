@@ -0,0 +1,55 @@
+"""
+触发规则测试：固定夏令时切换当天的触发时间。
+
+用法: python -m pytest tests/test_task_rule.py
+"""
+import os
+import sys
+import datetime
+import unittest
+import zoneinfo
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "benchmarks"))
+import host_stubs  # noqa: E402
+
+host_stubs.install()
+
+from plugins.SimpleTimeTask.TaskRule import compile_rule  # noqa: E402
+
+NEW_YORK = zoneinfo.ZoneInfo("America/New_York")
+UTC = datetime.timezone.utc
+
+
+def timestamp(*args):
+    """ UTC 时间对应的时间戳 """
+    return datetime.datetime(*args, tzinfo=UTC).timestamp()
+
+
+class SpringForwardTest(unittest.TestCase):
+    """ 2026-03-08 纽约 02:00 EST 切换为 03:00 EDT，02:00-02:59 的本地时间不存在 """
+
+    START = datetime.datetime(2026, 3, 8, 0, 0, tzinfo=NEW_YORK).timestamp()
+
+    def test_time_in_gap_fires_one_gap_later(self):
+        # 02:30 按切换前的偏移(EST, UTC-5)换算为 07:30 UTC，即 03:30 EDT，而不是切换后的 03:00
+        rule = compile_rule("every_day", "02:30", "America/New_York")
+        fire_time = rule.next_fire_time(self.START)
+        self.assertEqual(fire_time, timestamp(2026, 3, 8, 7, 30))
+        local = datetime.datetime.fromtimestamp(fire_time, NEW_YORK)
+        self.assertEqual((local.hour, local.minute, local.tzname()), (3, 30, "EDT"))
+        # 第二天恢复为本地 02:30
+        self.assertEqual(rule.next_fire_time(fire_time + 1), timestamp(2026, 3, 9, 6, 30))
+
+    def test_once_task_in_gap(self):
+        rule = compile_rule("once", "2026-03-08 02:30:15", "America/New_York")
+        self.assertEqual(rule.next_fire_time(self.START), timestamp(2026, 3, 8, 7, 30, 15))
+
+    def test_time_outside_gap_unchanged(self):
+        rule = compile_rule("every_day", "03:30", "America/New_York")
+        self.assertEqual(rule.next_fire_time(self.START), timestamp(2026, 3, 8, 7, 30))
+        rule = compile_rule("every_day", "01:30", "America/New_York")
+        self.assertEqual(rule.next_fire_time(self.START), timestamp(2026, 3, 8, 6, 30))
+
+
+if __name__ == "__main__":
+    unittest.main()